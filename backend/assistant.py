@@ -1,5 +1,8 @@
 import dspy
 
+from src.modules.tiered import LatencyStats, check_mode, generate, with_confidence
+from src.utils.answer_cache import AnswerCache
+
 
 class ConciseAnswer(dspy.Signature):
     """Provide a short and concise response highlighting only the important information without any extra fluffs. Consider each work as an expense so try to limit the work count to minimal."""
@@ -12,18 +15,87 @@ class AIAssitant:
     lm: dspy.LM
     _predict: dspy.Predict
 
-    def __init__(self, lm: dspy.LM) -> None:
+    def __init__(
+        self,
+        lm: dspy.LM,
+        cache: AnswerCache | None = None,
+        thorough_lm: dspy.LM | None = None,
+        mode: str = "fast",
+        min_confidence: float = 0.5,
+    ) -> None:
+        """
+        Args:
+            lm: Model of the fast tier.
+            thorough_lm: Model of the thorough (chain of thought) tier, `lm` if
+                None.
+            mode: "fast", "thorough" or "auto", unless a call picks one.
+            min_confidence: Fast answers reporting less escalate in "auto" mode.
+        """
         self._predict = dspy.Predict(ConciseAnswer)
+        # Only "auto" asks for a confidence, to decide whether to escalate
+        self._predict_scored = dspy.Predict(with_confidence(ConciseAnswer))
+        self._think = dspy.ChainOfThought(ConciseAnswer)
         self.lm = lm if lm is not None else lm
+        self.thorough_lm = thorough_lm or lm
+        self.mode = check_mode(mode)
+        self.min_confidence = min_confidence
+        self.stats = LatencyStats()
+        self.cache = cache
+        self.cache_scope = f"ask:{lm.model}"
+        self._stream = dspy.streamify(
+            self._predict,
+            stream_listeners=[
+                dspy.streaming.StreamListener("answer", allow_reuse=True)
+            ],
+        )
+        self._stream_thorough = dspy.streamify(
+            self._think,
+            stream_listeners=[
+                dspy.streaming.StreamListener("answer", allow_reuse=True)
+            ],
+        )
 
     @property
     def predict(self) -> dspy.Predict:
         """The prediction module (immutable)."""
         return self._predict
 
-    def ask(self, question: str) -> str:
-        with dspy.context(lm=self.lm):
-            response = self.predict(question=question)
+    def ask(self, question: str, mode: str | None = None) -> str:
+        mode = check_mode(mode) or self.mode
+        # Tiers answer differently, so each mode caches its own answers
+        scope = f"{self.cache_scope}:{mode}"
+        if self.cache and (cached := self.cache.get(question, scope)):
+            return cached
+
+        def run(module, lm):
+            with dspy.context(lm=lm):
+                return module(question=question)
+
+        fast = self._predict_scored if mode == "auto" else self.predict
+        response = generate(
+            mode,
+            fast=lambda: run(fast, self.lm),
+            thorough=lambda: run(self._think, self.thorough_lm),
+            field="answer",
+            stats=self.stats,
+            min_confidence=self.min_confidence,
+        )
 
         answer = response.answer
+        if self.cache:
+            self.cache.put(question, scope, answer)
         return answer
+
+    async def astream(self, question: str, mode: str | None = None):
+        """Yields the answer in chunks as the LM produces it, then the final
+        prediction. "auto" streams the fast tier without escalating, as the
+        fast answer would already have been sent."""
+        if (check_mode(mode) or self.mode) == "thorough":
+            stream = self._stream_thorough(question=question, lm=self.thorough_lm)
+        else:
+            stream = self._stream(question=question, lm=self.lm)
+        async for item in stream:
+            if isinstance(item, dspy.streaming.StreamResponse):
+                yield item.chunk
+            elif isinstance(item, dspy.Prediction):
+                yield item
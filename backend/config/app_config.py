@@ -4,6 +4,7 @@
 # Any module in the app should be able to import and query configs
 # Note: AppConfig doesn't resolve or validate if path is true
 
+import inspect
 import json
 import os
 from copy import deepcopy
@@ -12,6 +13,12 @@ from typing import ClassVar, Self
 
 from platformdirs import PlatformDirs
 
+# Only files the RAG pipeline can index are tracked by default
+DEFAULT_INCLUDE_PATTERNS = ["*.md", "*.txt"]
+DEFAULT_EXCLUDE_PATTERNS = [".*", "node_modules", "__pycache__"]
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024  # bytes
+DEFAULT_EMBEDDING_CACHE_SIZE = 256 * 1024 * 1024  # bytes
+
 
 class AppConfig:
     _instance: ClassVar[Self | None] = None
@@ -28,25 +35,133 @@ class AppConfig:
         watch_dir: str | None,
         notes_dir: str | None,
         gemini_api_key: str | None,
+        include_patterns: list[str] | None = None,
+        exclude_patterns: list[str] | None = None,
+        max_file_size: int | None = DEFAULT_MAX_FILE_SIZE,
+        ingest_parse_workers: int = 4,
+        ingest_embed_workers: int = 2,
+        chunk_size: int = 1000,
+        rag_top_k: int = 4,
+        embedding_cache_size: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+        embed_batch_size: int = 32,
+        embed_max_in_flight: int = 4,
+        query_workers: int = 4,
+        query_queue_depth: int = 32,
+        answer_cache_size: int = 256,
+        answer_cache_ttl: float = 3600.0,
+        answer_cache_similarity: float | None = None,
+        vector_store: str = "chroma",
+        retrieval_mode: str = "hybrid",
+        embed_timeout: float | None = 3.0,
+        batch_concurrency: int = 4,
+        batch_max_questions: int = 500,
+        context_token_budget: int = 2000,
+        context_fetch_factor: int = 3,
+        mmr_lambda: float = 0.7,
+        min_similarity: float | None = None,
+        ollama_model: str = "qwen3:1.7b",
+        ollama_fast_model: str | None = None,
+        gemini_model: str = "gemini-2.5-flash-lite",
+        gemini_thorough_model: str | None = None,
+        rag_mode: str = "thorough",
+        ask_mode: str = "fast",
+        escalation_confidence: float = 0.5,
+        ollama_warmup: bool = True,
+        ollama_keep_alive: str | float | None = "30m",
+        ollama_refresh_interval: float | None = None,
     ) -> None:
         self.data_dir = data_dir
         self.config_dir = config_dir
         self.watch_dir = watch_dir
         self.notes_dir = notes_dir
         self.gemini_api_key = gemini_api_key
+        # Glob patterns and size limit (bytes, None for no limit) for the watch dir
+        self.include_patterns = (
+            include_patterns
+            if include_patterns is not None
+            else list(DEFAULT_INCLUDE_PATTERNS)
+        )
+        self.exclude_patterns = (
+            exclude_patterns
+            if exclude_patterns is not None
+            else list(DEFAULT_EXCLUDE_PATTERNS)
+        )
+        self.max_file_size = max_file_size
+        # Concurrency of the ingestion pipeline (files parsed, embedding requests)
+        self.ingest_parse_workers = ingest_parse_workers
+        self.ingest_embed_workers = ingest_embed_workers
+        # Max characters per indexed chunk, and chunks retrieved per question
+        self.chunk_size = chunk_size
+        self.rag_top_k = rag_top_k
+        # Disk space (bytes) for cached embeddings before LRU eviction kicks in
+        self.embedding_cache_size = embedding_cache_size
+        # Texts per Ollama embedding request, and the most requests in flight
+        self.embed_batch_size = embed_batch_size
+        self.embed_max_in_flight = embed_max_in_flight
+        # Questions answered concurrently by /rag and /ask, and how many may wait
+        self.query_workers = query_workers
+        self.query_queue_depth = query_queue_depth
+        # Cached answers: max entries, seconds they are served for, and the cosine
+        # similarity at which a rephrased question reuses an answer (None: off)
+        self.answer_cache_size = answer_cache_size
+        self.answer_cache_ttl = answer_cache_ttl
+        self.answer_cache_similarity = answer_cache_similarity
+        # "chroma", or "numpy" for the lighter exact-search store
+        self.vector_store = vector_store
+        # "hybrid" (BM25 + vectors), "vector" or "lexical"
+        self.retrieval_mode = retrieval_mode
+        # Seconds to wait for the query embedding before answering from BM25 alone
+        self.embed_timeout = embed_timeout
+        # LLM generations run at once for one /rag/batch request
+        self.batch_concurrency = batch_concurrency
+        # Largest number of questions accepted by /rag/batch
+        self.batch_max_questions = batch_max_questions
+        # Estimated tokens of retrieved text passed to the LLM per question
+        self.context_token_budget = context_token_budget
+        # Candidates retrieved per chunk used, before MMR de-duplication
+        self.context_fetch_factor = context_fetch_factor
+        # 1 keeps retrieval order, lower values favour diverse chunks
+        self.mmr_lambda = mmr_lambda
+        # Cosine similarity a chunk needs to be used as context; when none has
+        # it, /rag answers "No relevant sources" without calling the LLM.
+        # None disables the cutoff (around 0.5 suits nomic-embed-text)
+        self.min_similarity = min_similarity
+        # Models of the /rag (Ollama) and /ask (Gemini) tiers. The "fast" tier
+        # answers without reasoning, "thorough" with chain of thought; an unset
+        # fast/thorough model means the main one serves both tiers
+        self.ollama_model = ollama_model
+        self.ollama_fast_model = ollama_fast_model
+        self.gemini_model = gemini_model
+        self.gemini_thorough_model = gemini_thorough_model
+        # Default tier ("fast", "thorough" or "auto") when a request names none
+        self.rag_mode = rag_mode
+        self.ask_mode = ask_mode
+        # "auto" escalates fast answers that report a lower confidence (0-1)
+        self.escalation_confidence = escalation_confidence
+        # Load the Ollama models in the background at startup
+        self.ollama_warmup = ollama_warmup
+        # How long Ollama keeps the models loaded when idle ("30m", -1 for
+        # ever, None for the server's default), sent with every request
+        self.ollama_keep_alive = ollama_keep_alive
+        # Seconds between checks that reload models Ollama unloaded, None for
+        # half of ollama_keep_alive
+        self.ollama_refresh_interval = ollama_refresh_interval
 
     @classmethod
     def from_json(cls, filepath: Path) -> Self:
         """Create a instance of app config from a JSON file"""
         json_str = filepath.read_text(encoding="utf-8")
         json_obj = json.loads(json_str)
-        return cls(
-            data_dir=json_obj["data_dir"],
-            config_dir=json_obj["config_dir"],
-            watch_dir=json_obj.get("watch_dir", None),
-            notes_dir=json_obj.get("notes_dir", None),
-            gemini_api_key=json_obj.get("gemini_api_key", None),
-        )
+        # Keys missing from the file take the defaults of __init__
+        params = inspect.signature(cls.__init__).parameters
+        kwargs = {
+            key: value
+            for key, value in json_obj.items()
+            if key in params and key != "self"
+        }
+        for key in ("watch_dir", "notes_dir", "gemini_api_key"):
+            kwargs.setdefault(key, None)
+        return cls(**kwargs)
 
     def to_json(self, filepath: Path):
         serializable_str = self.asdict()
@@ -1,63 +1,275 @@
 import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, NamedTuple
 
+import dspy
+import openai
+from dspy.utils.exceptions import DSPyError
+
+from src.common_types.base import Documents
+from src.embedders.cached_embedding import DEFAULT_MAX_BYTES, CachedEmbedder
 from src.embedders.ollama_embedding import OllamaEmbedding
 from src.llm import load_ollama_lm
-from src.modules.rag import RAG
+from src.modules.rag import NO_RELEVANT_SOURCES, RAG
+from src.modules.tiered import MODES, check_mode
 from src.parsers.simple_parser import SimpleMarkdownParser
+from src.pipelines.context_assembly import ContextAssembler, estimate_tokens
+from src.pipelines.ingestion import INGEST_ERRORS, IngestionPipeline
 from src.retrievers.simple_retriever import SimpleRetriver
-from src.stores.chroma_store import ChromaStore
-from src.utils.track_files import FileTracker
+from src.splitters.base import Splitter
+from src.splitters.markdown_splitter import MarkdownSplitter
+from src.stores.hybrid_store import HybridStore
+from src.stores.indexed_store import IndexedStore, ReconcileReport
+from src.stores.numpy_store import NumpyStore
+from src.utils.answer_cache import AnswerCache, normalize_question
+from src.utils.track_files import FileTracker, FileTrackerOutput, PathFilter
+from src.utils.watch_files import FileWatcher
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger("src")
 logger.setLevel(logging.DEBUG)
 
 
-class FileExtensionNotSupportedError(Exception):
+class BatchAnswer(NamedTuple):
+    question: str
+    response: Any  # The prediction, None if its generation failed
+    error: str | None = None
+
+
+class FileExtensionNotSupportedError(ValueError):
     def __init__(self, message="File Extension not supported"):
         self.message = message
         super().__init__(self.message)
 
 
 class DocumentRAG:
-    def __init__(self, parser, retriver, generator) -> None:
+    def __init__(
+        self,
+        parser,
+        retriver,
+        generator,
+        splitter: Callable[[Documents], Documents] | None = None,
+        assembler: ContextAssembler | None = None,
+        min_similarity: float | None = None,
+    ) -> None:
         self.parser = parser
         self.retriver = retriver
         self.generator = generator
+        # Optional stage between parsing and embedding, as in FileHandler
+        self.splitter = splitter
+        # Optional stage between retrieval and generation
+        self.assembler = assembler
+        # Chunks less similar to the question are not passed to the generator
+        self.min_similarity = min_similarity
 
-    def add_document(self, filepath: str | Path):
+    def load_document(self, filepath: str | Path) -> Documents:
+        """Parses (and splits, if a splitter is set) a file into the documents
+        that get embedded."""
         path = Path(filepath)
         if not path.exists():
             raise FileNotFoundError("path doens't exist")
         file_ext = path.suffix
-        parsed_file = None
         if file_ext in [".md", ".txt"]:
-            parsed_file = self.parser.parse(path)
-        else:
-            raise FileExtensionNotSupportedError(
-                f"No parser found for files with '{file_ext}' extension"
-            )
-        self.retriver.add(parsed_file)
+            if isinstance(self.splitter, Splitter):
+                # Stream the file through the splitter instead of parsing it whole
+                return list(self.splitter.split_file(path, self.parser.metadata(path)))
+            docs = self.parser.parse(path)
+            return self.splitter(docs) if self.splitter else docs
+        raise FileExtensionNotSupportedError(
+            f"No parser found for files with '{file_ext}' extension"
+        )
+
+    def add_document(self, filepath: str | Path):
+        self.retriver.add(self.load_document(filepath))
+
+    def update_document(self, filepath: str | Path):
+        """Re-indexes a file, embedding only the chunks that changed."""
+        path = Path(filepath)
+        self.retriver.replace_file(str(path.absolute()), self.load_document(path))
 
     def remove_document(self, filepath: str | Path):
         path = Path(filepath)
-        self.retriver.delete(where={"filepath": str(path.absolute())})
+        self.retriver.delete_file(str(path.absolute()))
+
+    def retrieve(self, question: str) -> Documents:
+        """Returns the documents relevant to `question`."""
+        return self.retrieve_many([question])[0]
 
-    def query(self, question: str):
-        logger.debug(f"Question: {question}")
-        contexts = self.retriver.query([question])
+    def retrieve_many(self, questions: list[str]) -> list[Documents]:
+        """Returns the documents relevant to each question, embedding and
+        searching for all of them at once."""
+        logger.debug(f"Questions: {questions}")
+        if not questions:
+            return []
+        if self.assembler is None:
+            contexts = self.retriver.query(questions)
+        else:
+            contexts = self.retriver.query(questions, k=self.assembler.fetch_k)
+        contexts = list(contexts or [])
+        contexts += [[]] * (len(questions) - len(contexts))
         logger.debug(f"Contexts: {contexts}")
-        if contexts and contexts[0]:
-            return self.generator(
-                [c.content for c in contexts[0] if c.content], question
+        contexts = [self.relevant(docs or []) for docs in contexts]
+        if self.assembler is None:
+            return contexts
+
+        sources = []
+        for question, docs in zip(questions, contexts, strict=True):
+            assembled = self.assembler.assemble(docs)
+            logger.debug(
+                f"Context for {question!r}: {len(assembled.documents)} of "
+                f"{assembled.candidates} chunks, ~{assembled.tokens} tokens"
             )
-        return None
+            sources.append(assembled.documents)
+        return sources
+
+    def query(self, question: str, mode: str | None = None):
+        return self.generate(question, self.retrieve(question), mode)
+
+    def relevant(self, docs: Documents) -> Documents:
+        """
+        Drops the chunks whose "similarity" to the question is below
+        `min_similarity`. Chunks without one (e.g. lexical-only hits) are kept,
+        since there is nothing to judge them by.
+        """
+        if self.min_similarity is None:
+            return docs
+        return [
+            doc
+            for doc in docs
+            if (doc.metadata or {}).get("similarity", self.min_similarity)
+            >= self.min_similarity
+        ]
+
+    def generate(self, question: str, sources: Documents, mode: str | None = None):
+        """Answers `question` from already retrieved `sources`, without calling
+        the LM when there are none. `mode` picks the generator's latency tier,
+        see `RAG`."""
+        if not sources:
+            return dspy.Prediction(
+                response=NO_RELEVANT_SOURCES,
+                usage={"chunks": 0, "context_tokens": 0, "prompt_tokens": 0},
+            )
+        contexts = [c.content for c in sources if c.content]
+        result = self.generator(contexts, question, mode=mode)
+        if isinstance(result, dspy.Prediction):
+            result["usage"] = self.usage(result, contexts)
+            logger.info(f"Answered {question!r}: {result.usage}")
+        return result
+
+    def usage(self, result: dspy.Prediction, contexts: list[str]) -> dict:
+        """Size of the prompt behind `result`: the chunks passed, their
+        estimated tokens, and the prompt tokens the LM reported (None if it
+        reported none)."""
+        lm_usage = result.get_lm_usage() or {}
+        prompt_tokens = [u.get("prompt_tokens") for u in lm_usage.values()]
+        return {
+            "chunks": len(contexts),
+            "context_tokens": sum(map(estimate_tokens, contexts)),
+            "prompt_tokens": sum(prompt_tokens) if any(prompt_tokens) else None,
+        }
+
+    def query_many(
+        self, questions: list[str], max_workers: int = 4, mode: str | None = None
+    ) -> list:
+        """
+        Answers every question, with a single retrieval for all of them and up
+        to `max_workers` generations at a time.
+
+        Returns:
+            For each question its prediction (answering NO_RELEVANT_SOURCES
+            when none are relevant), or the exception its generation raised.
+        """
+        sources = self.retrieve_many(questions)
+
+        def generate(question: str, docs: Documents):
+            try:
+                return self.generate(question, docs, mode)
+            # The LM call failing (litellm raises OpenAI's errors) or its answer
+            # not parsing
+            except (openai.OpenAIError, DSPyError) as e:
+                logger.error(f"Failed to answer {question!r}: {e}")
+                return e
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="rag-batch"
+        ) as pool:
+            return list(pool.map(generate, questions, sources))
+
+    def astream(self, question: str, sources: Documents, mode: str | None = None):
+        """Streams the answer to `question` from already retrieved `sources`,
+        see `RAG.astream`."""
+        return self.generator.astream(
+            [c.content for c in sources if c.content], question, mode=mode
+        )
 
 
 class DocumentRAGHandler:
-    def __init__(self, doc_rag: DocumentRAG) -> None:
+    def __init__(
+        self,
+        doc_rag: DocumentRAG,
+        pipeline: IngestionPipeline | None = None,
+        on_change: Callable[[], Any] | None = None,
+    ) -> None:
         self.doc_rag = doc_rag
+        self.pipeline = pipeline
+        # Called after the indexed documents changed, e.g. to drop cached answers
+        self.on_change = on_change
+
+    def handle_changes(
+        self,
+        changes: FileTrackerOutput,
+        on_result: Callable[[Path, Exception | None], Any] | None = None,
+        stop: threading.Event | None = None,
+    ):
+        """
+        Ingests a whole sync delta at once through the parallel pipeline,
+        reporting the outcome of every file to `on_result`. Once `stop` is set,
+        files that weren't started yet are skipped without a report.
+        """
+        try:
+            self._apply_changes(changes, on_result, stop)
+        finally:
+            if self.on_change and any(changes):
+                self.on_change()
+
+    def _apply_changes(
+        self,
+        changes: FileTrackerOutput,
+        on_result: Callable[[Path, Exception | None], Any] | None = None,
+        stop: threading.Event | None = None,
+    ):
+        report = on_result or (lambda filepath, error: None)
+
+        def run(handler, filepath: Path):
+            if stop is not None and stop.is_set():
+                return
+            try:
+                handler(filepath)
+            except INGEST_ERRORS as e:
+                logger.error(f"Failed to sync {filepath}: {e}")
+                report(filepath, e)
+            else:
+                report(filepath, None)
+
+        for filepath in changes.deleted_files:
+            run(self.handle_deleted_file, filepath)
+
+        if self.pipeline:
+            self.pipeline.run(
+                changes.new_files | changes.modified_files,
+                replace=changes.modified_files,
+                on_result=on_result,
+                stop=stop,
+            )
+            return
+
+        for filepath in changes.new_files:
+            run(self.handle_new_file, filepath)
+        for filepath in changes.modified_files:
+            run(self.handle_modified_file, filepath)
 
     def handle_new_file(self, filepath: str | Path):
         self.doc_rag.add_document(Path(filepath))
@@ -66,35 +278,232 @@ class DocumentRAGHandler:
         self.doc_rag.remove_document(filepath=filepath)
 
     def handle_modified_file(self, filepath: str):
-        path = Path(filepath)
-        self.handle_deleted_file(path)
-        self.handle_new_file(path)
+        self.doc_rag.update_document(Path(filepath))
 
 
 class RAGService:
-    def __init__(self, watch_dir: Path, data_dir: Path):
+    def __init__(
+        self,
+        watch_dir: Path,
+        data_dir: Path,
+        path_filter: PathFilter | None = None,
+        parse_workers: int = 4,
+        embed_workers: int = 2,
+        chunk_size: int = 1000,
+        top_k: int = 4,
+        embedding_cache_size: int = DEFAULT_MAX_BYTES,
+        embed_batch_size: int = 32,
+        embed_max_in_flight: int = 4,
+        answer_cache_size: int = 256,
+        answer_cache_ttl: float = 3600.0,
+        answer_cache_similarity: float | None = None,
+        vector_store: str = "chroma",
+        retrieval_mode: str = "hybrid",
+        embed_timeout: float | None = 3.0,
+        batch_concurrency: int = 4,
+        context_token_budget: int = 2000,
+        context_fetch_factor: int = 3,
+        mmr_lambda: float = 0.7,
+        min_similarity: float | None = None,
+        mode: str = "thorough",
+        fast_model: str | None = None,
+        escalation_confidence: float = 0.5,
+        keep_alive: str | float | None = None,
+    ):
         self.file_tracker = None
+        self.batch_concurrency = batch_concurrency
+        self.file_watcher = None
 
         lm = load_ollama_lm()
-        embedder = OllamaEmbedding()
-        store = ChromaStore(
-            embedder, store_name="rag", persists=True, path=str(data_dir / "chroma")
+        fast_lm = load_ollama_lm(fast_model) if fast_model else None
+        data_dir.mkdir(parents=True, exist_ok=True)
+        self.ollama_embedder = OllamaEmbedding(
+            batch_size=embed_batch_size,
+            max_in_flight=embed_max_in_flight,
+            keep_alive=keep_alive,
         )
+        embedder = CachedEmbedder(
+            self.ollama_embedder,
+            data_dir / "embeddings.sqlite",
+            max_bytes=embedding_cache_size,
+        )
+        if vector_store == "numpy":
+            vectors = NumpyStore(embedder, persists=True, path=data_dir / "vectors")
+        else:
+            # chromadb takes most of a second to import, only pay it if used
+            from src.stores.chroma_store import ChromaStore
+
+            vectors = ChromaStore(
+                embedder, store_name="rag", persists=True, path=str(data_dir / "chroma")
+            )
+        # Every write also updates the BM25 index, whatever `retrieval_mode` is
+        store = HybridStore(vectors, mode=retrieval_mode, embed_timeout=embed_timeout)
+        # Deletes and re-ingests find a file's chunks by ID through the index
+        store = IndexedStore(store, data_dir / "chunk_index.sqlite")
+        self.store = store
         parser = SimpleMarkdownParser()
-        retriver = SimpleRetriver(store=store, k=1)
-        generator = RAG(lm)
-        self.raggy = DocumentRAG(parser=parser, retriver=retriver, generator=generator)
+        splitter = MarkdownSplitter(chunk_size=chunk_size)
+        retriver = SimpleRetriver(store=store, k=top_k)
+        generator = RAG(
+            lm, fast_lm=fast_lm, mode=mode, min_confidence=escalation_confidence
+        )
+        self.generator = generator
+        self.embedder = embedder
+        # Answers depend on the indexed documents, so any change drops them all
+        self.answer_cache = AnswerCache(
+            max_entries=answer_cache_size,
+            ttl=answer_cache_ttl,
+            embedder=embedder,
+            similarity_threshold=answer_cache_similarity,
+        )
+        # Tiers answer differently, so each mode caches its own answers
+        self.cache_scopes = {m: f"rag:{lm.model}:{m}" for m in MODES}
+        assembler = ContextAssembler(
+            store,
+            max_chunks=top_k,
+            token_budget=context_token_budget,
+            fetch_factor=context_fetch_factor,
+            mmr_lambda=mmr_lambda,
+        )
+        self.raggy = DocumentRAG(
+            parser=parser,
+            retriver=retriver,
+            generator=generator,
+            splitter=splitter,
+            assembler=assembler,
+            min_similarity=min_similarity,
+        )
 
-        doc_rag_handler = DocumentRAGHandler(self.raggy)
+        pipeline = IngestionPipeline(
+            loader=self.raggy.load_document,
+            embedder=embedder,
+            store=store,
+            parse_workers=parse_workers,
+            embed_workers=embed_workers,
+        )
+        doc_rag_handler = DocumentRAGHandler(
+            self.raggy,
+            pipeline=pipeline,
+            on_change=self.invalidate_answers,
+        )
 
         if watch_dir:
             self.file_tracker = FileTracker(
                 state_filepath=data_dir / ".tracked",
                 watch_dir=watch_dir,
+                path_filter=path_filter,
             )
             self.file_tracker.attach(doc_rag_handler)
+            self.file_watcher = FileWatcher(self.file_tracker)
+
+    def start(self):
+        """Starts syncing the watch dir in the background."""
+        if self.file_watcher:
+            self.file_watcher.start()
+
+    def pause(self):
+        """Stops syncing the watch dir until `start` is called again."""
+        if self.file_watcher:
+            self.file_watcher.stop()
+
+    def stop(self):
+        if self.file_watcher:
+            # Waits for the file being synced, the rest is left for the next start
+            self.file_watcher.stop()
+        logger.info(
+            f"Embedding cache: {self.embedder.hits} hits, {self.embedder.misses} misses"
+        )
+        self.store.close()
+        self.embedder.close()
+        self.ollama_embedder.close()
+
+    def invalidate_answers(self):
+        for scope in self.cache_scopes.values():
+            self.answer_cache.invalidate(scope)
+
+    def cache_scope(self, mode: str | None = None) -> str:
+        return self.cache_scopes[check_mode(mode) or self.generator.mode]
+
+    def reconcile(self) -> ReconcileReport:
+        """Deletes chunks left behind for files that are gone, no longer
+        tracked, or whose contents changed since the chunks were stored."""
+
+        def keep(filepath: str) -> bool:
+            path = Path(filepath)
+            if not path.is_file():
+                return False
+            tracker = self.file_tracker
+            return tracker is None or (
+                path.resolve().is_relative_to(tracker.watch_dir)
+                and tracker.is_tracked(path)
+            )
+
+        report = self.store.reconcile(keep=keep, loader=self.raggy.load_document)
+        if report.orphan_chunks:
+            self.invalidate_answers()
+        return report
+
+    def query_many(
+        self, questions: list[str], mode: str | None = None
+    ) -> list[BatchAnswer]:
+        """
+        Answers a batch of questions: cached answers are reused, repeated
+        questions answered once, and the rest retrieved for in one store query
+        and generated concurrently.
+        """
+        self._sync_if_unwatched()
+        scope = self.cache_scope(mode)
+        generation = self.answer_cache.generation(scope)
+        if self.answer_cache.matches_similar:
+            # One embedding request for the whole batch; the cache lookups and
+            # the retrieval below then hit the embedding cache
+            self.embedder.embed(questions)
+
+        answers: list[BatchAnswer | None] = [None] * len(questions)
+        pending: dict[str, list[int]] = {}
+        for i, question in enumerate(questions):
+            cached = self.answer_cache.get(question, scope)
+            if cached is not None:
+                answers[i] = BatchAnswer(question, cached)
+            else:
+                pending.setdefault(normalize_question(question), []).append(i)
+
+        unique = [questions[indices[0]] for indices in pending.values()]
+        results = self.raggy.query_many(
+            unique, max_workers=self.batch_concurrency, mode=mode
+        )
+        for question, indices, result in zip(
+            unique, pending.values(), results, strict=True
+        ):
+            if isinstance(result, Exception):
+                answer = BatchAnswer(question, None, str(result))
+            else:
+                answer = BatchAnswer(question, result)
+                self.answer_cache.put(question, scope, result, generation)
+            for i in indices:
+                answers[i] = answer._replace(question=questions[i])
+        return answers
+
+    def query(self, q: str, mode: str | None = None):
+        self._sync_if_unwatched()
+        scope = self.cache_scope(mode)
+        generation = self.answer_cache.generation(scope)
+        if (cached := self.answer_cache.get(q, scope)) is not None:
+            return cached
+        result = self.raggy.query(q, mode)
+        if result is not None:
+            self.answer_cache.put(q, scope, result, generation)
+        return result
+
+    def retrieve(self, q: str) -> Documents:
+        self._sync_if_unwatched()
+        return self.raggy.retrieve(q)
+
+    def astream(self, q: str, sources: Documents, mode: str | None = None):
+        return self.raggy.astream(q, sources, mode)
 
-    def query(self, q: str):
-        if self.file_tracker:
+    def _sync_if_unwatched(self):
+        # Without a running watcher, fall back to syncing on demand
+        watching = self.file_watcher is not None and self.file_watcher.is_running
+        if self.file_tracker and not watching:
             self.file_tracker.sync()
-        return self.raggy.query(q)
@@ -1,28 +1,86 @@
+"""
+HTTP API of the launcher backend.
+
+The server must answer /health quickly after launch, or the launcher UI reports
+an error. Importing dspy, chromadb and openai (through litellm) takes seconds,
+so this module doesn't import them: the services that need them are imported
+and built on a worker thread once the socket is up (see `lifespan`), and
+handlers import what they need from them when called. Until the services are
+built, endpoints that need one answer 503.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from openai import AuthenticationError
+from fastapi.responses import StreamingResponse
 
 import routers.notes as notes_router
-from assistant import AIAssitant
 from config import app_config
-from file_rag import RAGService
 from notes.notes import NoteService
 from routers.notes import router
-from src.llm import load_gemini_lm
+from src.utils.answer_cache import AnswerCache, normalize_question
+from src.utils.single_flight import AsyncSingleFlight
+from src.utils.track_files import PathFilter
+from src.utils.worker_pool import QueueFullError, WorkerPool
+
+if TYPE_CHECKING:
+    from assistant import AIAssitant
+    from file_rag import RAGService
+    from src.utils.model_warmer import ModelWarmer
+
+logger = logging.getLogger(__name__)
 
 # Global variable to hold our service instance
-rag_service: RAGService | None = None
-ai_assitant: AIAssitant | None = None
+rag_service: "RAGService | None" = None
+ai_assitant: "AIAssitant | None" = None
+# Runs the blocking question answering (retrieval, LLM calls) off the event loop
+query_pool: WorkerPool | None = None
+# Merges identical questions that are being answered at the same time
+in_flight_questions = AsyncSingleFlight()
+# Loads the local models ahead of the first question
+model_warmer: "ModelWarmer | None" = None
+# Builds the services after startup, done once they are ready
+startup: asyncio.Future | None = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initializes services on application startup."""
-    initialize_services()
+    """Starts building the services on application startup, without waiting
+    for them, and stops them on shutdown."""
+    global startup
+    startup = asyncio.ensure_future(asyncio.to_thread(start_services))
     yield
+    # Services still being built would be left running
+    await startup
+    shutdown_services()
+
+
+def start_services() -> bool:
+    """Initializes the services, returns whether that succeeded."""
+    start = time.perf_counter()
+    try:
+        initialize_services()
+    except Exception:
+        logger.exception("Failed to start the services")
+        return False
+    logger.info(f"Services started in {time.perf_counter() - start:.2f}s")
+    return True
+
+
+def check_started():
+    """Rejects requests that need a service while the services are built."""
+    if startup is not None and not startup.done():
+        raise HTTPException(
+            status_code=503, detail="Server is starting, try again shortly"
+        )
 
 
 app = FastAPI(lifespan=lifespan)
@@ -33,35 +91,151 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.include_router(router)
+app.include_router(router, dependencies=[Depends(check_started)])
 
 
 def initialize_services():
     """Loads config and initializes the RAG service if configured."""
-    global rag_service, ai_assitant, app_config, note_service
+    global rag_service, ai_assitant, app_config, note_service, query_pool
+    global model_warmer
     # Reload config from file in case it changed
 
+    # The replacements are built while the current services keep answering, and
+    # only swapped in once they all built. Only the file watcher is paused, so
+    # the new service doesn't load a store the old one is still writing to.
+    if rag_service:
+        rag_service.pause()
+    try:
+        services = _build_services()
+    except BaseException:
+        if rag_service:
+            rag_service.start()
+        raise
+
+    previous = query_pool, model_warmer, rag_service
+    query_pool, model_warmer, rag_service, assistant, notes = services
+    if assistant is not None:
+        ai_assitant = assistant
+    notes_router.note_service = notes
+    _stop_services(*previous)
+
+    if rag_service:
+        rag_service.start()
+    if model_warmer:
+        model_warmer.start()
+
+
+def _build_services():
+    """Builds the services described by the config, without starting them."""
+    from assistant import AIAssitant
+    from file_rag import RAGService
+    from src.llm import load_gemini_lm
+    from src.utils.model_warmer import ModelWarmer
+
+    pool = WorkerPool(
+        max_workers=app_config.query_workers,
+        max_queue=app_config.query_queue_depth,
+        name="query",
+    )
+
     if app_config.watch_dir:
         print("Watch directory is configured. Initializing RAG service.")
-        rag_service = RAGService(
-            watch_dir=Path(app_config.watch_dir), data_dir=Path(app_config.data_dir)
+        service = RAGService(
+            watch_dir=Path(app_config.watch_dir),
+            data_dir=Path(app_config.data_dir),
+            path_filter=PathFilter(
+                include=app_config.include_patterns,
+                exclude=app_config.exclude_patterns,
+                max_file_size=app_config.max_file_size,
+            ),
+            parse_workers=app_config.ingest_parse_workers,
+            embed_workers=app_config.ingest_embed_workers,
+            chunk_size=app_config.chunk_size,
+            top_k=app_config.rag_top_k,
+            embedding_cache_size=app_config.embedding_cache_size,
+            embed_batch_size=app_config.embed_batch_size,
+            embed_max_in_flight=app_config.embed_max_in_flight,
+            answer_cache_size=app_config.answer_cache_size,
+            answer_cache_ttl=app_config.answer_cache_ttl,
+            answer_cache_similarity=app_config.answer_cache_similarity,
+            vector_store=app_config.vector_store,
+            retrieval_mode=app_config.retrieval_mode,
+            embed_timeout=app_config.embed_timeout,
+            batch_concurrency=app_config.batch_concurrency,
+            context_token_budget=app_config.context_token_budget,
+            context_fetch_factor=app_config.context_fetch_factor,
+            mmr_lambda=app_config.mmr_lambda,
+            min_similarity=app_config.min_similarity,
+            mode=app_config.rag_mode,
+            fast_model=app_config.ollama_fast_model,
+            escalation_confidence=app_config.escalation_confidence,
+            keep_alive=app_config.ollama_keep_alive,
         )
     else:
         print("Watch directory not configured. RAG service will not be started.")
-        rag_service = None
+        service = None
+
+    if service and app_config.ollama_warmup:
+        chat_models = [app_config.ollama_model, app_config.ollama_fast_model]
+        warmer = ModelWarmer(
+            embed_models=[service.ollama_embedder.model_name],
+            chat_models=[model for model in chat_models if model],
+            keep_alive=app_config.ollama_keep_alive,
+            refresh_interval=app_config.ollama_refresh_interval,
+        )
+    else:
+        warmer = None
+
+    assistant = None
 
     if app_config.gemini_api_key:
         print("API Key Configured. Initializing AI Assistant service.")
-        ai_assitant = AIAssitant(lm=load_gemini_lm())
+        answer_cache = AnswerCache(
+            max_entries=app_config.answer_cache_size,
+            ttl=app_config.answer_cache_ttl,
+            # Similarity matching reuses the RAG embedder when there is one
+            embedder=service.embedder if service else None,
+            similarity_threshold=app_config.answer_cache_similarity,
+        )
+        thorough_model = app_config.gemini_thorough_model
+        assistant = AIAssitant(
+            lm=load_gemini_lm(),
+            cache=answer_cache,
+            thorough_lm=load_gemini_lm(thorough_model) if thorough_model else None,
+            mode=app_config.ask_mode,
+            min_confidence=app_config.escalation_confidence,
+        )
     else:
         print("LLM API KEY not configured")
 
     if app_config.notes_dir:
         print("Notes directory is configured. Initializing Notes service.")
-        notes_router.note_service = NoteService(Path(app_config.notes_dir))
+        notes = NoteService(Path(app_config.notes_dir))
     else:
         print("Notes directory not configured. Note service will not be started.")
-        notes_router.note_service = None
+        notes = None
+
+    return pool, warmer, service, assistant, notes
+
+
+def shutdown_services():
+    """Stops background work owned by the current services."""
+    _stop_services(query_pool, model_warmer, rag_service)
+
+
+def _stop_services(
+    pool: WorkerPool | None,
+    warmer: "ModelWarmer | None",
+    service: "RAGService | None",
+):
+    if pool:
+        # Questions already being answered complete before the services they
+        # use are closed
+        pool.shutdown(wait=True)
+    if warmer:
+        warmer.stop()
+    if service:
+        service.stop()
 
 
 @app.get("/")
@@ -76,8 +250,39 @@ async def health_check():
 
 @app.get("/api/status")
 async def get_status():
-    """Lets the UI know if the backend is configured."""
-    return {"is_configured": rag_service is not None}
+    """
+    Lets the UI know if the backend is configured, and whether the local
+    models are loaded ("ready"; None when warm-up is disabled), i.e. if /rag
+    answers without waiting for a model to load.
+    """
+    return {
+        # The services are still being built, see `lifespan`
+        "starting": startup is not None and not startup.done(),
+        "is_configured": rag_service is not None,
+        "ready": model_warmer.ready if model_warmer else None,
+        "models": model_warmer.status() if model_warmer else {},
+    }
+
+
+@app.get("/api/stats")
+async def get_stats():
+    """Answer latency per generation mode of the configured services."""
+    return {
+        "rag": rag_service.generator.stats.snapshot() if rag_service else None,
+        "ask": ai_assitant.stats.snapshot() if ai_assitant else None,
+    }
+
+
+@app.post("/api/reconcile", dependencies=[Depends(check_started)])
+async def reconcile_store():
+    """Removes orphan chunks from the index (see `IndexedStore.reconcile`)."""
+    if not rag_service:
+        raise HTTPException(status_code=409, detail="RAG service is not configured")
+    try:
+        report = await query_pool.run(rag_service.reconcile)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server is busy, try again later")
+    return report._asdict()
 
 
 @app.get("/config")
@@ -85,7 +290,7 @@ async def get_config():
     return app_config.asdict()
 
 
-@app.post("/config")
+@app.post("/config", dependencies=[Depends(check_started)])
 async def set_config(request: Request):
     """Receives new config, saves it, and re-initializes services."""
     body = await request.json()
@@ -94,13 +299,32 @@ async def set_config(request: Request):
     app_config.update_fields(body)
     app_config.write()
 
-    # Re-initialize services with the new configuration
-    initialize_services()
+    # Re-initialize services with the new configuration, off the event loop like
+    # at startup; requests needing a service get 503 until it is done
+    global startup
+    startup = asyncio.ensure_future(asyncio.to_thread(start_services))
+    # Shielded, a client hanging up must not end the startup early
+    if not await asyncio.shield(startup):
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to apply the config, the previous services are kept",
+        )
 
     return {"status": "success", "new_config": app_config.asdict()}
 
 
-@app.post("/rag")
+def request_mode(body: dict) -> str | None:
+    """The generation mode a request asks for ("fast", "thorough" or "auto"),
+    None for the configured one."""
+    from src.modules.tiered import InvalidModeError, check_mode
+
+    try:
+        return check_mode(body.get("mode"))
+    except InvalidModeError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+@app.post("/rag", dependencies=[Depends(check_started)])
 async def respond_rag(request: Request):
     if not rag_service:
         raise HTTPException(
@@ -112,12 +336,66 @@ async def respond_rag(request: Request):
     question = body.get("question")
     if not question:
         raise HTTPException(status_code=400, detail="Missing question")
+    mode = request_mode(body)
 
-    rag_result = rag_service.query(question)
-    return {"response": rag_result.response if rag_result else None}
+    try:
+        rag_result = await in_flight_questions.do(
+            ("rag", id(rag_service), mode, normalize_question(question)),
+            lambda: query_pool.run(rag_service.query, question, mode),
+        )
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server is busy, try again later")
+    response = {"response": rag_result.response if rag_result else None}
+    if usage := getattr(rag_result, "usage", None):
+        response["usage"] = usage
+    return response
+
+
+@app.post("/rag/batch", dependencies=[Depends(check_started)])
+async def respond_rag_batch(request: Request):
+    """
+    Answers a list of questions in one request. Retrieval for all of them is
+    one embedding request and one store query, and the answers are generated
+    concurrently. A question whose generation fails gets an "error" instead of
+    failing the batch.
+    """
+    if not rag_service:
+        raise HTTPException(
+            status_code=409,
+            detail="RAG service is not configured. Please set a watch directory in the settings.",
+        )
 
+    body = await request.json()
+    questions = body.get("questions")
+    if not isinstance(questions, list) or not all(
+        isinstance(q, str) and q for q in questions
+    ):
+        raise HTTPException(status_code=400, detail="Missing questions")
+    if len(questions) > app_config.batch_max_questions:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {app_config.batch_max_questions} questions per batch",
+        )
+    mode = request_mode(body)
 
-@app.post("/ask")
+    try:
+        answers = await query_pool.run(rag_service.query_many, questions, mode)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server is busy, try again later")
+    responses = []
+    for answer in answers:
+        response = {
+            "question": answer.question,
+            "response": answer.response.response if answer.response else None,
+            "error": answer.error,
+        }
+        if usage := getattr(answer.response, "usage", None):
+            response["usage"] = usage
+        responses.append(response)
+    return {"responses": responses}
+
+
+@app.post("/ask", dependencies=[Depends(check_started)])
 async def respond_ask(request: Request):
     if not ai_assitant:
         raise HTTPException(
@@ -128,14 +406,117 @@ async def respond_ask(request: Request):
     question = body.get("question")
     if not question:
         raise HTTPException(status_code=400, detail="Missing question")
+    mode = request_mode(body)
 
     try:
-        answer = ai_assitant.ask(question)
-    except AuthenticationError:
-        raise HTTPException(status_code=400, detail="API key Invalidi")
+        answer = await in_flight_questions.do(
+            ("ask", id(ai_assitant), mode, normalize_question(question)),
+            lambda: query_pool.run(ai_assitant.ask, question, mode),
+        )
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server is busy, try again later")
+    except Exception as e:
+        if is_auth_error(e):
+            raise HTTPException(status_code=400, detail="API key Invalidi")
+        raise
     return {"response": answer}
 
 
+def is_auth_error(error: Exception) -> bool:
+    """True if the LLM provider rejected the API key."""
+    # The LM client has imported openai by the time it raised
+    from openai import AuthenticationError
+
+    return isinstance(error, AuthenticationError)
+
+
+def sse_event(event: str, data) -> str:
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_answer(chunks: AsyncIterator, field: str) -> AsyncIterator[str]:
+    """
+    Relays an answer stream (text chunks, then the final prediction) as "token"
+    events followed by one "done" event with the prediction's `field`. Failures
+    after the response has started are reported as an "error" event, since the
+    status code has already been sent.
+    """
+    try:
+        response = None
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                yield sse_event("token", {"token": chunk})
+            else:
+                response = getattr(chunk, field, None)
+        yield sse_event("done", {"response": response})
+    except Exception as e:
+        if is_auth_error(e):
+            yield sse_event("error", {"detail": "API key Invalidi"})
+            return
+        logger.exception("Streaming response failed")
+        yield sse_event("error", {"detail": str(e)})
+
+
+@app.post("/rag/stream", dependencies=[Depends(check_started)])
+async def stream_rag(request: Request):
+    """
+    Streams the answer as server-sent events: "sources" with the retrieved
+    documents as soon as retrieval is done, then "token" events as the LM
+    generates, and finally "done" (or "error").
+    """
+    if not rag_service:
+        raise HTTPException(
+            status_code=409,
+            detail="RAG service is not configured. Please set a watch directory in the settings.",
+        )
+
+    body = await request.json()
+    question = body.get("question")
+    if not question:
+        raise HTTPException(status_code=400, detail="Missing question")
+    mode = request_mode(body)
+
+    try:
+        sources = await query_pool.run(rag_service.retrieve, question)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Server is busy, try again later")
+
+    async def events():
+        yield sse_event("sources", [doc.model_dump() for doc in sources])
+        if not sources:
+            from src.modules.rag import NO_RELEVANT_SOURCES
+
+            yield sse_event("done", {"response": NO_RELEVANT_SOURCES})
+            return
+        async for event in stream_answer(
+            rag_service.astream(question, sources, mode), "response"
+        ):
+            yield event
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/ask/stream", dependencies=[Depends(check_started)])
+async def stream_ask(request: Request):
+    """Streams the answer as server-sent "token" events, then "done" (or "error")."""
+    if not ai_assitant:
+        raise HTTPException(
+            status_code=409,
+            detail="AI Assistant Service is not intialized. Please set an API KEY",
+        )
+    body = await request.json()
+    question = body.get("question")
+    if not question:
+        raise HTTPException(status_code=400, detail="Missing question")
+    mode = request_mode(body)
+
+    return StreamingResponse(
+        stream_answer(ai_assitant.astream(question, mode), "answer"),
+        media_type="text/event-stream",
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
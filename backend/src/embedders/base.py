@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any
 
@@ -16,3 +17,8 @@ class Embedder(ABC):
             A list of embedding vectors
 
         """
+
+    async def aembed(self, texts: list[str]) -> list[Any]:
+        """Async counterpart of `embed`. Runs `embed` in a worker thread unless
+        overridden with a native implementation."""
+        return await asyncio.to_thread(self.embed, texts)
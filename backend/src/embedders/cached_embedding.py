@@ -0,0 +1,203 @@
+"""
+Persistent embedding cache.
+
+`CachedEmbedder` wraps another Embedder and keeps every vector it produced in a
+SQLite file, keyed by (model name, hash of the text). Texts seen before, by any
+earlier run, are served from disk; only the rest reach the wrapped model.
+
+Vectors are stored as float32 blobs. When the stored vectors exceed `max_bytes`,
+the least recently used ones are evicted.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any
+
+from .base import Embedder
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def text_hash(text: str) -> str:
+    return blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class CachedEmbedder(Embedder):
+    def __init__(
+        self,
+        embedder: Embedder,
+        path: Path,
+        model_name: str | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        """
+        Args:
+            embedder: The embedder whose results are cached.
+            path: SQLite file holding the cache, created if missing.
+            model_name: Part of the cache key, so switching models never serves
+                stale vectors. Defaults to the wrapped embedder's `model_name`.
+            max_bytes: Size of the stored vectors above which the least recently
+                used ones are evicted.
+        """
+        self.embedder = embedder
+        self.path = path
+        self.model_name = model_name or getattr(
+            embedder, "model_name", type(embedder).__name__
+        )
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        (self._size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def embed(self, texts: list[str]) -> list[Any]:
+        hashes, vectors, missing = self._lookup(texts)
+        if missing:
+            embedded = self.embedder.embed(list(missing.values()))
+            vectors.update(self._store(missing, embedded))
+        return [vectors[h] for h in hashes]
+
+    async def aembed(self, texts: list[str]) -> list[Any]:
+        """Like `embed`, but misses go through the wrapped embedder's `aembed`
+        and the cache is read and written in a worker thread."""
+        hashes, vectors, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            embedded = await self.embedder.aembed(list(missing.values()))
+            vectors.update(await asyncio.to_thread(self._store, missing, embedded))
+        return [vectors[h] for h in hashes]
+
+    def _lookup(self, texts: list[str]):
+        """Returns the hash of every text, the cached vectors by hash, and the
+        texts that are not cached by hash."""
+        hashes = [text_hash(text) for text in texts]
+        vectors = self._get(set(hashes))
+
+        # Each distinct missing text is embedded once, even if repeated
+        missing = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+        n_missing = sum(h not in vectors for h in hashes)
+        with self._lock:
+            self.hits += len(texts) - n_missing
+            self.misses += n_missing
+        return hashes, vectors, missing
+
+    def _store(self, missing: dict[str, str], embedded) -> dict[str, list[float]]:
+        new = {
+            h: list(array("f", vector))
+            for h, vector in zip(missing, embedded, strict=True)
+        }
+        self._put(new)
+        return new
+
+    def _get(self, hashes: set[str]) -> dict[str, list[float]]:
+        if not hashes:
+            return {}
+        found = {}
+        now = time.time()
+        keys = list(hashes)
+        with self._lock:
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = self._conn.execute(
+                    "SELECT hash, vector FROM embeddings WHERE model = ? "
+                    f"AND hash IN ({', '.join('?' * len(batch))})",
+                    (self.model_name, *batch),
+                )
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+            if found:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? "
+                        "WHERE model = ? AND hash = ?",
+                        [(now, self.model_name, h) for h in found],
+                    )
+        return found
+
+    def _put(self, vectors: dict[str, list[float]]):
+        now = time.time()
+        rows = [
+            (self.model_name, h, array("f", vector).tobytes(), now)
+            for h, vector in vectors.items()
+        ]
+        with self._lock:
+            # Another miss for the same text (e.g. `aembed` racing `embed`) may
+            # have stored it already; the replaced rows no longer count
+            replaced = self._stored_bytes(list(vectors))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            self._size += sum(len(row[2]) for row in rows) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _stored_bytes(self, hashes: list[str]) -> int:
+        size = 0
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start : start + 500]
+            (batch_size,) = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                f"WHERE model = ? AND hash IN ({', '.join('?' * len(batch))})",
+                (self.model_name, *batch),
+            ).fetchone()
+            size += batch_size
+        return size
+
+    def _evict(self):
+        """Drops least recently used vectors until the cache is at 90% of its limit"""
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute(
+            "SELECT model, hash, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        evicted = []
+        for model, h, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((model, h))
+            self._size -= size
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND hash = ?", evicted
+            )
+        self.evictions += len(evicted)
+        logger.debug(f"Evicted {len(evicted)} cached embeddings")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,14 +1,244 @@
-from chromadb.utils.embedding_functions import OllamaEmbeddingFunction
+"""
+Embedding client for a local Ollama server.
+
+Input is split into batches of `batch_size` texts that are sent concurrently
+over one pooled HTTP client. The number of batches in flight adapts to the
+server: it grows by one after every batch that comes back at the usual speed,
+and halves when the time per text rises well above the fastest recently seen
+(the server is queueing requests rather than processing them in parallel).
+Failed batches are retried with exponential backoff, one at a time.
+
+`aembed` does the same on the event loop with ollama's AsyncClient. Sync and
+async requests are counted together against one in-flight limit, so ingestion
+threads and questions embedded on the event loop can't exceed it between them.
+Coroutines wait for a slot on their event loop, not on a thread, so a burst of
+`aembed` calls can't take up the loop's default executor.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import httpx
+from ollama import AsyncClient, Client, ResponseError
 
 from .base import Embedder
 
+logger = logging.getLogger(__name__)
+
+# What a failed request to the Ollama server raises: unreachable, timed out, or
+# answered with an error
+REQUEST_ERRORS = (ConnectionError, httpx.TransportError, ResponseError)
+
 
 class OllamaEmbedding(Embedder):
-    def __init__(self):
-        self.ollama_ef = OllamaEmbeddingFunction(
-            url="http://localhost:11434",
-            model_name="nomic-embed-text", # Dim - 768
+    def __init__(
+        self,
+        model_name: str = "nomic-embed-text",  # Dim - 768
+        url: str = "http://localhost:11434",
+        batch_size: int = 32,
+        max_in_flight: int = 4,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        slowdown: float = 2.0,
+        keep_alive: str | float | None = None,
+    ):
+        """
+        Args:
+            model_name: Ollama embedding model.
+            url: Base URL of the Ollama server.
+            batch_size: Number of texts per request.
+            max_in_flight: Upper bound on concurrent requests.
+            timeout: Seconds before a request is abandoned (and retried).
+            max_retries: Retries per batch before the error is raised.
+            retry_delay: Delay before the first retry, doubled on every retry.
+            slowdown: Factor by which the time per text may exceed the baseline
+                before the number of requests in flight is halved.
+            keep_alive: How long Ollama keeps the model loaded after a request,
+                e.g. "30m". None for the server's default.
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.slowdown = slowdown
+        self.keep_alive = keep_alive
+
+        self.url = url
+        self.timeout = timeout
+
+        # One client, so every batch reuses the same pool of keep-alive connections
+        self._client = Client(host=url, timeout=timeout)
+        # The async client's connections belong to the event loop that made them
+        self._async_client: AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="ollama-embed"
         )
+        self._cond = threading.Condition()
+        # Coroutines waiting for a slot, woken (on their loop) with the threads
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._in_flight = 0
+        self._limit = self.max_in_flight
+        self._baseline: float | None = None  # Seconds per text when not queueing
+
+    @property
+    def in_flight_limit(self) -> int:
+        """Number of requests currently allowed in flight."""
+        return self._limit
 
     def embed(self, texts):
-        return self.ollama_ef(texts)
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) <= 1:
+            return self._embed_batch(batches[0]) if batches else []
+        return [
+            vector
+            for vectors in self._pool.map(self._embed_batch, batches)
+            for vector in vectors
+        ]
+
+    async def aembed(self, texts):
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        results = await asyncio.gather(*map(self._aembed_batch, batches))
+        return [vector for vectors in results for vector in vectors]
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                with self._slot():
+                    start = time.perf_counter()
+                    response = self._client.embed(
+                        model=self.model_name, input=texts, keep_alive=self.keep_alive
+                    )
+                    self._record_latency(time.perf_counter() - start, len(texts))
+                return [list(vector) for vector in response.embeddings]
+            except REQUEST_ERRORS as e:
+                time.sleep(self._retry_delay(e, attempt))
+                attempt += 1
+
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        client = self._async_client_for_loop()
+        attempt = 0
+        while True:
+            try:
+                await self._acquire_async()
+                try:
+                    start = time.perf_counter()
+                    response = await client.embed(
+                        model=self.model_name, input=texts, keep_alive=self.keep_alive
+                    )
+                    self._record_latency(time.perf_counter() - start, len(texts))
+                finally:
+                    self._release()
+                return [list(vector) for vector in response.embeddings]
+            except REQUEST_ERRORS as e:
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                attempt += 1
+
+    def _async_client_for_loop(self) -> AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = AsyncClient(host=self.url, timeout=self.timeout)
+            self._async_loop = loop
+        return self._async_client
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Seconds to wait before retrying a failed batch, re-raising `error` if
+        it is not worth retrying."""
+        if isinstance(error, ResponseError) and error.status_code < 500:
+            raise error
+        if attempt == self.max_retries:
+            raise error
+        with self._cond:
+            self._limit = 1
+        delay = self.retry_delay * 2**attempt
+        logger.warning(f"Embedding request failed ({error}), retrying in {delay}s")
+        return delay
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+
+    async def _acquire_async(self):
+        """Takes a slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._in_flight < self._limit:
+                    self._in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            # Woken whenever a slot may have freed up; cancelling holds no slot
+            await waiter
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._notify()
+
+    def _notify(self):
+        """Wakes every thread and coroutine waiting for a slot. Call with `_cond`
+        held."""
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    def _record_latency(self, seconds: float, n_texts: int):
+        per_text = seconds / max(1, n_texts)
+        with self._cond:
+            if self._baseline is None or per_text < self._baseline:
+                self._baseline = per_text
+            else:
+                # Drift up slowly, so one unusually fast batch is not the
+                # baseline forever
+                self._baseline += 0.05 * (per_text - self._baseline)
+
+            if per_text > self._baseline * self.slowdown:
+                self._limit = max(1, self._limit // 2)
+                logger.debug(f"Embedding latency rose, {self._limit} in flight")
+            elif self._limit < self.max_in_flight:
+                self._limit += 1
+            self._notify()
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self._client.close()
+        # The async client's connections can only be closed on their loop
+        client, loop = self._async_client, self._async_loop
+        self._async_client = self._async_loop = None
+        if client is None or loop is None or loop.is_closed():
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+        else:
+            loop.run_until_complete(client.close())
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
@@ -24,11 +24,12 @@ class FileHandler:
         """# Delete all associated chunks
         """
         path = Path(path)
-        self.retriver.delete(where={"filename": path.name})
+        self.retriver.delete_file(str(path.absolute()))
 
     def handle_modify_file(self, path: str | PathLike):
         """# Reembed the chunks which was changed
         """
-        # TODO: Use chunk specific remembedding
-        self.handle_delete_file(path)
-        self.handle_new_file(path)
+        path = Path(path)
+        docs = self.parser.parse(path)
+        chunked_docs = self.splitter(docs)
+        self.retriver.replace_file(str(path.absolute()), chunked_docs)
@@ -3,17 +3,23 @@ import dspy
 from config import app_config
 
 
-def load_gemini_lm():
+def load_gemini_lm(model: str | None = None):
     GEMINI_API_KEY = app_config.gemini_api_key
     lm = dspy.LM(
-        "gemini/gemini-2.5-flash-lite", api_key=GEMINI_API_KEY, temperature=0.5
+        f"gemini/{model or app_config.gemini_model}",
+        api_key=GEMINI_API_KEY,
+        temperature=0.5,
     )
     return lm
 
 
-def load_ollama_lm():
+def load_ollama_lm(model: str | None = None):
     lm = dspy.LM(
-        "ollama_chat/qwen3:1.7b", api_base="http://localhost:11434", api_key=""
+        f"ollama_chat/{model or app_config.ollama_model}",
+        api_base="http://localhost:11434",
+        api_key="",
+        # Every request resets how long Ollama keeps the model loaded
+        keep_alive=app_config.ollama_keep_alive,
     )
     # dspy.configure(lm=lm)
     return lm
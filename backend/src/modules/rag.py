@@ -1,5 +1,10 @@
 import dspy
 
+from .tiered import LatencyStats, check_mode, generate, with_confidence
+
+# Answer given when no retrieved chunk is relevant to the question
+NO_RELEVANT_SOURCES = "No relevant sources"
+
 
 class RAGSignature(dspy.Signature):
     """Respond to the question based on the context and context only. Respond with 'No relevant sources' explicity if the context is not relevant"""
@@ -10,11 +15,70 @@ class RAGSignature(dspy.Signature):
 
 
 class RAG(dspy.Module):
-    def __init__(self, lm: dspy.LM):  # Dependency Injection
+    def __init__(
+        self,
+        lm: dspy.LM,
+        fast_lm: dspy.LM | None = None,
+        mode: str = "thorough",
+        min_confidence: float = 0.5,
+    ):  # Dependency Injection
+        """
+        Args:
+            lm: Model of the thorough (chain of thought) tier.
+            fast_lm: Model of the fast tier, `lm` if None.
+            mode: "fast", "thorough" or "auto", unless a call picks one.
+            min_confidence: Fast answers reporting less escalate in "auto" mode.
+        """
         self.respond = dspy.ChainOfThought(RAGSignature)
+        self.respond_fast = dspy.Predict(RAGSignature)
+        # Only "auto" asks for a confidence, to decide whether to escalate
+        self.respond_scored = dspy.Predict(with_confidence(RAGSignature))
         self.lm = lm
+        self.fast_lm = fast_lm or lm
+        self.mode = check_mode(mode)
+        self.min_confidence = min_confidence
+        self.stats = LatencyStats()
+        # Both tiers output "response", so each listener names its predictor
+        self._stream = dspy.streamify(
+            self,
+            stream_listeners=[
+                dspy.streaming.StreamListener(
+                    "response", predict=predict, predict_name=name, allow_reuse=True
+                )
+                for name, predict in self.named_predictors()
+            ],
+        )
+
+    def forward(self, contexts: list[str], question: str, mode: str | None = None):
+        def run(module, lm):
+            # Usage tracking lets callers report the prompt tokens of the answer
+            with dspy.context(lm=lm, track_usage=True):
+                return module(context=contexts, question=question)
+
+        mode = check_mode(mode) or self.mode
+        fast = self.respond_scored if mode == "auto" else self.respond_fast
+        return generate(
+            mode,
+            fast=lambda: run(fast, self.fast_lm),
+            thorough=lambda: run(self.respond, self.lm),
+            field="response",
+            stats=self.stats,
+            min_confidence=self.min_confidence,
+            # The fast model gave up although the sources passed retrieval
+            weak=lambda result: (
+                result.response.strip().lower().startswith(NO_RELEVANT_SOURCES.lower())
+            ),
+        )
 
-    def forward(self, contexts: list[str], question: str):
-        with dspy.context(lm=self.lm):
-            result = self.respond(context=contexts, question=question)
-        return result
+    async def astream(self, contexts: list[str], question: str, mode=None):
+        """Yields the response text in chunks as the LM produces it, then the
+        final prediction. "auto" streams the fast tier without escalating, as
+        the fast answer would already have been sent."""
+        mode = check_mode(mode) or self.mode
+        if mode == "auto":
+            mode = "fast"
+        async for item in self._stream(contexts=contexts, question=question, mode=mode):
+            if isinstance(item, dspy.streaming.StreamResponse):
+                yield item.chunk
+            elif isinstance(item, dspy.Prediction):
+                yield item
@@ -0,0 +1,142 @@
+"""
+Latency tiers for generation.
+
+"fast" answers with a plain `dspy.Predict` (no reasoning tokens), usually on a
+smaller model; "thorough" uses chain of thought. "auto" answers fast first and
+escalates to thorough when the fast answer is empty, can't be parsed, reports a
+confidence below `min_confidence`, or is otherwise judged weak by the caller.
+
+In "auto" mode the fast signature also asks for a `confidence` between 0 and 1
+next to the answer; plain "fast" keeps the signature's own prompt. Small models
+are not well calibrated, so treat it as a coarse signal.
+"""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+import dspy
+from dspy.utils.exceptions import AdapterParseError
+
+MODES = ("fast", "thorough", "auto")
+
+
+class InvalidModeError(ValueError):
+    def __init__(self, mode):
+        self.message = f"Unknown mode {mode!r}, expected one of {MODES}"
+        super().__init__(self.message)
+
+
+def check_mode(mode: str | None) -> str | None:
+    if mode is not None and mode not in MODES:
+        raise InvalidModeError(mode)
+    return mode
+
+
+def with_confidence(signature: type[dspy.Signature]) -> type[dspy.Signature]:
+    """`signature` with an extra `confidence` output, for the fast tier."""
+    return signature.append(
+        "confidence",
+        dspy.OutputField(
+            desc="How certain the answer is, from 0 (guess) to 1 (certain)"
+        ),
+        type_=float,
+    )
+
+
+class LatencyStats:
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Latest calls per mode the percentiles are computed over.
+        """
+        self._samples = {mode: deque(maxlen=window) for mode in MODES}
+        self._counts = dict.fromkeys(MODES, 0)
+        self._escalations = 0
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, seconds: float, escalated: bool = False):
+        with self._lock:
+            self._samples[mode].append(seconds)
+            self._counts[mode] += 1
+            self._escalations += escalated
+
+    def snapshot(self) -> dict:
+        """Calls and latency (ms) per mode, and how many "auto" calls escalated."""
+        with self._lock:
+            stats = {}
+            for mode, samples in self._samples.items():
+                ordered = sorted(samples)
+                stats[mode] = {
+                    "count": self._counts[mode],
+                    "mean_ms": _ms(sum(ordered) / len(ordered)) if ordered else None,
+                    "p50_ms": _ms(_percentile(ordered, 0.50)),
+                    "p95_ms": _ms(_percentile(ordered, 0.95)),
+                }
+            stats["auto"]["escalated"] = self._escalations
+            return stats
+
+
+def _percentile(ordered: list[float], q: float) -> float | None:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def generate(
+    mode: str,
+    fast: Callable[[], dspy.Prediction],
+    thorough: Callable[[], dspy.Prediction],
+    field: str,
+    stats: LatencyStats,
+    min_confidence: float = 0.5,
+    weak: Callable[[dspy.Prediction], bool] | None = None,
+) -> dspy.Prediction:
+    """
+    Runs the tier(s) for `mode` and records the latency. The prediction's
+    "mode" is the tier that produced it.
+
+    Args:
+        fast: Produces the fast answer.
+        thorough: Produces the thorough answer.
+        field: Output field holding the answer.
+        min_confidence: Fast answers reporting less escalate in "auto" mode.
+        weak: Further test for fast answers that should escalate.
+    """
+    check_mode(mode)
+    start = time.perf_counter()
+    escalated = False
+    if mode == "thorough":
+        result = thorough()
+    else:
+        try:
+            result = fast()
+        except AdapterParseError:
+            if mode == "fast":
+                raise
+            result = None
+        if mode == "auto" and _needs_escalation(result, field, min_confidence, weak):
+            result = thorough()
+            escalated = True
+    stats.record(mode, time.perf_counter() - start, escalated)
+    result["mode"] = "thorough" if mode == "thorough" or escalated else "fast"
+    return result
+
+
+def _needs_escalation(
+    result: dspy.Prediction | None,
+    field: str,
+    min_confidence: float,
+    weak: Callable[[dspy.Prediction], bool] | None,
+) -> bool:
+    if result is None or not str(result.get(field) or "").strip():
+        return True
+    confidence = result.get("confidence")
+    if confidence is not None and confidence < min_confidence:
+        return True
+    return weak is not None and weak(result)
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from os import PathLike
+from pathlib import Path
 from typing import Any
 
 
@@ -6,3 +8,12 @@ class Parser(ABC):
     @abstractmethod
     def parse(self, *args, **kwargs) -> Any:
         pass
+
+    def metadata(self, filename: str | PathLike) -> dict[str, Any]:
+        """Metadata attached to every document parsed from `filename`"""
+        filepath = Path(filename)
+        return {
+            "filepath": str(filepath.absolute()),
+            "filename": filepath.name,
+            "extension": filepath.suffix,
+        }
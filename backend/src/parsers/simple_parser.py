@@ -10,12 +10,5 @@ class SimpleMarkdownParser(Parser):
         text = filepath.read_text()
 
         return [
-            Document(
-                content=text,
-                metadata={
-                    "filepath": str(filepath.absolute()),
-                    "filename": filepath.name,
-                    "extension": filepath.suffix,
-                },
-            ),
+            Document(content=text, metadata=self.metadata(filepath)),
         ]
@@ -0,0 +1,135 @@
+"""
+Context assembly between retrieval and generation.
+
+The retriever is asked for `fetch_factor` times more chunks than are used. The
+candidates are then re-ordered with Maximal Marginal Relevance: each pick
+trades the chunk's retrieval rank against its cosine similarity to the chunks
+already picked, so a near-copy of a picked chunk falls behind a chunk that adds
+something new (and one above `duplicate_threshold` is dropped outright).
+Similarities use the vectors the store already holds, so nothing is embedded.
+Relevance is the retrieval rank rather than a similarity to the question, since
+hybrid results are ordered by fused ranks, not by cosine.
+
+Finally chunks are packed in that order until `max_chunks` are taken or the
+next one would exceed `token_budget`, which bounds the prompt size and with it
+the LLM's prefill time. Tokens are estimated from the text length, as the
+local model's tokenizer isn't available here.
+"""
+
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+from ..common_types.base import Document, Documents
+from ..stores.base import Store, document_id
+
+
+class AssembledContext(NamedTuple):
+    documents: Documents
+    tokens: int  # Estimated tokens of the packed chunks
+    candidates: int  # Chunks retrieved before de-duplication and packing
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    return math.ceil(len(text) / chars_per_token)
+
+
+class ContextAssembler:
+    def __init__(
+        self,
+        store: Store,
+        max_chunks: int = 4,
+        token_budget: int = 2000,
+        fetch_factor: int = 3,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.97,
+        chars_per_token: float = 4.0,
+    ):
+        """
+        Args:
+            store: Store the candidates came from, for their vectors.
+            max_chunks: Chunks passed to the generator at most.
+            token_budget: Estimated tokens the packed chunks may take.
+            fetch_factor: Candidates retrieved per chunk used.
+            mmr_lambda: Weight of relevance against novelty, from 0 (only
+                novelty) to 1 (retrieval order, duplicates aside).
+            duplicate_threshold: Cosine similarity to a picked chunk above
+                which a candidate is dropped.
+            chars_per_token: Characters per token, for the estimate.
+        """
+        self.store = store
+        self.max_chunks = max(1, max_chunks)
+        self.token_budget = token_budget
+        self.fetch_factor = max(1, fetch_factor)
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.chars_per_token = chars_per_token
+
+    @property
+    def fetch_k(self) -> int:
+        """Number of candidates to retrieve."""
+        return self.max_chunks * self.fetch_factor
+
+    def tokens(self, doc: Document) -> int:
+        return estimate_tokens(doc.content or "", self.chars_per_token)
+
+    def assemble(self, candidates: Documents) -> AssembledContext:
+        """Picks and packs the chunks passed to the generator, best first."""
+        candidates = [doc for doc in candidates if doc.content]
+        documents, tokens = [], 0
+        for doc in self.rerank(candidates):
+            doc_tokens = self.tokens(doc)
+            if tokens + doc_tokens > self.token_budget:
+                continue
+            documents.append(doc)
+            tokens += doc_tokens
+            if len(documents) == self.max_chunks:
+                break
+
+        if not documents and candidates:
+            # Even the best chunk alone is over budget: pass what fits of it
+            best = candidates[0]
+            chars = int(self.token_budget * self.chars_per_token)
+            documents = [best.model_copy(update={"content": best.content[:chars]})]
+            tokens = self.tokens(documents[0])
+        return AssembledContext(documents, tokens, len(candidates))
+
+    def rerank(self, candidates: Documents) -> Documents:
+        """Orders `candidates` by MMR, dropping near-duplicates."""
+        if len(candidates) < 2:
+            return list(candidates)
+
+        ids = [document_id(doc) for doc in candidates]
+        stored = self.store.vectors(ids)
+        vectors = [stored.get(doc_id) for doc_id in ids]
+        # Chunks without a stored vector (e.g. lexical-only hits) count as
+        # novel, and two identical texts as duplicates
+        dim = next((len(v) for v in vectors if v is not None), 0)
+        matrix = np.zeros((len(candidates), dim), dtype=np.float32)
+        for i, vector in enumerate(vectors):
+            if vector is not None:
+                matrix[i] = vector
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        similarity = matrix @ matrix.T
+        for i, j in np.ndindex(similarity.shape):
+            if candidates[i].content == candidates[j].content:
+                similarity[i, j] = 1.0
+
+        n = len(candidates)
+        relevance = 1.0 - np.arange(n) / n
+        redundancy = np.full(n, -np.inf)
+        remaining = list(range(n))
+        order = []
+        while remaining:
+            novelty = np.where(np.isinf(redundancy), 0.0, redundancy)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * novelty
+            best = max(remaining, key=lambda i: scores[i])
+            remaining.remove(best)
+            if redundancy[best] >= self.duplicate_threshold:
+                continue
+            order.append(best)
+            redundancy = np.maximum(redundancy, similarity[best])
+        return [candidates[i] for i in order]
@@ -0,0 +1,209 @@
+"""
+Pipelined ingestion of files into a vector store.
+
+Files go through three stages that run concurrently:
+
+1. Parse: up to `parse_workers` files are loaded (parsed and chunked) at once.
+2. Embed: chunks not already in the store are embedded in batches of
+   `batch_size`, with at most `embed_workers` embedding requests in flight.
+3. Write: a single writer thread owns all store writes, so the store never sees
+   concurrent mutations.
+
+A failing file is reported and skipped; it does not stop the rest of the batch.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from ..common_types.base import Documents
+from ..embedders.base import Embedder
+from ..embedders.ollama_embedding import REQUEST_ERRORS
+from ..stores.base import Store, document_id
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# What ingesting one file can raise: reading or parsing it (OSError, ValueError),
+# the embedding request failing, or the store's database failing
+INGEST_ERRORS = (OSError, ValueError, sqlite3.Error, *REQUEST_ERRORS)
+
+
+class IngestionStats(NamedTuple):
+    """Summary of one pipeline run."""
+
+    files: int
+    chunks: int
+    failed: int
+    seconds: float
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+class IngestionPipeline:
+    def __init__(
+        self,
+        loader: Callable[[Path], Documents],
+        embedder: Embedder,
+        store: Store,
+        parse_workers: int = 4,
+        embed_workers: int = 2,
+        batch_size: int = 32,
+        store_content: bool = True,
+    ):
+        """
+        Args:
+            loader: Turns a file into the documents (chunks) to store.
+            embedder: Embeds the chunk contents.
+            store: Receives the chunks together with their embeddings.
+            parse_workers: Number of files loaded concurrently.
+            embed_workers: Number of embedding requests in flight.
+            batch_size: Number of chunks per embedding request.
+            store_content: Whether the store keeps the chunk text.
+        """
+        self.loader = loader
+        self.embedder = embedder
+        self.store = store
+        self.parse_workers = max(1, parse_workers)
+        self.embed_workers = max(1, embed_workers)
+        self.batch_size = max(1, batch_size)
+        self.store_content = store_content
+        self.last_stats: IngestionStats | None = None
+
+    def run(
+        self,
+        paths: Iterable[Path],
+        replace: Iterable[Path] = (),
+        on_result: Callable[[Path, Exception | None], Any] | None = None,
+        stop: threading.Event | None = None,
+    ) -> IngestionStats:
+        """
+        Ingests `paths` and blocks until every file is written or has failed.
+
+        Args:
+            paths: Files to ingest.
+            replace: Subset of `paths` whose previously stored chunks are replaced
+                by the new ones; chunks that did not change are kept.
+            on_result: Called from the writer thread once per file, with the
+                exception if the file failed and None otherwise.
+            stop: Once set, files that weren't started yet are skipped, without
+                a call to `on_result`.
+
+        Returns:
+            Throughput statistics for this run.
+        """
+        paths = list(paths)
+        replace = set(replace)
+        start = time.perf_counter()
+
+        write_queue: queue.Queue = queue.Queue(maxsize=self.parse_workers * 2)
+        parse_slots = threading.BoundedSemaphore(self.parse_workers)
+        embed_slots = threading.BoundedSemaphore(self.embed_workers)
+        counts = {"files": 0, "chunks": 0, "failed": 0}
+
+        def report(path: Path, error: Exception | None):
+            if error is not None:
+                counts["failed"] += 1
+                logger.error(f"Failed to ingest {path}: {error}")
+            if on_result is not None:
+                on_result(path, error)
+
+        def write_loop():
+            try:
+                while (item := write_queue.get()) is not _DONE:
+                    write(*item)
+            except BaseException as e:
+                logger.exception("Ingestion writer failed")
+                # Raised by run() once the parse workers are done; draining the
+                # queue keeps them from blocking on it meanwhile
+                writer_error.append(e)
+                while write_queue.get() is not _DONE:
+                    pass
+
+        def write(path: Path, docs, embeddings, error: Exception | None):
+            if error is None:
+                try:
+                    if path in replace:
+                        self.store.replace_file(
+                            str(path.absolute()),
+                            docs,
+                            self.store_content,
+                            embeddings=embeddings,
+                        )
+                    elif docs:
+                        self.store.add(docs, self.store_content, embeddings=embeddings)
+                    counts["files"] += 1
+                    counts["chunks"] += len(docs)
+                except INGEST_ERRORS as e:
+                    error = e
+            report(path, error)
+
+        def process(path: Path):
+            if stop is not None and stop.is_set():
+                return
+            try:
+                with parse_slots:
+                    docs = [doc for doc in self.loader(path) if doc.content]
+
+                # Chunks the store already holds (same file, same text) keep
+                # their vectors; only the rest are embedded
+                stored = self.store.existing_ids([document_id(doc) for doc in docs])
+                embeddings = [None] * len(docs)
+                missing = [
+                    i for i, doc in enumerate(docs) if document_id(doc) not in stored
+                ]
+                for start in range(0, len(missing), self.batch_size):
+                    batch = missing[start : start + self.batch_size]
+                    with embed_slots:
+                        vectors = self.embedder.embed([docs[i].content for i in batch])
+                    for i, vector in zip(batch, vectors, strict=True):
+                        embeddings[i] = vector
+                write_queue.put((path, docs, embeddings, None))
+            except INGEST_ERRORS as e:
+                write_queue.put((path, None, None, e))
+
+        writer_error: list[BaseException] = []
+        writer = threading.Thread(target=write_loop, name="ingest-writer", daemon=True)
+        writer.start()
+        try:
+            # One thread per parse and embed slot, so parsing continues while
+            # other files wait on embedding responses
+            with ThreadPoolExecutor(
+                max_workers=self.parse_workers + self.embed_workers,
+                thread_name_prefix="ingest",
+            ) as pool:
+                list(pool.map(process, paths))
+        finally:
+            write_queue.put(_DONE)
+            writer.join()
+        if writer_error:
+            raise writer_error[0]
+
+        stats = IngestionStats(
+            files=counts["files"],
+            chunks=counts["chunks"],
+            failed=counts["failed"],
+            seconds=time.perf_counter() - start,
+        )
+        self.last_stats = stats
+        if paths:
+            logger.info(
+                f"Ingested {stats.files} files ({stats.chunks} chunks, "
+                f"{stats.failed} failed) in {stats.seconds:.2f}s: "
+                f"{stats.files_per_sec:.1f} files/sec, "
+                f"{stats.chunks_per_sec:.1f} chunks/sec"
+            )
+        return stats
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any
 
@@ -12,10 +13,31 @@ class Retriver(ABC):
     def query(self, input: list[str], *args, **kwargs) -> Any:
         """Retrive the valuues"""
 
+    async def aquery(self, input: list[str], *args, **kwargs) -> Any:
+        """Async counterpart of `query`, run in a worker thread by default"""
+        return await asyncio.to_thread(self.query, input, *args, **kwargs)
+
     @abstractmethod
     def add(self, docs: Documents, *args, **kwargs) -> Any:
         """Add documents to the vector store"""
 
+    async def aadd(self, docs: Documents, *args, **kwargs) -> Any:
+        """Async counterpart of `add`, run in a worker thread by default"""
+        return await asyncio.to_thread(self.add, docs, *args, **kwargs)
+
     @abstractmethod
     def delete(self, *args, **kwargs) -> Any:
         """Delete documents"""
+
+    def replace(self, docs: Documents, where, *args, **kwargs) -> Any:
+        """Replace the documents matching `where` with `docs`"""
+        self.delete(where=where)
+        self.add(docs, *args, **kwargs)
+
+    def replace_file(self, filepath: str, docs: Documents, *args, **kwargs) -> Any:
+        """Replace the documents of the file at `filepath` with `docs`"""
+        self.replace(docs, {"filepath": filepath}, *args, **kwargs)
+
+    def delete_file(self, filepath: str) -> Any:
+        """Delete the documents of the file at `filepath`"""
+        self.delete(where={"filepath": filepath})
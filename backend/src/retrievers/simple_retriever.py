@@ -15,10 +15,27 @@ class SimpleRetriver(Retriver):
     def add(self, docs: Documents):
         self.store.add(docs, self.store_content)
 
+    async def aadd(self, docs: Documents):
+        await self.store.aadd(docs, self.store_content)
+
     def query(self, input: list[str], k: int | None = None) -> list[Documents] | None:
         result = self.store.query(texts=input, k=(k or self.k))
         return result
 
+    async def aquery(
+        self, input: list[str], k: int | None = None
+    ) -> list[Documents] | None:
+        return await self.store.aquery(texts=input, k=(k or self.k))
+
+    def replace(self, docs: Documents, where):
+        self.store.replace(docs, where, self.store_content)
+
+    def replace_file(self, filepath: str, docs: Documents):
+        self.store.replace_file(filepath, docs, self.store_content)
+
+    def delete_file(self, filepath: str):
+        self.store.delete_file(filepath)
+
     def delete(self, *args, **kwargs) -> list[Documents] | None:
         result = self.store.delete(*args, **kwargs)
         return result
@@ -0,0 +1,38 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator, Mapping
+from os import PathLike
+from pathlib import Path
+from typing import Any
+
+from ..common_types.base import Document, Documents
+
+
+class Splitter(ABC):
+    """
+    Splits documents into chunks. A splitter is also a
+    `Callable[[Documents], Documents]`, so it can be used as the splitter stage
+    of a FileHandler or DocumentRAG.
+    """
+
+    @abstractmethod
+    def split_lines(
+        self, lines: Iterable[str], metadata: Mapping[str, Any]
+    ) -> Iterator[Document]:
+        """Lazily yields the chunks of the text made up of `lines`"""
+
+    def split_file(
+        self, path: str | PathLike, metadata: Mapping[str, Any]
+    ) -> Iterator[Document]:
+        """Streams a file through the splitter without reading it all at once"""
+        with Path(path).open() as f:
+            yield from self.split_lines(f, metadata)
+
+    def __call__(self, docs: Documents) -> Documents:
+        return [
+            chunk
+            for doc in docs
+            if doc.content
+            for chunk in self.split_lines(
+                doc.content.splitlines(keepends=True), doc.metadata or {}
+            )
+        ]
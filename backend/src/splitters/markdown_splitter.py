@@ -0,0 +1,92 @@
+"""
+Heading-aware markdown splitter.
+
+Text is consumed one line at a time and cut into chunks of at most `chunk_size`
+characters. Every heading starts a new chunk, so a chunk never mixes sections,
+and each chunk records the headings it sits under in its "section" metadata.
+Sections that do not fit in one chunk are cut at the last paragraph break that
+fits, then at line boundaries, and only lines longer than `chunk_size` are cut
+mid-line. Lines inside fenced code blocks are never taken for headings.
+
+Only the chunk being built is held in memory, so splitting a file with
+`split_file` does not depend on the size of the file.
+"""
+
+import re
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any
+
+from ..common_types.base import Document
+from .base import Splitter
+
+HEADING = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t#]*$")
+FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+
+class MarkdownSplitter(Splitter):
+    def __init__(self, chunk_size: int = 1000):
+        """
+        Args:
+            chunk_size: Maximum number of characters per chunk.
+        """
+        self.chunk_size = max(1, chunk_size)
+
+    def split_lines(
+        self, lines: Iterable[str], metadata: Mapping[str, Any]
+    ) -> Iterator[Document]:
+        headings: list[tuple[int, str]] = []  # (level, title) of enclosing headings
+        section = ""
+        buffer: list[str] = []
+        size = 0
+        paragraph_end = 0  # Lines in `buffer` up to and including the last blank one
+        fence: str | None = None  # Opening marker of the code block we are in
+
+        def chunk(chunk_lines: list[str]) -> Document | None:
+            content = "".join(chunk_lines).strip()
+            if not content:
+                return None
+            return Document(content=content, metadata={**metadata, "section": section})
+
+        for line in lines:
+            if fence is None and (match := HEADING.match(line)):
+                if doc := chunk(buffer):
+                    yield doc
+                buffer, size, paragraph_end = [], 0, 0
+
+                level = len(match.group(1))
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, match.group(2)))
+                section = " > ".join(title for _, title in headings)
+            elif match := FENCE.match(line):
+                marker = match.group(1)
+                if fence is None:
+                    fence = marker
+                elif marker[0] == fence[0] and len(marker) >= len(fence):
+                    fence = None
+
+            if size + len(line) > self.chunk_size and buffer:
+                # Prefer ending the chunk at a paragraph break
+                if 0 < paragraph_end < len(buffer):
+                    if doc := chunk(buffer[:paragraph_end]):
+                        yield doc
+                    buffer = buffer[paragraph_end:]
+                    size = sum(map(len, buffer))
+                    paragraph_end = 0
+                if size + len(line) > self.chunk_size:
+                    if doc := chunk(buffer):
+                        yield doc
+                    buffer, size, paragraph_end = [], 0, 0
+
+            while len(line) > self.chunk_size:
+                if doc := chunk([line[: self.chunk_size]]):
+                    yield doc
+                line = line[self.chunk_size :]
+
+            buffer.append(line)
+            size += len(line)
+            if not line.strip():
+                paragraph_end = len(buffer)
+
+        if doc := chunk(buffer):
+            yield doc
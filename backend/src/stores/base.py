@@ -1,6 +1,67 @@
+import asyncio
+import json
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from hashlib import sha256
+from typing import Any
 
-from ..common_types.base import Documents
+import numpy as np
+
+from ..common_types.base import Document, Documents
+
+# Metadata that stores add to query results, not part of a chunk's identity
+QUERY_METADATA = ("distance", "similarity")
+
+
+def document_id(doc: Document) -> str:
+    """
+    Content-addressed ID of a chunk: the same text with the same metadata (which
+    includes the source file) always gets the same ID, so unchanged chunks can be
+    recognized without embedding them.
+    """
+    metadata = {
+        key: value
+        for key, value in (doc.metadata or {}).items()
+        if key not in QUERY_METADATA
+    }
+    key = json.dumps([metadata, doc.content], sort_keys=True, default=str)
+    return sha256(key.encode()).hexdigest()[:32]
+
+
+def cosine_similarity(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+def matches(metadata: Mapping[str, Any], where: Mapping[str, Any] | None) -> bool:
+    """
+    Evaluates a Chroma style `where` filter: {"key": value} for equality,
+    {"key": {"$eq" | "$ne" | "$in" | "$nin": ...}}, and "$and" / "$or" lists.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, Mapping):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
 
 
 class Store(ABC):
@@ -8,10 +69,59 @@ class Store(ABC):
     def add(self, documents, *args, **kwargs):
         """Add documents"""
 
+    async def aadd(self, documents, *args, **kwargs):
+        """Async counterpart of `add`, run in a worker thread by default"""
+        return await asyncio.to_thread(self.add, documents, *args, **kwargs)
+
     @abstractmethod
     def delete(self, *args, **kwargs):
         """Delete Docs"""
 
+    def replace(self, documents, where, *args, **kwargs):
+        """Replace the documents matching `where` with `documents`"""
+        self.delete(where=where)
+        self.add(documents, *args, **kwargs)
+
+    def replace_file(self, filepath: str, documents, *args, **kwargs):
+        """Replace the chunks of the file at `filepath` with `documents`"""
+        self.replace(documents, {"filepath": filepath}, *args, **kwargs)
+
+    def delete_file(self, filepath: str):
+        """Delete the chunks of the file at `filepath`"""
+        self.delete(where={"filepath": filepath})
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        """IDs from `ids` that are already stored (empty if unsupported)"""
+        return set()
+
+    def vectors(self, ids: list[str]) -> dict[str, list[float]]:
+        """Stored embeddings of the chunks with the given `ids` (empty if
+        unsupported)"""
+        return {}
+
+    def ids_by_file(self) -> dict[str | None, set[str]]:
+        """IDs of all stored chunks, grouped by their "filepath" metadata"""
+        raise NotImplementedError(f"{type(self).__name__} can't list its chunks")
+
+    def _new_documents(self, docs: Documents, embeddings=None):
+        """
+        Drops the documents that are already stored or repeated in `docs`.
+
+        Returns:
+            The remaining documents, their IDs, and their embeddings (None if
+            `embeddings` is None).
+        """
+        ids = [document_id(doc) for doc in docs]
+        seen = self.existing_ids(ids)
+        keep = []
+        for i, doc_id in enumerate(ids):
+            if doc_id not in seen:
+                seen.add(doc_id)
+                keep.append(i)
+        if embeddings is not None:
+            embeddings = [embeddings[i] for i in keep]
+        return [docs[i] for i in keep], [ids[i] for i in keep], embeddings
+
     @abstractmethod
     def reset(self) -> bool:
         """Delete all the data"""
@@ -20,6 +130,13 @@ class Store(ABC):
     def query(self, texts, *args, **kwargs) -> list[Documents] | None:
         """Query"""
 
+    async def aquery(self, texts, *args, **kwargs) -> list[Documents] | None:
+        """Async counterpart of `query`, run in a worker thread by default"""
+        return await asyncio.to_thread(self.query, texts, *args, **kwargs)
+
+    def close(self):
+        """Release the resources held by the store"""
+
     # For debugging
     @abstractmethod
     def get(self, texts, *args, **kwargs) -> Documents | None:
@@ -0,0 +1,178 @@
+"""
+Lexical store: an in-memory inverted index ranked with Okapi BM25.
+
+Finds chunks by the words they contain rather than by meaning, which is what
+short queries made of identifiers (file names, error codes, tags) need, and it
+needs no embedder. Tokens are lower-cased runs of letters, digits and `_`;
+dotted or dashed names such as `app_config.json` or `E-1042` are indexed both
+whole and by their parts. The file name and section of a chunk are indexed
+along with its text.
+
+The index lives in memory only. Build it from the chunks a persistent store
+already holds with `add(store.get())` at startup.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+from ..common_types.base import Document, Documents
+from .base import Store, document_id, matches
+
+TOKEN = re.compile(r"\w+(?:[.\-]\w+)*")
+# Metadata fields whose values are searchable along with the text
+INDEXED_FIELDS = ("filename", "section")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if "." in token or "-" in token:
+            tokens.extend(part for part in re.split(r"[.\-]", token) if part)
+    return tokens
+
+
+class BM25Store(Store):
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            k1: Term frequency saturation; higher lets repeated terms count more.
+            b: Document length normalization, from 0 (none) to 1 (full).
+        """
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _terms(self, doc: Document) -> Counter:
+        metadata = doc.metadata or {}
+        fields = [str(metadata[f]) for f in INDEXED_FIELDS if metadata.get(f)]
+        return Counter(tokenize(" ".join([*fields, doc.content or ""])))
+
+    # --- Writes ---
+
+    def add(self, docs: Documents, *args, **kwargs):
+        """
+        Index documents. Chunks that are already indexed (or repeated in `docs`)
+        are skipped; extra arguments meant for vector stores are ignored.
+        """
+        with self._lock:
+            for doc in docs:
+                doc_id = document_id(doc)
+                if doc_id in self._docs:
+                    continue
+                terms = self._terms(doc)
+                self._docs[doc_id] = doc
+                self._terms_of[doc_id] = terms
+                self._lengths[doc_id] = sum(terms.values())
+                self._total_length += self._lengths[doc_id]
+                for term, count in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = count
+
+    def replace(self, docs: Documents, where, *args, **kwargs):
+        """Make `docs` the only documents matching `where`."""
+        with self._lock:
+            stale = self.get_ids(where) - {document_id(doc) for doc in docs}
+            self.delete(ids=list(stale))
+            self.add(docs)
+
+    def delete(self, ids: list[str] | None = None, where=None):
+        """Deletes the chunks with the given `ids` and/or matching `where`."""
+        with self._lock:
+            for doc_id in self._select(ids, where):
+                del self._docs[doc_id]
+                terms = self._terms_of.pop(doc_id)
+                self._total_length -= self._lengths.pop(doc_id)
+                for term in terms:
+                    postings = self._postings[term]
+                    del postings[doc_id]
+                    if not postings:
+                        del self._postings[term]
+
+    def reset(self):
+        with self._lock:
+            self._docs: dict[str, Document] = {}
+            self._terms_of: dict[str, Counter] = {}
+            self._lengths: dict[str, int] = {}  # Tokens per chunk
+            # term -> {chunk id -> occurrences of the term in the chunk}
+            self._postings: dict[str, dict[str, int]] = {}
+            self._total_length = 0
+        return True
+
+    # --- Reads ---
+
+    def _select(self, ids: list[str] | None = None, where=None) -> list[str]:
+        if ids is not None:
+            selected = [i for i in dict.fromkeys(ids) if i in self._docs]
+        else:
+            selected = list(self._docs)
+        if where:
+            selected = [i for i in selected if matches(self._docs[i].metadata, where)]
+        return selected
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        with self._lock:
+            return {doc_id for doc_id in ids if doc_id in self._docs}
+
+    def get_ids(self, where=None) -> set[str]:
+        with self._lock:
+            return set(self._select(where=where))
+
+    def ids_by_file(self) -> dict[str | None, set[str]]:
+        with self._lock:
+            files: dict[str | None, set[str]] = {}
+            for doc_id, doc in self._docs.items():
+                filepath = (doc.metadata or {}).get("filepath")
+                files.setdefault(filepath, set()).add(doc_id)
+            return files
+
+    def get(self, ids: list[str] | None = None, where=None, **kwargs) -> Documents:
+        with self._lock:
+            return [self._docs[doc_id] for doc_id in self._select(ids, where)]
+
+    def scores(self, text: str, where=None) -> dict[str, float]:
+        """BM25 score of every chunk containing at least one term of `text`."""
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return {}
+            avg_length = self._total_length / n_docs
+            scores: dict[str, float] = {}
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(
+                    1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for doc_id, tf in postings.items():
+                    length = self._lengths[doc_id]
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    weight = tf * (self.k1 + 1) / (tf + norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * weight
+            if where:
+                scores = {
+                    doc_id: score
+                    for doc_id, score in scores.items()
+                    if matches(self._docs[doc_id].metadata, where)
+                }
+            return scores
+
+    def ranked(self, text: str, k: int, where=None) -> list[tuple[str, float]]:
+        """The `k` best (chunk ID, score) pairs for `text`, best first."""
+        scores = self.scores(text, where)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def query(self, texts, k: int = 1, where=None) -> list[Documents]:
+        with self._lock:
+            return [
+                [self._docs[doc_id] for doc_id, _ in self.ranked(text, k, where)]
+                for text in texts
+            ]
@@ -1,11 +1,11 @@
-from uuid import uuid4 as rand_uid
+import asyncio
 
 from chromadb import Client, PersistentClient
 from chromadb.api.models.CollectionCommon import QueryResult
 
 from ..common_types.base import Document, Documents
 from ..embedders.base import Embedder
-from ..stores.base import Store
+from ..stores.base import Store, cosine_similarity, document_id
 
 
 class ChromaStore(Store):
@@ -18,7 +18,33 @@ class ChromaStore(Store):
             name=store_name, embedding_function=None, get_or_create=True
         )
 
-    def add(self, docs: Documents, store_content=True):
+    def add(self, docs: Documents, store_content=True, embeddings=None):
+        """
+        Add documents, embedding them unless `embeddings` are precomputed.
+
+        Chunk IDs are derived from the file path and content, so chunks that are
+        already stored (or repeated within `docs`) are skipped without embedding.
+        """
+        docs, ids, embeddings = self._new_documents(docs, embeddings)
+        if not docs:
+            return
+        if embeddings is None:
+            embeddings = self.embedder.embed([doc.content for doc in docs])
+        self._write(docs, ids, embeddings, store_content)
+
+    async def aadd(self, docs: Documents, store_content=True, embeddings=None):
+        """Async `add`: embeds through `Embedder.aembed`, and runs the (local,
+        blocking) Chroma calls in a worker thread."""
+        docs, ids, embeddings = await asyncio.to_thread(
+            self._new_documents, docs, embeddings
+        )
+        if not docs:
+            return
+        if embeddings is None:
+            embeddings = await self.embedder.aembed([doc.content for doc in docs])
+        await asyncio.to_thread(self._write, docs, ids, embeddings, store_content)
+
+    def _write(self, docs: Documents, ids: list[str], embeddings, store_content=True):
         contents = [doc.content for doc in docs]
         # If metadatas is provided to collection.add(), chroma expects it to be non Empty Mapping
         # Therefore for compatibilty the {'source': 'unknown'} is added
@@ -40,33 +66,100 @@ class ChromaStore(Store):
 
             metas.append(m)
 
-        embeds = self.embedder.embed(contents)
-        ids = [str(rand_uid()) for _ in range(len(docs))]
         self.collection.add(
             ids=ids,
             documents=contents if store_content else None,
             metadatas=metas,
-            embeddings=embeds,
+            embeddings=embeddings,
         )
 
     def query(self, texts, k: int = 1, *args, **kwargs):
-        embeds = self.embedder.embed(texts)
+        return self._query(self.embedder.embed(texts), k, *args, **kwargs)
+
+    async def aquery(self, texts, k: int = 1, *args, **kwargs):
+        """Async `query`: embeds through `Embedder.aembed`, and runs the (local,
+        blocking) Chroma search in a worker thread."""
+        embeds = await self.embedder.aembed(texts)
+        return await asyncio.to_thread(self._query, embeds, k, *args, **kwargs)
+
+    def _query(self, embeds, k: int = 1, *args, **kwargs):
+        """
+        Every result's metadata gets Chroma's "distance" (in the collection's
+        space) and the cosine "similarity" to the query, computed from the
+        stored vector so it doesn't depend on that space.
+        """
         results: QueryResult = self.collection.query(
-            query_embeddings=embeds, n_results=k, *args, **kwargs
+            query_embeddings=embeds,
+            n_results=k,
+            *args,
+            include=["documents", "metadatas", "distances", "embeddings"],
+            **kwargs,
         )
         if results["documents"] is None:
             return None
 
         documents = results["documents"]
-        metadatas = results["metadatas"] or [[]]
+        metadatas = results["metadatas"] or [[]] * len(documents)
         return [
             [
-                Document(metadata=metadata, content=content)
-                for metadata, content in zip(metadatas, contents, strict=False)
+                Document(
+                    metadata={
+                        **(metadata or {}),
+                        "distance": float(distance),
+                        "similarity": cosine_similarity(query, vector),
+                    },
+                    content=content,
+                )
+                for metadata, content, distance, vector in zip(
+                    metadatas, contents, distances, vectors, strict=False
+                )
             ]
-            for metadatas, contents in zip(metadatas, documents, strict=False)
+            for query, metadatas, contents, distances, vectors in zip(
+                embeds,
+                metadatas,
+                documents,
+                results["distances"],
+                results["embeddings"],
+                strict=False,
+            )
         ]
 
+    def replace(self, docs: Documents, where, store_content=True, embeddings=None):
+        """
+        Make `docs` the only documents matching `where`: chunks that vanished are
+        deleted, new ones added, and unchanged ones left alone (not re-embedded).
+        """
+        stale = self.get_ids(where) - {document_id(doc) for doc in docs}
+        if stale:
+            self.collection.delete(ids=list(stale))
+        self.add(docs, store_content, embeddings=embeddings)
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=list(set(ids)), include=[])["ids"])
+
+    def get_ids(self, where) -> set[str]:
+        return set(self.collection.get(where=where, include=[])["ids"])
+
+    def vectors(self, ids: list[str]) -> dict[str, list[float]]:
+        if not ids:
+            return {}
+        results = self.collection.get(ids=list(set(ids)), include=["embeddings"])
+        embeddings = results["embeddings"]
+        if embeddings is None:
+            return {}
+        return dict(zip(results["ids"], embeddings, strict=True))
+
+    def ids_by_file(self) -> dict[str | None, set[str]]:
+        results = self.collection.get(include=["metadatas"])
+        files: dict[str | None, set[str]] = {}
+        for doc_id, metadata in zip(
+            results["ids"], results["metadatas"] or [], strict=False
+        ):
+            files.setdefault((metadata or {}).get("filepath"), set()).add(doc_id)
+        return files
+
     def delete(self, *args, **kwargs):
         self.collection.delete(*args, **kwargs)
 
@@ -0,0 +1,266 @@
+"""
+Hybrid retrieval over a vector store and a BM25 lexical index.
+
+Every write goes to both, so the lexical index always holds the same chunks as
+the vector store (it is rebuilt from the vector store when opened). A query
+asks both for their `fetch_k` best chunks and merges the two rankings with
+Reciprocal Rank Fusion: a chunk scores `weight / (rrf_k + rank)` in each list
+it appears in. Ranks are fused rather than scores because cosine similarities
+and BM25 scores are not on comparable scales.
+
+Chunks found only by the lexical side carry no "similarity" of their own, so
+one is computed from their stored vector, and a similarity cutoff applies to
+them as to the vector hits (a shared "what" or "the" is no sign of relevance).
+
+The vector side needs the query embedded first. When that fails, or takes
+longer than `embed_timeout`, the lexical ranking is returned on its own and the
+vector side is skipped for the next `retry_after` seconds, so a stopped or
+overloaded Ollama degrades answers instead of blocking them.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from ..common_types.base import Documents
+from ..embedders.ollama_embedding import REQUEST_ERRORS
+from .base import Store, cosine_similarity, document_id
+from .bm25_store import BM25Store
+
+logger = logging.getLogger(__name__)
+
+MODES = ("hybrid", "vector", "lexical")
+# What a failing vector side raises: the embedding request failing, or the
+# vector store's database failing
+VECTOR_ERRORS = (OSError, sqlite3.Error, *REQUEST_ERRORS)
+
+
+class HybridStore(Store):
+    def __init__(
+        self,
+        vector: Store,
+        lexical: BM25Store | None = None,
+        mode: str = "hybrid",
+        fetch_k: int = 20,
+        rrf_k: int = 60,
+        vector_weight: float = 1.0,
+        lexical_weight: float = 1.0,
+        embed_timeout: float | None = 3.0,
+        retry_after: float = 30.0,
+    ):
+        """
+        Args:
+            vector: Store holding the embeddings; writes are passed through.
+            lexical: Lexical index kept in step with `vector`.
+            mode: "hybrid", or "vector" / "lexical" to query only one side.
+            fetch_k: Chunks taken from each side before fusing (at least k).
+            rrf_k: Rank offset of Reciprocal Rank Fusion; larger values flatten
+                the difference between the top ranks.
+            vector_weight: Weight of the vector ranking in the fusion.
+            lexical_weight: Weight of the lexical ranking in the fusion.
+            embed_timeout: Seconds the vector side may take per query text
+                before the lexical results are returned alone. None waits
+                indefinitely.
+            retry_after: Seconds the vector side is skipped after it failed.
+        """
+        if mode not in MODES:
+            raise ValueError(
+                f"Unknown retrieval mode {mode!r}, expected one of {MODES}"
+            )
+        self.vector = vector
+        self.lexical = lexical if lexical is not None else BM25Store()
+        self.mode = mode
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+        self.vector_weight = vector_weight
+        self.lexical_weight = lexical_weight
+        self.embed_timeout = embed_timeout
+        self.retry_after = retry_after
+
+        # Queries answered by the lexical index alone because the vector side
+        # failed or was skipped
+        self.fallbacks = 0
+        self._vector_down_until = 0.0
+        # Runs vector queries, so a caller can stop waiting for a slow one
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid")
+
+        self.lexical.add(self.vector.get() or [])
+
+    @property
+    def vector_available(self) -> bool:
+        return time.monotonic() >= self._vector_down_until
+
+    # --- Writes ---
+
+    def add(self, docs: Documents, store_content=True, embeddings=None):
+        self.vector.add(docs, store_content, embeddings=embeddings)
+        self.lexical.add(docs)
+
+    async def aadd(self, docs: Documents, store_content=True, embeddings=None):
+        await self.vector.aadd(docs, store_content, embeddings=embeddings)
+        self.lexical.add(docs)
+
+    def replace(self, docs: Documents, where, store_content=True, embeddings=None):
+        self.vector.replace(docs, where, store_content, embeddings=embeddings)
+        self.lexical.replace(docs, where)
+
+    def delete(self, ids: list[str] | None = None, where=None):
+        self.vector.delete(ids=ids, where=where)
+        self.lexical.delete(ids=ids, where=where)
+
+    def reset(self):
+        self.lexical.reset()
+        return self.vector.reset()
+
+    # --- Reads ---
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        return self.vector.existing_ids(ids)
+
+    def get_ids(self, where=None) -> set[str]:
+        return self.vector.get_ids(where)
+
+    def vectors(self, ids: list[str]) -> dict[str, list[float]]:
+        return self.vector.vectors(ids)
+
+    def ids_by_file(self) -> dict[str | None, set[str]]:
+        return self.vector.ids_by_file()
+
+    def get(self, *args, **kwargs) -> Documents | None:
+        return self.vector.get(*args, **kwargs)
+
+    def query(self, texts, k: int = 1, where=None, mode: str | None = None):
+        mode = mode or self.mode
+        if mode == "lexical" or not self.vector_available:
+            return self._lexical_only(texts, k, where, fallback=mode != "lexical")
+
+        future = self._pool.submit(
+            self._vector_query, texts, self._fetch(k, mode), where
+        )
+        try:
+            vector_results = future.result(timeout=self._timeout(texts))
+        except FutureTimeoutError:
+            future.add_done_callback(lambda f: f.exception())
+            return self._vector_failed(texts, k, where, "timed out")
+        except VECTOR_ERRORS as e:
+            return self._vector_failed(texts, k, where, e)
+        results = self._combine(texts, vector_results, k, where, mode)
+        if not self._unscored(results):
+            return results
+        # The vector side just embedded the same texts, so the cache has them
+        return self._score(results, self.vector.embedder.embed(texts))
+
+    async def aquery(self, texts, k: int = 1, where=None, mode: str | None = None):
+        mode = mode or self.mode
+        if mode == "lexical" or not self.vector_available:
+            return self._lexical_only(texts, k, where, fallback=mode != "lexical")
+
+        kwargs = {"where": where} if where else {}
+        try:
+            vector_results = await asyncio.wait_for(
+                self.vector.aquery(texts, k=self._fetch(k, mode), **kwargs),
+                self._timeout(texts),
+            )
+        except TimeoutError:
+            return self._vector_failed(texts, k, where, "timed out")
+        except VECTOR_ERRORS as e:
+            return self._vector_failed(texts, k, where, e)
+        results = self._combine(texts, vector_results, k, where, mode)
+        if not self._unscored(results):
+            return results
+        return self._score(results, await self.vector.embedder.aembed(texts))
+
+    def _timeout(self, texts) -> float | None:
+        # Scaled, so a batch of questions isn't mistaken for a stalled embedder
+        if self.embed_timeout is None:
+            return None
+        return self.embed_timeout * max(1, len(texts))
+
+    def _fetch(self, k: int, mode: str) -> int:
+        return max(k, self.fetch_k) if mode == "hybrid" else k
+
+    def _vector_query(self, texts, k: int, where=None) -> list[Documents]:
+        kwargs = {"where": where} if where else {}
+        return self.vector.query(texts, k=k, **kwargs) or [[] for _ in texts]
+
+    def _vector_failed(self, texts, k: int, where, error) -> list[Documents]:
+        self._vector_down_until = time.monotonic() + self.retry_after
+        logger.warning(
+            f"Vector search failed ({error}), answering from the lexical index "
+            f"for the next {self.retry_after}s"
+        )
+        return self._lexical_only(texts, k, where, fallback=True)
+
+    def _lexical_only(self, texts, k: int, where, fallback: bool) -> list[Documents]:
+        if fallback:
+            self.fallbacks += 1
+        return self.lexical.query(texts, k=k, where=where)
+
+    def _combine(self, texts, vector_results, k: int, where, mode: str):
+        if mode == "vector":
+            return [docs[:k] for docs in vector_results]
+        return [
+            self.fuse(docs, self.lexical.ranked(text, self._fetch(k, mode), where), k)
+            for text, docs in zip(texts, vector_results, strict=True)
+        ]
+
+    @staticmethod
+    def _unscored(results: list[Documents]) -> bool:
+        return any(
+            "similarity" not in (doc.metadata or {}) for docs in results for doc in docs
+        )
+
+    def _score(self, results: list[Documents], query_vectors) -> list[Documents]:
+        """Adds the "similarity" to their query of the lexical-only chunks."""
+        ids = {
+            document_id(doc)
+            for docs in results
+            for doc in docs
+            if "similarity" not in (doc.metadata or {})
+        }
+        stored = self.vector.vectors(list(ids))
+        scored = []
+        for docs, query_vector in zip(results, query_vectors, strict=True):
+            scored.append([])
+            for doc in docs:
+                vector = stored.get(document_id(doc))
+                if "similarity" not in (doc.metadata or {}) and vector is not None:
+                    similarity = cosine_similarity(query_vector, vector)
+                    # A copy, the lexical index holds the original
+                    doc = doc.model_copy(
+                        update={
+                            "metadata": {
+                                **(doc.metadata or {}),
+                                "similarity": similarity,
+                            }
+                        }
+                    )
+                scored[-1].append(doc)
+        return scored
+
+    def fuse(
+        self, vector_docs: Documents, lexical_ranked: list[tuple[str, float]], k: int
+    ) -> Documents:
+        """Merges a vector and a lexical ranking into the `k` best chunks."""
+        scores: dict[str, float] = {}
+        docs = {}
+        for rank, doc in enumerate(vector_docs):
+            doc_id = document_id(doc)
+            docs[doc_id] = doc
+            scores[doc_id] = self.vector_weight / (self.rrf_k + rank + 1)
+        lexical_docs = self.lexical.get(ids=[doc_id for doc_id, _ in lexical_ranked])
+        for rank, doc in enumerate(lexical_docs):
+            doc_id = document_id(doc)
+            docs.setdefault(doc_id, doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + self.lexical_weight / (
+                self.rrf_k + rank + 1
+            )
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+        return [docs[doc_id] for doc_id in best]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.vector.close()
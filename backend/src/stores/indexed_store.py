@@ -0,0 +1,283 @@
+"""
+File -> chunk ID index kept alongside a store.
+
+Deleting or re-ingesting a file through a `where` filter makes the store scan
+the metadata of every chunk, and silently misses chunks whose metadata doesn't
+match the filter (e.g. a delete by "filename" of chunks stored by "filepath").
+`IndexedStore` records which chunk IDs each file was stored with in a small
+SQLite table, so `delete_file` and `replace_file` go straight to the IDs.
+
+On first use the index is filled from the chunks already in the store.
+`reconcile` removes orphans: chunks of files that no longer exist, and chunks
+that the index doesn't list for their file (left behind by earlier runs).
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from ..common_types.base import Documents
+from .base import Store, document_id
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_chunks (
+    filepath TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (filepath, id)
+) WITHOUT ROWID;
+"""
+
+
+class ReconcileReport(NamedTuple):
+    orphan_chunks: int  # Chunks deleted from the store
+    removed_files: int  # Files dropped from the index
+    stale_entries: int  # Index entries pointing at chunks no longer stored
+
+
+class ChunkIndex:
+    def __init__(self, path: str | Path | None = None):
+        """
+        Args:
+            path: SQLite file holding the index, in memory if None.
+        """
+        self._db = sqlite3.connect(
+            str(path) if path is not None else ":memory:", check_same_thread=False
+        )
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM file_chunks").fetchone()[0]
+
+    def ids(self, filepath: str) -> set[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM file_chunks WHERE filepath = ?", (filepath,)
+            )
+            return {doc_id for (doc_id,) in rows}
+
+    def files(self) -> dict[str, set[str]]:
+        files: dict[str, set[str]] = {}
+        with self._lock:
+            for filepath, doc_id in self._db.execute(
+                "SELECT filepath, id FROM file_chunks"
+            ):
+                files.setdefault(filepath, set()).add(doc_id)
+        return files
+
+    def add(self, filepath: str, ids: Iterable[str]):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO file_chunks (filepath, id) VALUES (?, ?)",
+                [(filepath, doc_id) for doc_id in ids],
+            )
+
+    def set(self, filepath: str, ids: Iterable[str]):
+        """Makes `ids` the only chunks listed for `filepath`."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM file_chunks WHERE filepath = ?", (filepath,))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO file_chunks (filepath, id) VALUES (?, ?)",
+                [(filepath, doc_id) for doc_id in ids],
+            )
+
+    def remove(self, filepath: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM file_chunks WHERE filepath = ?", (filepath,))
+
+    def discard(self, ids: Iterable[str]):
+        """Removes `ids` from whichever files list them."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM file_chunks WHERE id = ?", [(doc_id,) for doc_id in ids]
+            )
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM file_chunks")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def group_by_file(docs: Documents) -> dict[str, list[str]]:
+    files: dict[str, list[str]] = {}
+    for doc in docs:
+        filepath = (doc.metadata or {}).get("filepath")
+        if filepath is not None:
+            files.setdefault(filepath, []).append(document_id(doc))
+    return files
+
+
+class IndexedStore(Store):
+    def __init__(self, store: Store, index_path: str | Path | None = None):
+        """
+        Args:
+            store: Store holding the chunks; every call is passed through.
+            index_path: SQLite file of the file -> chunk ID index, in memory if
+                None.
+        """
+        self.store = store
+        self.index = ChunkIndex(index_path)
+        # Writes hold it too, so `reconcile` never sees a chunk stored but not
+        # yet indexed
+        self._lock = threading.RLock()
+        if not len(self.index):
+            # Chunks stored before the index existed
+            for filepath, ids in self.store.ids_by_file().items():
+                if filepath is not None:
+                    self.index.add(filepath, ids)
+
+    # --- Writes ---
+
+    def add(self, docs: Documents, *args, **kwargs):
+        with self._lock:
+            self.store.add(docs, *args, **kwargs)
+            for filepath, ids in group_by_file(docs).items():
+                self.index.add(filepath, ids)
+
+    async def aadd(self, docs: Documents, *args, **kwargs):
+        # In a thread, since the lock may be held by a long sync
+        await asyncio.to_thread(self.add, docs, *args, **kwargs)
+
+    def replace(self, docs: Documents, where, *args, **kwargs):
+        if where is not None and list(where) == ["filepath"]:
+            return self.replace_file(where["filepath"], docs, *args, **kwargs)
+        with self._lock:
+            self.store.replace(docs, where, *args, **kwargs)
+            for filepath, ids in group_by_file(docs).items():
+                self.index.add(filepath, ids)
+
+    def replace_file(self, filepath: str, docs: Documents, *args, **kwargs):
+        """
+        Makes `docs` the only chunks of `filepath`: chunks that vanished are
+        deleted by ID, new ones added, and unchanged ones left alone.
+        """
+        ids = {document_id(doc) for doc in docs}
+        with self._lock:
+            stale = self.index.ids(filepath) - ids
+            if stale:
+                self.store.delete(ids=list(stale))
+            self.store.add(docs, *args, **kwargs)
+            self.index.set(filepath, ids)
+
+    def delete(self, ids: list[str] | None = None, where=None):
+        if ids is None and where is not None and list(where) == ["filepath"]:
+            return self.delete_file(where["filepath"])
+        with self._lock:
+            self.store.delete(ids=ids, where=where)
+            if ids is not None:
+                self.index.discard(ids)
+
+    def delete_file(self, filepath: str):
+        with self._lock:
+            ids = self.index.ids(filepath)
+            if ids:
+                self.store.delete(ids=list(ids))
+            self.index.remove(filepath)
+
+    def reset(self):
+        with self._lock:
+            self.index.clear()
+            return self.store.reset()
+
+    def reconcile(
+        self,
+        keep: Callable[[str], bool] = os.path.exists,
+        loader: Callable[[str], Documents] | None = None,
+    ) -> ReconcileReport:
+        """
+        Deletes orphan chunks and index entries.
+
+        Args:
+            keep: Whether the chunks of a file still belong in the store; by
+                default, whether the file exists.
+            loader: Turns a file into its chunks. When given, the chunks a kept
+                file should have are recomputed from its current contents
+                (nothing is embedded) instead of trusting the index, which also
+                catches orphans that predate the index.
+        """
+        with self._lock:
+            report = self._reconcile(keep, loader)
+        logger.info(
+            f"Reconciled store: {report.orphan_chunks} orphan chunks deleted, "
+            f"{report.removed_files} files and {report.stale_entries} stale "
+            "entries dropped from the index"
+        )
+        return report
+
+    def _reconcile(
+        self, keep: Callable[[str], bool], loader: Callable[[str], Documents] | None
+    ) -> ReconcileReport:
+        stored = self.store.ids_by_file()
+        indexed = self.index.files()
+        stored_ids = set().union(*stored.values())
+
+        if loader is not None:
+            for filepath in stored.keys() | indexed.keys():
+                if filepath is None or not keep(filepath):
+                    continue
+                try:
+                    indexed[filepath] = {document_id(doc) for doc in loader(filepath)}
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Can't reload {filepath}, keeping its chunks: {e}")
+                    indexed[filepath] = stored.get(filepath, set())
+
+        orphans: set[str] = set()
+        for filepath, ids in stored.items():
+            if filepath is None or not keep(filepath):
+                orphans |= ids
+            else:
+                orphans |= ids - indexed.get(filepath, set())
+        if orphans:
+            self.store.delete(ids=list(orphans))
+
+        removed_files = stale_entries = 0
+        current = self.index.files()
+        for filepath, ids in indexed.items():
+            if not keep(filepath):
+                self.index.remove(filepath)
+                removed_files += 1
+                continue
+            live = ids & stored_ids - orphans
+            stale_entries += len(current.get(filepath, set()) - live)
+            if live != current.get(filepath):
+                self.index.set(filepath, live)
+
+        return ReconcileReport(len(orphans), removed_files, stale_entries)
+
+    # --- Reads ---
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        return self.store.existing_ids(ids)
+
+    def get_ids(self, where=None) -> set[str]:
+        return self.store.get_ids(where)
+
+    def vectors(self, ids: list[str]) -> dict[str, list[float]]:
+        return self.store.vectors(ids)
+
+    def ids_by_file(self) -> dict[str | None, set[str]]:
+        return self.store.ids_by_file()
+
+    def get(self, *args, **kwargs) -> Documents | None:
+        return self.store.get(*args, **kwargs)
+
+    def query(self, texts, *args, **kwargs):
+        return self.store.query(texts, *args, **kwargs)
+
+    async def aquery(self, texts, *args, **kwargs):
+        return await self.store.aquery(texts, *args, **kwargs)
+
+    def close(self):
+        self.index.close()
+        self.store.close()
@@ -0,0 +1,339 @@
+"""
+Vector store kept in one contiguous float32 matrix.
+
+Embeddings are L2-normalized when added, so cosine similarity is a dot product
+and a query is a single matrix product over every stored row followed by an
+argpartition for the top k: an exact search with no index to build or load.
+
+With `persists=True` the matrix is a memory-mapped .npy file, so opening the
+store reads no vectors up front and a query only pages in what it touches.
+Chunk IDs, texts and metadata are kept in a small SQLite table next to it.
+Rows of deleted chunks are zeroed and reused by later adds; the matrix doubles
+in size when it runs out of rows.
+
+Meant for personal-scale corpora (up to about 100k chunks). Beyond that the
+linear scan loses to an approximate index such as Chroma's HNSW.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from ..common_types.base import Document, Documents
+from ..embedders.base import Embedder
+from .base import Store, document_id, matches
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    content TEXT,
+    metadata TEXT NOT NULL
+);
+"""
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyStore(Store):
+    def __init__(
+        self,
+        embedder: Embedder,
+        persists=False,
+        path="./numpy_store",
+        initial_capacity: int = 1024,
+    ):
+        """
+        Args:
+            embedder: Embeds documents and queries.
+            persists: Keep the store in `path` instead of in memory.
+            path: Directory holding the vectors and the chunk table.
+            initial_capacity: Rows allocated by the first add.
+        """
+        self.embedder = embedder
+        self.path = Path(path) if persists else None
+        self.initial_capacity = max(1, initial_capacity)
+        self._lock = threading.RLock()
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                self.path / "chunks.sqlite", check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        else:
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path | None:
+        return self.path / "vectors.npy" if self.path is not None else None
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _load(self):
+        self._matrix: np.ndarray | None = None
+        if self._vectors_path is not None and self._vectors_path.exists():
+            self._matrix = np.load(self._vectors_path, mmap_mode="r+")
+
+        capacity = len(self._matrix) if self._matrix is not None else 0
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._ids: list[str | None] = [None] * capacity
+        self._contents: list[str | None] = [None] * capacity
+        self._metadatas: list[dict | None] = [None] * capacity
+        self._row_of: dict[str, int] = {}
+        self._size = 0  # Rows ever used; rows past it are untouched
+
+        for row, doc_id, content, metadata in self._db.execute(
+            "SELECT row, id, content, metadata FROM chunks"
+        ):
+            self._ids[row] = doc_id
+            self._contents[row] = content
+            self._metadatas[row] = json.loads(metadata)
+            self._row_of[doc_id] = row
+            self._alive[row] = True
+            self._size = max(self._size, row + 1)
+        # Rows of deleted chunks, and rows written by an add that never committed
+        self._free = [row for row in range(self._size) if not self._alive[row]]
+
+    def _allocate(self, capacity: int, dim: int) -> np.ndarray:
+        """Returns a matrix of `capacity` rows holding the rows in use."""
+        if self._vectors_path is None:
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if self._matrix is not None:
+                matrix[: self._size] = self._matrix[: self._size]
+            return matrix
+
+        # Written next to the old file and swapped in, so a crash leaves one or
+        # the other intact
+        tmp = self._vectors_path.with_suffix(".tmp.npy")
+        matrix = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=np.float32, shape=(capacity, dim)
+        )
+        if self._matrix is not None:
+            matrix[: self._size] = self._matrix[: self._size]
+        matrix.flush()
+        del matrix
+        self._matrix = None
+        os.replace(tmp, self._vectors_path)
+        return np.load(self._vectors_path, mmap_mode="r+")
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        capacity = len(self._alive)
+        if self._matrix is not None and rows <= capacity:
+            return
+        new_capacity = max(rows, self.initial_capacity, capacity * 2)
+        self._matrix = self._allocate(new_capacity, dim)
+
+        grow = new_capacity - capacity
+        self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+        self._ids.extend([None] * grow)
+        self._contents.extend([None] * grow)
+        self._metadatas.extend([None] * grow)
+
+    # --- Writes ---
+
+    def add(self, docs: Documents, store_content=True, embeddings=None):
+        """
+        Add documents, embedding them unless `embeddings` are precomputed.
+        Chunks that are already stored (or repeated in `docs`) are skipped.
+        """
+        with self._lock:
+            docs, ids, embeddings = self._new_documents(docs, embeddings)
+        if not docs:
+            return
+        if embeddings is None:
+            embeddings = self.embedder.embed([doc.content for doc in docs])
+        self._write(docs, ids, embeddings, store_content)
+
+    async def aadd(self, docs: Documents, store_content=True, embeddings=None):
+        docs, ids, embeddings = self._new_documents(docs, embeddings)
+        if not docs:
+            return
+        if embeddings is None:
+            embeddings = await self.embedder.aembed([doc.content for doc in docs])
+        await asyncio.to_thread(self._write, docs, ids, embeddings, store_content)
+
+    def _write(self, docs: Documents, ids: list[str], embeddings, store_content=True):
+        vectors = normalize(embeddings)
+        with self._lock:
+            # Another add may have stored some of the chunks meanwhile
+            new = [i for i, doc_id in enumerate(ids) if doc_id not in self._row_of]
+            n_reused = min(len(new), len(self._free))
+            rows = self._free[:n_reused] + list(
+                range(self._size, self._size + len(new) - n_reused)
+            )
+            self._ensure_capacity(self._size + len(new) - n_reused, vectors.shape[1])
+            del self._free[:n_reused]
+            self._size += len(new) - n_reused
+
+            self._matrix[rows] = vectors[new]
+            if self._vectors_path is not None:
+                # Vectors first: rows missing from the table are treated as free
+                self._matrix.flush()
+
+            records = []
+            for row, i in zip(rows, new, strict=True):
+                content = docs[i].content if store_content else None
+                metadata = dict(docs[i].metadata or {})
+                self._ids[row] = ids[i]
+                self._contents[row] = content
+                self._metadatas[row] = metadata
+                self._row_of[ids[i]] = row
+                records.append(
+                    (row, ids[i], content, json.dumps(metadata, default=str))
+                )
+            self._alive[rows] = True
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO chunks (row, id, content, metadata) "
+                    "VALUES (?, ?, ?, ?)",
+                    records,
+                )
+
+    def replace(self, docs: Documents, where, store_content=True, embeddings=None):
+        """
+        Make `docs` the only documents matching `where`: chunks that vanished are
+        deleted, new ones added, and unchanged ones left alone (not re-embedded).
+        """
+        stale = self.get_ids(where) - {document_id(doc) for doc in docs}
+        if stale:
+            self.delete(ids=list(stale))
+        self.add(docs, store_content, embeddings=embeddings)
+
+    def delete(self, ids: list[str] | None = None, where=None):
+        """Deletes the chunks with the given `ids` and/or matching `where`."""
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            if not rows:
+                return
+            with self._db:
+                self._db.executemany(
+                    "DELETE FROM chunks WHERE row = ?", [(row,) for row in rows]
+                )
+            for row in rows:
+                del self._row_of[self._ids[row]]
+                self._ids[row] = self._contents[row] = self._metadatas[row] = None
+            self._alive[rows] = False
+            self._matrix[rows] = 0.0
+            self._free.extend(rows)
+
+    def reset(self):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM chunks")
+            self._matrix = None
+            if self._vectors_path is not None:
+                self._vectors_path.unlink(missing_ok=True)
+            self._load()
+        return True
+
+    # --- Reads ---
+
+    def _select_rows(self, ids: list[str] | None = None, where=None) -> list[int]:
+        if ids is not None:
+            rows = [self._row_of[i] for i in dict.fromkeys(ids) if i in self._row_of]
+        else:
+            rows = np.flatnonzero(self._alive[: self._size]).tolist()
+        if where:
+            rows = [row for row in rows if matches(self._metadatas[row], where)]
+        return rows
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        with self._lock:
+            return {doc_id for doc_id in ids if doc_id in self._row_of}
+
+    def get_ids(self, where=None) -> set[str]:
+        with self._lock:
+            return {self._ids[row] for row in self._select_rows(where=where)}
+
+    def vectors(self, ids: list[str]) -> dict[str, list[float]]:
+        with self._lock:
+            return {
+                doc_id: self._matrix[self._row_of[doc_id]].copy()
+                for doc_id in ids
+                if doc_id in self._row_of
+            }
+
+    def ids_by_file(self) -> dict[str | None, set[str]]:
+        with self._lock:
+            files: dict[str | None, set[str]] = {}
+            for row in self._select_rows():
+                filepath = self._metadatas[row].get("filepath")
+                files.setdefault(filepath, set()).add(self._ids[row])
+            return files
+
+    def get(self, ids: list[str] | None = None, where=None, **kwargs) -> Documents:
+        with self._lock:
+            return [
+                Document(content=self._contents[row], metadata=self._metadatas[row])
+                for row in self._select_rows(ids, where)
+            ]
+
+    def query(self, texts, k: int = 1, where=None):
+        return self._query(self.embedder.embed(texts), k, where)
+
+    async def aquery(self, texts, k: int = 1, where=None):
+        embeds = await self.embedder.aembed(texts)
+        return await asyncio.to_thread(self._query, embeds, k, where)
+
+    def _query(self, embeds, k: int = 1, where=None) -> list[Documents]:
+        """Results carry their cosine "similarity" to the query (and "distance",
+        one minus it) in their metadata."""
+        queries = normalize(embeds)
+        with self._lock:
+            mask = self._alive[: self._size].copy()
+            if where:
+                mask &= np.fromiter(
+                    (
+                        alive and matches(metadata, where)
+                        for alive, metadata in zip(
+                            mask, self._metadatas[: self._size], strict=True
+                        )
+                    ),
+                    dtype=bool,
+                    count=self._size,
+                )
+            k = min(k, int(mask.sum()))
+            if k <= 0:
+                return [[] for _ in queries]
+
+            # (rows x dim) @ (dim x queries): one pass over the matrix for all texts
+            scores = self._matrix[: self._size] @ queries.T
+            scores[~mask] = -np.inf
+
+            results = []
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k]
+                top = top[np.argsort(-column[top])]
+                results.append(
+                    [
+                        Document(
+                            content=self._contents[row],
+                            metadata={
+                                **self._metadatas[row],
+                                "distance": 1.0 - float(column[row]),
+                                "similarity": float(column[row]),
+                            },
+                        )
+                        for row in top
+                    ]
+                )
+            return results
+
+    def close(self):
+        with self._lock:
+            self._db.close()
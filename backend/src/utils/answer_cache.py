@@ -0,0 +1,141 @@
+"""
+In-memory cache of answers to questions.
+
+Questions are looked up by their normalized form (case, whitespace and trailing
+punctuation ignored). With an embedder and a `similarity_threshold`, a question
+that misses the exact lookup is also matched against the cached questions by
+cosine similarity of their embeddings, so rephrasings hit too.
+
+Entries are grouped in scopes, e.g. one per model, so an answer is never served
+for a different model. A scope can be invalidated as a whole, e.g. when the
+documents its answers were based on change. Entries expire after `ttl` seconds,
+and the least recently used are evicted beyond `max_entries`.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from ..embedders.base import Embedder
+
+
+class CacheEntry(NamedTuple):
+    question: str
+    answer: Any
+    expires: float
+    vector: list[float] | None = None
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(x * x for x in b))
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        embedder: Embedder | None = None,
+        similarity_threshold: float | None = None,
+    ):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl: Seconds an answer is served for.
+            embedder: Embeds questions for similarity matching.
+            similarity_threshold: Minimum cosine similarity for a question to
+                match a cached one. None disables similarity matching.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[tuple[str, str], CacheEntry] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def matches_similar(self) -> bool:
+        return self.embedder is not None and self.similarity_threshold is not None
+
+    def generation(self, scope: str) -> int:
+        """Changes every time `scope` is invalidated. Pass it to `put` to drop
+        answers computed before an invalidation."""
+        return self._generations.get(scope, 0)
+
+    def get(self, question: str, scope: str) -> Any | None:
+        key = (scope, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+            candidates = [
+                (k, e)
+                for k, e in self._entries.items()
+                if k[0] == scope and e.vector is not None and e.expires > now
+            ]
+
+        if self.matches_similar and candidates:
+            vector = self._embed(question)
+            best_key, best = max(
+                candidates, key=lambda item: cosine_similarity(vector, item[1].vector)
+            )
+            if cosine_similarity(vector, best.vector) >= self.similarity_threshold:
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.hits += 1
+                return best.answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(
+        self, question: str, scope: str, answer: Any, generation: int | None = None
+    ):
+        """
+        Caches `answer`, unless `scope` was invalidated after `generation` was
+        read (the answer may be based on outdated documents).
+        """
+        vector = self._embed(question) if self.matches_similar else None
+        key = (scope, normalize_question(question))
+        with self._lock:
+            if generation is not None and generation != self.generation(scope):
+                return
+            self._entries[key] = CacheEntry(
+                question=question,
+                answer=answer,
+                expires=time.monotonic() + self.ttl,
+                vector=vector,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scope: str):
+        """Drops every answer in `scope`."""
+        with self._lock:
+            self._generations[scope] = self.generation(scope) + 1
+            for key in [key for key in self._entries if key[0] == scope]:
+                del self._entries[key]
+
+    def _embed(self, question: str) -> list[float]:
+        return list(self.embedder.embed([question])[0])
@@ -0,0 +1,172 @@
+"""
+Preloads local Ollama models so the first question doesn't pay for loading them.
+
+Ollama loads a model on its first request and unloads it once it has been idle
+for its keep-alive (5 minutes unless told otherwise), so both the first /rag
+after boot and the first one after a pause wait several seconds for the
+embedding model and the LLM to load. `ModelWarmer` loads them on a background
+thread at startup, with the configured `keep_alive`. The same `keep_alive` should
+be passed with every regular request too, since each request resets the timer
+to the value it carries.
+
+The warmer also checks which models Ollama has loaded every `refresh_interval`
+seconds and reloads the ones that were unloaded (idle past the keep-alive, or
+the Ollama server restarted), so a model's readiness stays accurate. By default
+it checks at half the keep-alive, before a model idle since its load expires.
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import NamedTuple
+
+from ollama import Client
+
+from ..embedders.ollama_embedding import REQUEST_ERRORS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_ALIVE = 300.0  # Seconds Ollama keeps an idle model loaded by default
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class ModelState(NamedTuple):
+    kind: str  # "embed" or "chat"
+    loaded: bool
+    load_seconds: float | None = None  # Time the last load took
+    error: str | None = None  # Why the last load failed
+
+
+def keep_alive_seconds(keep_alive: str | float | None) -> float:
+    """`keep_alive` as Ollama reads it (a number of seconds or a duration such as
+    "1h30m"), in seconds. Negative means for ever."""
+    if keep_alive is None:
+        return DEFAULT_KEEP_ALIVE
+    try:
+        return float(keep_alive)
+    except ValueError:
+        pass
+    seconds = sum(float(n) * _UNITS[unit] for n, unit in _DURATION.findall(keep_alive))
+    return -seconds if keep_alive.strip().startswith("-") else seconds
+
+
+def _tagged(model: str) -> str:
+    """`model` as Ollama lists it, with the implicit ":latest" tag."""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelWarmer:
+    def __init__(
+        self,
+        embed_models: list[str],
+        chat_models: list[str],
+        url: str = "http://localhost:11434",
+        keep_alive: str | float | None = None,
+        refresh_interval: float | None = None,
+        client: Client | None = None,
+    ):
+        """
+        Args:
+            embed_models: Ollama embedding models to load.
+            chat_models: Ollama chat models to load.
+            url: Base URL of the Ollama server.
+            keep_alive: How long Ollama keeps the models loaded when idle, e.g.
+                "30m", or -1 for ever. None for the server's default.
+            refresh_interval: Seconds between checks that reload unloaded
+                models. None for half the keep-alive; models kept for ever are
+                then loaded once.
+        """
+        self.keep_alive = keep_alive
+        if refresh_interval is None:
+            seconds = keep_alive_seconds(keep_alive)
+            refresh_interval = seconds / 2 if seconds > 0 else None
+        self.refresh_interval = refresh_interval
+        self._client = client or Client(host=url, timeout=120.0)
+        self._kinds = dict.fromkeys(embed_models, "embed")
+        self._kinds.update(dict.fromkeys(chat_models, "chat"))
+        self._states = {
+            model: ModelState(kind, loaded=False) for model, kind in self._kinds.items()
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        """True once every model is loaded."""
+        with self._lock:
+            return all(state.loaded for state in self._states.values())
+
+    def status(self) -> dict[str, dict]:
+        """State of every model, by name."""
+        with self._lock:
+            return {model: state._asdict() for model, state in self._states.items()}
+
+    def start(self):
+        """Loads the models in the background, then keeps refreshing them."""
+        self._thread = threading.Thread(
+            target=self._run, name="ollama-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is None:
+            self._client.close()
+        # Otherwise the thread closes the client once its current load is done
+
+    def _run(self):
+        try:
+            self.warm()
+            while self.refresh_interval and not self._stop.wait(self.refresh_interval):
+                self.refresh()
+        finally:
+            self._client.close()
+
+    def warm(self, models: list[str] | None = None):
+        """Loads `models` (default: all of them), one at a time so they don't
+        compete for memory bandwidth."""
+        for model in self._kinds if models is None else models:
+            if self._stop.is_set():
+                return
+            self._load(model)
+
+    def refresh(self):
+        """Marks the models Ollama no longer has loaded, and reloads them."""
+        try:
+            running = {_tagged(m.model) for m in self._client.ps().models}
+        except REQUEST_ERRORS as e:
+            logger.warning(f"Couldn't list the loaded Ollama models: {e}")
+            return
+        unloaded = [model for model in self._kinds if _tagged(model) not in running]
+        with self._lock:
+            for model in unloaded:
+                self._states[model] = self._states[model]._replace(loaded=False)
+        if unloaded:
+            logger.info(f"Reloading unloaded Ollama models: {unloaded}")
+            self.warm(unloaded)
+
+    def _load(self, model: str):
+        kind = self._kinds[model]
+        start = time.perf_counter()
+        try:
+            if kind == "embed":
+                # Ollama answers an empty embed request without loading the model
+                self._client.embed(
+                    model=model, input="warm up", keep_alive=self.keep_alive
+                )
+            else:
+                # An empty prompt only loads the model
+                self._client.generate(model=model, keep_alive=self.keep_alive)
+        except REQUEST_ERRORS as e:
+            logger.warning(f"Failed to load Ollama model {model}: {e}")
+            state = ModelState(kind, loaded=False, error=str(e))
+        else:
+            seconds = time.perf_counter() - start
+            logger.info(f"Loaded Ollama model {model} in {seconds:.1f}s")
+            state = ModelState(kind, loaded=True, load_seconds=round(seconds, 3))
+        with self._lock:
+            self._states[model] = state
@@ -0,0 +1,87 @@
+"""
+Single-flight call coalescing.
+
+While a call for a key is running, further calls for the same key don't start
+their own; they wait for the running call and share its result (or exception).
+Once it finishes, the next call for the key runs again, nothing is cached.
+
+`SingleFlight` is for threads, `AsyncSingleFlight` for coroutines on one event
+loop.
+"""
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        # Calls that were served by another caller's execution
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn(*args, **kwargs)`, unless a call for `key` is already
+        running, in which case its result is returned instead."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        # Calls that were served by another caller's execution
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits `fn()`, unless a call for `key` is already in flight, in which
+        case its result is awaited instead."""
+        if (future := self._calls.get(key)) is not None:
+            self.shared += 1
+            # Shielded, so a waiter that is cancelled (e.g. its client hung up)
+            # doesn't cancel the call for everyone else
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._calls[key] = future
+
+        def finished(future: asyncio.Future):
+            if self._calls.get(key) is future:
+                del self._calls[key]
+            # Mark the exception retrieved, even if every waiter was cancelled
+            if not future.cancelled():
+                future.exception()
+
+        future.add_done_callback(finished)
+        return await asyncio.shield(future)
@@ -5,18 +5,36 @@ This module provides a FileTracker class that compares the state of files in a
 directory against a previously saved state, reporting any differences.
 
 Key features:
-- Efficiently detects new, deleted, and modified files using file modification times.
-- Persists the file state to a JSON file for comparison across runs.
+- Efficiently detects new, deleted, and modified files using file modification times
+  and sizes, confirmed by a content hash so touched-but-unchanged files are ignored.
+- Scans with `os.scandir` and remembers directory modification times, so directories
+  whose entries did not change are not re-listed on the next scan.
+- Persists the file state to SQLite (see `src.utils.tracker_state`), keeping an
+  in-memory mirror so only changed rows are written and nothing is re-read.
+- Can re-check just a set of changed paths, as reported by a file watcher
+  (see `src.utils.watch_files`), instead of rescanning the whole directory.
+- Include/exclude glob patterns and a maximum file size are applied while scanning;
+  excluded directories are never descended into.
+- `sync` commits each file only after its observers succeeded and queues failed
+  files for retry with exponential backoff, so an interrupted sync resumes.
 - Can be used as a library or run as a standalone script for demonstration.
-
-TODO: Add options for include/exclude glob patterns.
-TODO: Implement an in-memory cache for the file state.
 """
 
+import hashlib
 import json
 import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Dict, NamedTuple, Set
+from typing import Any, NamedTuple
+
+from ..pipelines.ingestion import INGEST_ERRORS
+from .single_flight import SingleFlight
+from .tracker_state import FailedFile, FileState, SqliteTrackerState, TrackerState
 
 # --- Configuration ---
 # Configure logging for the entire application
@@ -29,24 +47,79 @@ logger = logging.getLogger(__name__)
 # --- Data Structures ---
 
 
-class FileState(NamedTuple):
-    """A lightweight, immutable representation of a file's state."""
+class FileTrackerOutput(NamedTuple):
+    """The result of a file tracking analysis."""
+
+    new_files: set[Path]
+    deleted_files: set[Path]
+    modified_files: set[Path]
+
 
-    path: Path
-    mtime: float
+# --- Helpers ---
 
-    @classmethod
-    def from_path(cls, path: Path) -> "FileState":
-        """Creates a FileState instance from a Path object."""
-        return cls(path=path, mtime=path.stat().st_mtime)
 
+def hash_file(path: str) -> str | None:
+    """Returns a fast content hash of the file, or None if it can't be read."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(
+                f, lambda: hashlib.blake2b(digest_size=16)
+            ).hexdigest()
+    except OSError as e:
+        logger.warning(f"Could not hash {path}: {e}")
+        return None
 
-class FileTrackerOutput(NamedTuple):
-    """The result of a file tracking analysis."""
 
-    new_files: Set[Path]
-    deleted_files: Set[Path]
-    modified_files: Set[Path]
+class PathFilter:
+    """
+    Decides which paths below the watch directory are tracked.
+
+    Patterns are shell-style globs. A pattern containing "/" is matched against the
+    path relative to the watch directory (e.g. "archive/*.md"); any other pattern is
+    matched against the file or directory name at any depth (e.g. ".*",
+    "node_modules", "*.md"). Exclude patterns apply to files and directories,
+    include patterns only to files. No include patterns means every file.
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str] | None = None,
+        exclude: Iterable[str] | None = None,
+        max_file_size: int | None = None,
+    ):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_file_size = max_file_size
+
+    @property
+    def key(self) -> str:
+        """Identifies the filter settings, to notice when they change between runs."""
+        return json.dumps([self.include, self.exclude, self.max_file_size])
+
+    @staticmethod
+    def _matches(patterns: list[str], relpath: str, name: str) -> bool:
+        return any(fnmatch(relpath if "/" in p else name, p) for p in patterns)
+
+    def excludes_dir(self, relpath: str, name: str) -> bool:
+        return self._matches(self.exclude, relpath, name)
+
+    def includes_file(self, relpath: str, name: str) -> bool:
+        if self._matches(self.exclude, relpath, name):
+            return False
+        return not self.include or self._matches(self.include, relpath, name)
+
+    def allows_size(self, size: int) -> bool:
+        return self.max_file_size is None or size <= self.max_file_size
+
+    def allows(self, relpath: str, is_dir: bool) -> bool:
+        """Checks a relative path, including all of its parent directories."""
+        parts = relpath.split("/")
+        for i in range(1, len(parts)):
+            if self.excludes_dir("/".join(parts[:i]), parts[i - 1]):
+                return False
+        if is_dir:
+            return not self.excludes_dir(relpath, parts[-1])
+        return self.includes_file(relpath, parts[-1])
 
 
 # --- Core Logic ---
@@ -57,51 +130,192 @@ class FileTracker:
     Tracks file changes in a directory by comparing current state to the last known state.
     """
 
-    def __init__(self, watch_dir: Path, state_filepath: Path):
+    def __init__(
+        self,
+        watch_dir: Path,
+        state_filepath: Path,
+        path_filter: PathFilter | None = None,
+        max_attempts: int = 5,
+        retry_delay: float = 30.0,
+        max_retry_delay: float = 3600.0,
+    ):
         self.watch_dir = watch_dir.resolve()
         self.state_filepath = state_filepath.resolve()
+        self.path_filter = path_filter or PathFilter()
+        # Retry queue policy for files whose observers failed (exponential backoff)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._state = SqliteTrackerState(self.state_filepath)
 
         # Observer
         self._observers = []
 
+        # Serializes syncs coming from the watcher thread and from callers
+        self._lock = threading.RLock()
+        self._sync_flight = SingleFlight()
+
         if not self.watch_dir.is_dir():
             raise NotADirectoryError(f"Watch directory not found: {self.watch_dir}")
 
         logger.info(f"Initialized tracker for directory: {self.watch_dir}")
         logger.info(f"Using state file: {self.state_filepath}")
 
-    def _read_state(self) -> Dict[Path, FileState]:
-        """Reads the last known file states from the state file."""
-        if not self.state_filepath.exists():
-            return {}
+    def _read_state(self) -> TrackerState:
+        """Returns the last known file and directory states."""
+        return self._state.load()
+
+    def _write_state(self, state: TrackerState):
+        """Persists the current file and directory states."""
+        self._state.save(state)
+
+    def _relpath(self, path: str) -> str:
+        """Path relative to the watch dir, with "/" separators for pattern matching."""
+        relpath = os.path.relpath(path, self.watch_dir)
+        return relpath if os.sep == "/" else relpath.replace(os.sep, "/")
+
+    def is_tracked(self, path: Path) -> bool:
+        """Whether the filter allows `path`; sizes are not checked."""
+        relpath = self._relpath(str(path))
+        if relpath == ".":
+            return True
+        return self.path_filter.allows(relpath, is_dir=path.is_dir())
+
+    def _scan_directory(
+        self, previous: TrackerState | None = None, root: Path | None = None
+    ) -> TrackerState:
+        """
+        Scans the watch directory (or `root` below it) and returns the current
+        state of all files.
+
+        Directories whose mtime matches `previous` still have the same entries, so
+        they are not listed again: their known files are only re-stat'ed (to catch
+        content edits, which don't touch the directory mtime) and their known
+        subdirectories are visited as usual. Listings made under different filter
+        settings are not trusted, and neither are listings of directories holding
+        a file the size filter rejected: it may shrink without touching the
+        directory mtime, and must then be picked up.
+        """
+        previous = previous or TrackerState(files={}, dirs={})
+        root_dir = str(root or self.watch_dir)
+        path_filter = self.path_filter
+        if previous.scan_key != path_filter.key:
+            previous = previous._replace(dirs={})
+
+        # Relative paths are cut from the absolute ones, avoiding relpath() per entry
+        prefix_len = len(str(self.watch_dir)) + 1
+        to_posix = os.sep != "/"
+
+        known_files: dict[str, list[str]] = defaultdict(list)
+        for path in previous.files:
+            known_files[path.rpartition(os.sep)[0]].append(path)
+        known_subdirs: dict[str, list[str]] = defaultdict(list)
+        for path in previous.dirs:
+            if path != root_dir:
+                known_subdirs[path.rpartition(os.sep)[0]].append(path)
+
+        # A directory modified within the last second may still change within the
+        # same mtime tick, so its listing is not trusted on the next scan.
+        settled_before = time.time() - 1.0
+
+        files: dict[str, FileState] = {}
+        dirs: dict[str, float] = {}
+        pending = [root_dir]
+        while pending:
+            directory = pending.pop()
+            try:
+                dir_mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+
+            oversized = False
+            if previous.dirs.get(directory) == dir_mtime:
+                for path in known_files[directory]:
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if not path_filter.allows_size(stat.st_size):
+                        oversized = True
+                        continue
+                    files[path] = FileState(
+                        path=path, mtime=stat.st_mtime, size=stat.st_size
+                    )
+                pending.extend(known_subdirs[directory])
+            else:
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            relpath = entry.path[prefix_len:]
+                            if to_posix:
+                                relpath = relpath.replace(os.sep, "/")
+                            if entry.is_dir(follow_symlinks=False):
+                                if not path_filter.excludes_dir(relpath, entry.name):
+                                    pending.append(entry.path)
+                            elif entry.is_file() and path_filter.includes_file(
+                                relpath, entry.name
+                            ):
+                                stat = entry.stat()
+                                if not path_filter.allows_size(stat.st_size):
+                                    oversized = True
+                                    continue
+                                files[entry.path] = FileState(
+                                    path=entry.path,
+                                    mtime=stat.st_mtime,
+                                    size=stat.st_size,
+                                )
+                except OSError as e:
+                    logger.warning(f"Could not scan {directory}: {e}")
+                    continue
+
+            if dir_mtime < settled_before and not oversized:
+                dirs[directory] = dir_mtime
+
+        return TrackerState(files=files, dirs=dirs, scan_key=path_filter.key)
+
+    @staticmethod
+    def _diff(
+        previous_state: dict[str, FileState], current_state: dict[str, FileState]
+    ) -> FileTrackerOutput:
+        """
+        Computes the delta between two states, filling in the content hash of
+        every file in `current_state` that is new or whose mtime/size changed.
+        """
+        previous_paths = previous_state.keys()
+        current_paths = current_state.keys()
+
+        # Efficiently find differences using set operations
+        new_paths = current_paths - previous_paths
+        deleted_paths = previous_paths - current_paths
 
-        try:
-            with self.state_filepath.open("r") as f:
-                data = json.load(f)
+        modified_paths = set()
+        for path, current in current_state.items():
+            previous = previous_state.get(path)
+            # Older state files don't record sizes (-1), trust the mtime alone
+            if (
+                previous is not None
+                and previous.mtime == current.mtime
+                and previous.size in (current.size, -1)
+            ):
+                # Unchanged on the surface, carry the known hash over
+                current_state[path] = current._replace(hash=previous.hash)
+                continue
+
+            current = current_state[path] = current._replace(hash=hash_file(path))
+            # Only a real content change counts as a modification. Without both
+            # hashes (unreadable file, older state) fall back to trusting mtime.
+            if previous is not None and (
+                previous.hash is None
+                or current.hash is None
+                or previous.hash != current.hash
+            ):
+                modified_paths.add(path)
 
-            return {
-                Path(item["path"]): FileState(
-                    path=Path(item["path"]), mtime=item["mtime"]
-                )
-                for item in data
-            }
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.warning(f"Could not parse state file, treating as empty: {e}")
-            return {}
-
-    def _write_state(self, state: Dict[Path, FileState]):
-        """Writes the current file states to the state file."""
-        payload = [{"path": str(fs.path), "mtime": fs.mtime} for fs in state.values()]
-        with self.state_filepath.open("w") as f:
-            json.dump(payload, f, indent=2)
-
-    def _scan_directory(self) -> Dict[Path, FileState]:
-        """Scans the watch directory and returns the current state of all files."""
-        return {
-            path: FileState.from_path(path)
-            for path in self.watch_dir.rglob("*")
-            if path.is_file()
-        }
+        return FileTrackerOutput(
+            new_files={Path(path) for path in new_paths},
+            deleted_files={Path(path) for path in deleted_paths},
+            modified_files={Path(path) for path in modified_paths},
+        )
 
     def check(self, write_state: bool = True) -> FileTrackerOutput:
         """
@@ -113,33 +327,68 @@ class FileTracker:
         Returns:
             A FileTrackerOutput object detailing the changes.
         """
-        previous_state = self._read_state()
-        current_state = self._scan_directory()
+        previous = self._read_state()
+        current = self._scan_directory(previous)
+        changes = self._diff(previous.files, current.files)
 
-        previous_paths = set(previous_state.keys())
-        current_paths = set(current_state.keys())
+        if write_state:
+            self._write_state(current)
+            logger.info(f"Updated state file with {len(current.files)} entries.")
+
+        return changes
+
+    def _check_paths(
+        self, paths: Iterable[Path]
+    ) -> tuple[dict[str, FileState], FileTrackerOutput]:
+        previous = self._read_state()
+        current_state = dict(previous.files)
+
+        for path in paths:
+            key = str(path)
+            tracked = self.is_tracked(path)
+            if path.is_file() and tracked:
+                file_state = FileState.from_path(path)
+                if self.path_filter.allows_size(file_state.size):
+                    current_state[key] = file_state
+                else:
+                    current_state.pop(key, None)
+                continue
+
+            prefix = key + os.sep
+            for tracked_path in [p for p in current_state if p.startswith(prefix)]:
+                del current_state[tracked_path]
+            current_state.pop(key, None)
+            if path.is_dir() and tracked:
+                current_state.update(self._scan_directory(root=path).files)
+
+        return current_state, self._diff(previous.files, current_state)
+
+    def check_paths(
+        self, paths: Iterable[Path], write_state: bool = True
+    ) -> FileTrackerOutput:
+        """
+        Analyzes only the given paths for changes and returns the delta.
 
-        # Efficiently find differences using set operations
-        new_paths = current_paths - previous_paths
-        deleted_paths = previous_paths - current_paths
+        Paths may be files or directories, and may no longer exist. A directory is
+        scanned recursively; a missing path drops every tracked file at or under it.
 
-        # Check for modifications only in files that existed before
-        common_paths = previous_paths & current_paths
-        modified_paths = {
-            path
-            for path in common_paths
-            if previous_state[path].mtime != current_state[path].mtime
-        }
+        Args:
+            paths: Paths inside the watch directory that may have changed.
+            write_state: If True, the new state will be written to the state file.
 
-        if write_state:
-            self._write_state(current_state)
+        Returns:
+            A FileTrackerOutput object detailing the changes.
+        """
+        previous = self._read_state()
+        current_state, changes = self._check_paths(paths)
+
+        if write_state and current_state != previous.files:
+            # Directory mtimes are left as they were; directories touched here
+            # simply no longer match and get listed again on the next full scan.
+            self._write_state(previous._replace(files=current_state))
             logger.info(f"Updated state file with {len(current_state)} entries.")
 
-        return FileTrackerOutput(
-            new_files=new_paths,
-            deleted_files=deleted_paths,
-            modified_files=modified_paths,
-        )
+        return changes
 
     def attach(self, observer):
         self._observers.append(observer)
@@ -147,29 +396,210 @@ class FileTracker:
     def detach(self, observer):
         self._observers.remove(observer)
 
-    def sync(self):
-        "Sync all files in the watch dir with the vector store"
-        tracking_results = self.check()
+    def sync(self, stop: threading.Event | None = None):
+        """
+        Sync all files in the watch dir with the vector store.
+
+        Each changed file's new state is committed only once every observer handled
+        it, so an interrupted or failed sync resumes with the files it didn't finish.
+
+        Calls made while a sync is running join it instead of scanning again.
+
+        Args:
+            stop: Once set, files that weren't started yet are left for the next
+                sync, so the sync ends after the files being handled.
+        """
+        self._sync_flight.do("sync", self._sync, stop)
+
+    def _sync(self, stop: threading.Event | None = None):
+        with self._lock:
+            previous = self._read_state()
+            current = self._scan_directory(previous)
+            changes = self._diff(previous.files, current.files)
+            pending = self._apply(previous.files, current.files, changes, stop)
+
+            # A cached listing would hide a new file that isn't committed yet, so
+            # directories holding unfinished files are listed again next time.
+            pending_dirs = {path.rpartition(os.sep)[0] for path in pending}
+            self._write_state(
+                TrackerState(
+                    files=self._read_state().files,
+                    dirs={
+                        path: mtime
+                        for path, mtime in current.dirs.items()
+                        if path not in pending_dirs
+                    },
+                    scan_key=current.scan_key,
+                )
+            )
+
+    def sync_paths(self, paths: Iterable[Path], stop: threading.Event | None = None):
+        "Sync only the given (possibly deleted) paths with the vector store"
+        with self._lock:
+            previous = self._read_state()
+            current_state, changes = self._check_paths(paths)
+            self._apply(previous.files, current_state, changes, stop)
+
+    def retry_due(self) -> list[Path]:
+        """Returns the failed files whose retry delay has passed."""
+        now = time.time()
+        return [
+            Path(failure.path)
+            for failure in self._state.failures().values()
+            if failure.next_retry <= now
+        ]
+
+    def _apply(
+        self,
+        previous_state: dict[str, FileState],
+        current_state: dict[str, FileState],
+        changes: FileTrackerOutput,
+        stop: threading.Event | None = None,
+    ) -> set[str]:
+        """
+        Hands `changes` to the observers and commits each file as it succeeds.
+        Files skipped because `stop` was set are neither committed nor failed.
+
+        Returns:
+            The changed paths that were not committed (failed or waiting for retry).
+        """
+        # Files that only got a new mtime or their first hash need no observer
+        for path, file_state in current_state.items():
+            if previous_state.get(path) not in (None, file_state):
+                if Path(path) not in changes.modified_files:
+                    self._state.save_file(path, file_state)
+
+        # Files still backing off from an earlier failure wait for their turn
+        failures = self._state.failures()
+        now = time.time()
+        deferred = {
+            path
+            for path in map(
+                str, changes.new_files | changes.modified_files | changes.deleted_files
+            )
+            if path in failures and failures[path].next_retry > now
+        }
+        if deferred:
+            logger.info(f"Deferring {len(deferred)} files waiting to be retried")
+            changes = FileTrackerOutput(
+                *({p for p in paths if str(p) not in deferred} for paths in changes)
+            )
+
+        remaining = {
+            str(path): len(self._observers)
+            for path in changes.new_files
+            | changes.modified_files
+            | changes.deleted_files
+        }
+        if not self._observers:
+            for path in remaining:
+                self._state.save_file(path, current_state.get(path))
+            return deferred
+
+        failed: set[str] = set()
+        lock = threading.Lock()
+
+        def on_result(filepath: Path, error: Exception | None):
+            path = str(filepath)
+            with lock:
+                if path in failed or path not in remaining:
+                    return
+                if error is not None:
+                    failed.add(path)
+                    self._record_failure(path, error, current_state.get(path))
+                    return
+                remaining[path] -= 1
+                if remaining[path] > 0:
+                    return
+                del remaining[path]
+            self._state.save_file(path, current_state.get(path))
+            self._state.clear_failure(path)
+
+        self._notify(changes, on_result, stop)
+        return deferred | failed | set(remaining)
+
+    def _record_failure(
+        self, path: str, error: Exception, file_state: FileState | None
+    ):
+        previous = self._state.failures().get(path)
+        attempts = previous.attempts + 1 if previous else 1
+        if attempts >= self.max_attempts:
+            # Give up until the file changes again, rather than retrying forever
+            logger.error(f"Giving up on {path} after {attempts} attempts: {error}")
+            self._state.save_file(path, file_state)
+            self._state.clear_failure(path)
+            return
+
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        logger.warning(
+            f"Failed to sync {path} (attempt {attempts}), "
+            f"retrying in {delay:.0f}s: {error}"
+        )
+        self._state.save_failure(
+            FailedFile(
+                path=path,
+                attempts=attempts,
+                next_retry=time.time() + delay,
+                error=str(error),
+            )
+        )
+
+    def _notify(
+        self,
+        tracking_results: FileTrackerOutput,
+        on_result: Callable[[Path, Exception | None], Any],
+        stop: threading.Event | None = None,
+    ):
         print(tracking_results)
         logger.info("Syncing Files...")
+
+        # Observers that take the whole delta at once (e.g. a parallel ingestion
+        # pipeline) instead of one file at a time
+        batch_observers = [o for o in self._observers if hasattr(o, "handle_changes")]
+        file_observers = [o for o in self._observers if o not in batch_observers]
+        if any(tracking_results):
+            for observer in batch_observers:
+                try:
+                    observer.handle_changes(
+                        tracking_results, on_result=on_result, stop=stop
+                    )
+                except Exception:
+                    # Files the observer didn't report on stay uncommitted
+                    logger.exception(f"Observer {observer} failed")
+
         if filepaths := tracking_results.new_files:
             print(filepaths)
             for filepath in filepaths:
-                for observer in self._observers:
+                if stop is not None and stop.is_set():
+                    return
+                for observer in file_observers:
                     logger.info(f"Embedding new file at {filepath}")
-                    observer.handle_new_file(filepath=filepath)
+                    self._call(observer.handle_new_file, filepath, on_result)
 
         if filepaths := tracking_results.modified_files:
             for filepath in filepaths:
-                for observer in self._observers:
+                if stop is not None and stop.is_set():
+                    return
+                for observer in file_observers:
                     logger.info(f"Re-emdedding modified file at {filepath}")
-                    observer.handle_modified_file(filepath=filepath)
+                    self._call(observer.handle_modified_file, filepath, on_result)
 
         if filepaths := tracking_results.deleted_files:
             for filepath in filepaths:
-                for observer in self._observers:
+                if stop is not None and stop.is_set():
+                    return
+                for observer in file_observers:
                     logger.info(f"Deleting embeddings of file at {filepath}")
-                    observer.handle_deleted_file(filepath=filepath)
+                    self._call(observer.handle_deleted_file, filepath, on_result)
+
+    @staticmethod
+    def _call(handler, filepath: Path, on_result):
+        try:
+            handler(filepath=filepath)
+        except INGEST_ERRORS as e:
+            on_result(filepath, e)
+        else:
+            on_result(filepath, None)
 
 
 # --- Main Execution ---
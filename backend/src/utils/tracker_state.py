@@ -0,0 +1,295 @@
+"""
+Persistent state for FileTracker, stored in SQLite.
+
+The whole state is loaded once into an in-memory mirror; every later read is
+served from the mirror and every write only touches the rows that differ from
+it. The database runs in WAL mode so a write never rewrites the file.
+
+Files whose ingestion failed are kept in a retry queue (the `failures` table)
+until they succeed or run out of attempts.
+
+State files from older versions (a JSON list, or a JSON object with "files" and
+"dirs") are migrated in place the first time they are opened; the original is
+kept next to it with a `.json.bak` suffix.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS failures (
+    path TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    next_retry REAL NOT NULL,
+    error TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# --- Data Structures ---
+
+
+class FileState(NamedTuple):
+    """A lightweight, immutable representation of a file's state."""
+
+    # Kept as a plain string: building and hashing a Path for every file
+    # dominates scan time on large trees. Paths are only built for the delta.
+    path: str
+    mtime: float
+    size: int = -1
+    # Content hash, filled in lazily only for files whose mtime or size changed
+    hash: str | None = None
+
+    @classmethod
+    def from_path(cls, path: Path) -> "FileState":
+        """Creates a FileState instance from a Path object."""
+        stat = path.stat()
+        return cls(path=str(path), mtime=stat.st_mtime, size=stat.st_size)
+
+
+class FailedFile(NamedTuple):
+    """A file waiting in the retry queue."""
+
+    path: str
+    attempts: int
+    # Wall clock time (time.time()) after which the file is retried
+    next_retry: float
+    error: str | None = None
+
+
+class TrackerState(NamedTuple):
+    """Everything the tracker remembers between runs, keyed by path string."""
+
+    files: dict[str, FileState]
+    # Directory path -> mtime at the time its entries were last listed
+    dirs: dict[str, float]
+    # Filter settings the directory listings were made with
+    scan_key: str = ""
+
+
+def read_json_state(filepath: Path) -> TrackerState:
+    """Reads a state file written by the JSON based FileTracker."""
+    try:
+        data = json.loads(filepath.read_text())
+
+        # The oldest state files are a bare list of file entries
+        if isinstance(data, list):
+            data = {"files": data, "dirs": []}
+
+        return TrackerState(
+            files={
+                item["path"]: FileState(
+                    path=item["path"],
+                    mtime=item["mtime"],
+                    size=item.get("size", -1),
+                    hash=item.get("hash"),
+                )
+                for item in data["files"]
+            },
+            dirs={item["path"]: item["mtime"] for item in data["dirs"]},
+        )
+    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError) as e:
+        logger.warning(f"Could not parse state file, treating as empty: {e}")
+        return TrackerState(files={}, dirs={})
+
+
+# --- Store ---
+
+
+class SqliteTrackerState:
+    """SQLite backed tracker state with an in-memory mirror."""
+
+    def __init__(self, filepath: Path):
+        self.filepath = filepath
+        self._conn: sqlite3.Connection | None = None
+        self._mirror: TrackerState | None = None
+        self._failures: dict[str, FailedFile] | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filepath, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _is_sqlite(self) -> bool:
+        with self.filepath.open("rb") as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+    def load(self) -> TrackerState:
+        """
+        Returns the last saved state. Only the first call reads the database;
+        the returned dicts must be treated as read-only.
+        """
+        with self._lock:
+            if self._mirror is not None:
+                return self._mirror
+
+            # The database is only created on the first save
+            if not self.filepath.exists() or self.filepath.stat().st_size == 0:
+                self._mirror = TrackerState(files={}, dirs={})
+            elif not self._is_sqlite():
+                self._mirror = self._migrate_json()
+            else:
+                conn = self._connect()
+                self._mirror = TrackerState(
+                    files={
+                        row[0]: FileState(*row)
+                        for row in conn.execute(
+                            "SELECT path, mtime, size, hash FROM files"
+                        )
+                    },
+                    dirs=dict(conn.execute("SELECT path, mtime FROM dirs")),
+                    scan_key=dict(conn.execute("SELECT key, value FROM meta")).get(
+                        "scan_key", ""
+                    ),
+                )
+            return self._mirror
+
+    def save(self, state: TrackerState):
+        """Writes `state`, touching only the rows that changed since the last save."""
+        previous = self.load()
+        with self._lock:
+            changed_files = [
+                fs for path, fs in state.files.items() if previous.files.get(path) != fs
+            ]
+            removed_files = [
+                (path,) for path in previous.files.keys() - state.files.keys()
+            ]
+            changed_dirs = [
+                (path, mtime)
+                for path, mtime in state.dirs.items()
+                if previous.dirs.get(path) != mtime
+            ]
+            removed_dirs = [
+                (path,) for path in previous.dirs.keys() - state.dirs.keys()
+            ]
+
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, mtime, size, hash) "
+                    "VALUES (?, ?, ?, ?)",
+                    changed_files,
+                )
+                conn.executemany("DELETE FROM files WHERE path = ?", removed_files)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)",
+                    changed_dirs,
+                )
+                conn.executemany("DELETE FROM dirs WHERE path = ?", removed_dirs)
+                if state.scan_key != previous.scan_key:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        ("scan_key", state.scan_key),
+                    )
+
+            self._mirror = state
+            logger.debug(
+                f"Saved tracker state: {len(changed_files)} files changed, "
+                f"{len(removed_files)} removed"
+            )
+
+    def save_file(self, path: str, state: FileState | None):
+        """Commits a single file's state, or its removal when `state` is None."""
+        self.load()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if state is None:
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files (path, mtime, size, hash) "
+                        "VALUES (?, ?, ?, ?)",
+                        state,
+                    )
+            # Replace rather than mutate, readers may hold the previous dict
+            files = dict(self._mirror.files)
+            if state is None:
+                files.pop(path, None)
+            else:
+                files[path] = state
+            self._mirror = self._mirror._replace(files=files)
+
+    def failures(self) -> dict[str, FailedFile]:
+        """Returns the retry queue, keyed by path."""
+        with self._lock:
+            if self._failures is None:
+                if self.filepath.exists() and self._is_sqlite():
+                    rows = self._connect().execute(
+                        "SELECT path, attempts, next_retry, error FROM failures"
+                    )
+                    self._failures = {row[0]: FailedFile(*row) for row in rows}
+                else:
+                    self._failures = {}
+            return dict(self._failures)
+
+    def save_failure(self, failure: FailedFile):
+        self.failures()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO failures "
+                    "(path, attempts, next_retry, error) VALUES (?, ?, ?, ?)",
+                    failure,
+                )
+            self._failures[failure.path] = failure
+
+    def clear_failure(self, path: str):
+        if path not in self.failures():
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM failures WHERE path = ?", (path,))
+            self._failures.pop(path, None)
+
+    def _migrate_json(self) -> TrackerState:
+        state = read_json_state(self.filepath)
+        backup = self.filepath.with_name(self.filepath.name + ".json.bak")
+        self.filepath.replace(backup)
+        logger.info(f"Migrating JSON state file to SQLite, original kept at {backup}")
+
+        self._mirror = TrackerState(files={}, dirs={})
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO files (path, mtime, size, hash) VALUES (?, ?, ?, ?)",
+                state.files.values(),
+            )
+            conn.executemany(
+                "INSERT INTO dirs (path, mtime) VALUES (?, ?)", state.dirs.items()
+            )
+        return state
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,288 @@
+"""
+Keeps a FileTracker in sync with its watch directory in the background.
+
+On Linux the watcher subscribes to inotify events for every directory under the
+watch dir and hands only the changed paths to `FileTracker.sync_paths`, so no
+full rescan happens after the initial one. Everywhere else (or when inotify is
+unavailable, e.g. the per-user watch limit is exhausted) it falls back to
+calling `FileTracker.sync` on a fixed interval.
+
+Bursts of events (editors writing temp files, `git checkout`, ...) are debounced
+and applied as one batch, at the latest `max_delay` seconds after the first
+event of the batch, so a file written more often than the debounce window (a
+log, a swap file) can't hold off syncs indefinitely. Files whose sync failed are
+retried once their backoff delay has passed.
+
+Stopping the watcher interrupts a running sync between files and waits for the
+files being synced, so the tracker's observers can be closed right after.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+from .track_files import FileTracker
+
+logger = logging.getLogger(__name__)
+
+
+# --- inotify bindings ---
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class InotifyEvent(NamedTuple):
+    path: Path
+    mask: int
+
+
+class Inotify:
+    """Minimal ctypes wrapper around the Linux inotify API for directory trees."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._watches: dict[int, Path] = {}
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def add_watch(self, path: Path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        self._watches[wd] = path
+
+    def add_tree(self, root: Path, skip: Callable[[Path], bool] | None = None):
+        """Watches `root` and every directory below it not rejected by `skip`."""
+        if skip and skip(root):
+            return
+        self.add_watch(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            kept = []
+            for dirname in dirnames:
+                path = Path(dirpath) / dirname
+                if not (skip and skip(path)):
+                    self.add_watch(path)
+                    kept.append(dirname)
+            dirnames[:] = kept  # Prune skipped directories from the walk
+
+    def read_events(self, timeout: float) -> list[InotifyEvent]:
+        """Waits up to `timeout` seconds and returns the events that arrived."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append(InotifyEvent(path=Path(), mask=mask))
+                continue
+
+            watch_path = self._watches.get(wd)
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if watch_path is None:
+                continue
+
+            path = watch_path / os.fsdecode(name) if name else watch_path
+            events.append(InotifyEvent(path=path, mask=mask))
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._watches.clear()
+
+
+# --- Watcher ---
+
+
+class FileWatcher:
+    """
+    Runs a FileTracker continuously on a daemon thread so callers never have to
+    scan the watch directory themselves.
+    """
+
+    def __init__(
+        self,
+        tracker: FileTracker,
+        debounce: float = 0.5,
+        poll_interval: float = 30.0,
+        use_inotify: bool = True,
+        max_delay: float = 5.0,
+    ):
+        self.tracker = tracker
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.mode: str | None = None  # "inotify" or "polling" once started
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="file-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """Stops watching and waits up to `timeout` seconds (default: until done)
+        for the sync in progress to finish its current files."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def _run(self):
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = Inotify()
+                inotify.add_tree(self.tracker.watch_dir, skip=self._is_skipped)
+            except OSError as e:
+                logger.warning(f"inotify unavailable, falling back to polling: {e}")
+                if inotify is not None:
+                    inotify.close()
+                inotify = None
+
+        # Catch up on everything that changed while we were not running.
+        # Watches are added first so nothing slips in between.
+        self._safe_sync()
+
+        if inotify is None:
+            self.mode = "polling"
+            self._poll()
+        else:
+            self.mode = "inotify"
+            try:
+                self._watch(inotify)
+            finally:
+                inotify.close()
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self._safe_sync()
+
+    def _watch(self, inotify: Inotify):
+        pending: set[Path] = set()
+        full_rescan = False
+        deadline = None
+        flush_by = None  # Deadline that further events don't push back
+        next_retry_check = time.monotonic() + self.poll_interval
+
+        while not self._stop_event.is_set():
+            events = inotify.read_events(timeout=min(self.debounce, 0.5))
+            for event in events:
+                if event.mask & IN_Q_OVERFLOW:
+                    full_rescan = True
+                    continue
+                if event.mask & IN_ISDIR and event.mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        inotify.add_tree(event.path, skip=self._is_skipped)
+                    except OSError as e:
+                        logger.warning(f"Could not watch {event.path}: {e}")
+                        full_rescan = True
+                pending.add(event.path)
+
+            now = time.monotonic()
+            if events:
+                deadline = now + self.debounce
+                if flush_by is None:
+                    flush_by = now + self.max_delay
+            if deadline is not None and (
+                (not events and now >= deadline) or now >= flush_by
+            ):
+                if full_rescan:
+                    self._safe_sync()
+                else:
+                    self._safe_sync(pending)
+                pending = set()
+                full_rescan = False
+                deadline = flush_by = None
+            elif not events and now >= next_retry_check:
+                # Nothing changed, but files that failed earlier may be due
+                next_retry_check = time.monotonic() + self.poll_interval
+                if due := self.tracker.retry_due():
+                    self._safe_sync(set(due))
+
+    def _is_skipped(self, path: Path) -> bool:
+        return not self.tracker.is_tracked(path)
+
+    def _safe_sync(self, paths: set[Path] | None = None):
+        try:
+            if paths is None:
+                self.tracker.sync(stop=self._stop_event)
+            else:
+                self.tracker.sync_paths(paths, stop=self._stop_event)
+        except Exception:
+            logger.exception("Background file sync failed")
@@ -0,0 +1,67 @@
+"""
+Bounded thread pool for running blocking work from async request handlers.
+
+At most `max_workers` calls run at once and at most `max_queue` more wait for a
+free worker. Calls beyond that are rejected with QueueFullError right away, so
+an overloaded server answers "busy" instead of letting requests pile up until
+they time out. The event loop itself never blocks, so cheap endpoints such as
+/health stay responsive while every worker is busy.
+"""
+
+import asyncio
+import functools
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+
+class QueueFullError(Exception):
+    def __init__(self, message="Too many requests waiting"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class WorkerPool:
+    def __init__(self, max_workers: int = 4, max_queue: int = 32, name="worker"):
+        """
+        Args:
+            max_workers: Number of calls that run concurrently.
+            max_queue: Number of calls that may wait for a worker.
+            name: Prefix of the worker thread names.
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=name
+        )
+        self._pending = 0  # Running and waiting calls
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn(*args, **kwargs)` on a worker and waits for its result."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise QueueFullError()
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Released when the call finishes, not when the caller stops waiting:
+        # a cancelled request (client gone) leaves the call running
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self, wait: bool = False):
+        """Stops accepting work; calls already submitted still finish."""
+        self._executor.shutdown(wait=wait)
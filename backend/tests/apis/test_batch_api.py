@@ -0,0 +1,107 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from file_rag import BatchAnswer, DocumentRAG
+from src.common_types.base import Document
+from src.utils.worker_pool import WorkerPool
+
+client = TestClient(server.app)
+
+
+class RecordingRetriver:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, questions):
+        self.queries.append(list(questions))
+        return [
+            [Document(content=f"notes on {q}")] if "unknown" not in q else []
+            for q in questions
+        ]
+
+
+class SlowGenerator:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, contexts, question, mode=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+        if question == "fail":
+            raise openai.APIConnectionError(
+                message="LM went away", request=httpx.Request("POST", "http://lm")
+            )
+        return SimpleNamespace(response=f"{question}: {contexts[0]}")
+
+
+class BatchRAGService:
+    def query_many(self, questions, mode=None):
+        return [
+            BatchAnswer(q, None, "LM went away")
+            if q == "fail"
+            else BatchAnswer(q, SimpleNamespace(response=f"answer to {q}"))
+            for q in questions
+        ]
+
+
+@pytest.fixture(autouse=True)
+def pool(monkeypatch):
+    pool = WorkerPool(max_workers=2, max_queue=2)
+    monkeypatch.setattr(server, "query_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_query_many_retrieves_once_and_generates_concurrently():
+    retriver = RecordingRetriver()
+    generator = SlowGenerator()
+    rag = DocumentRAG(parser=None, retriver=retriver, generator=generator)
+    questions = [f"q{i}" for i in range(8)] + ["unknown", "fail"]
+
+    results = rag.query_many(questions, max_workers=4)
+
+    assert retriver.queries == [questions]
+    assert [r.response for r in results[:8]] == [
+        f"q{i}: notes on q{i}" for i in range(8)
+    ]
+    assert results[8].response == "No relevant sources"
+    assert isinstance(results[9], openai.APIConnectionError)
+    assert 1 < generator.max_in_flight <= 4
+
+
+def test_rag_batch_answers_in_order(monkeypatch):
+    monkeypatch.setattr(server, "rag_service", BatchRAGService())
+
+    response = client.post("/rag/batch", json={"questions": ["a", "fail", "b"]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "responses": [
+            {"question": "a", "response": "answer to a", "error": None},
+            {"question": "fail", "response": None, "error": "LM went away"},
+            {"question": "b", "response": "answer to b", "error": None},
+        ]
+    }
+
+
+def test_rag_batch_rejects_bad_and_oversized_batches(monkeypatch):
+    monkeypatch.setattr(server, "rag_service", BatchRAGService())
+    monkeypatch.setattr(server.app_config, "batch_max_questions", 2)
+
+    assert client.post("/rag/batch", json={"questions": "a"}).status_code == 400
+    assert client.post("/rag/batch", json={"questions": ["a", ""]}).status_code == 400
+    oversized = client.post("/rag/batch", json={"questions": ["a", "b", "c"]})
+    assert oversized.status_code == 413
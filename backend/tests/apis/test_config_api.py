@@ -1,5 +1,10 @@
+import asyncio
+import threading
+
+import httpx
 from fastapi.testclient import TestClient
 
+import server
 from server import app
 
 client = TestClient(app)
@@ -40,3 +45,48 @@ def test_post_config(mocker):
     assert json_response["new_config"]["watch_dir"] == "xyz"
 
     assert mock.call_count == 1
+
+
+def test_post_config_rebuilds_services_off_the_event_loop(mocker):
+    mocker.patch.object(server.app_config, "write")
+    building = threading.Event()
+    release = threading.Event()
+
+    def initialize():
+        building.set()
+        release.wait(5)
+
+    mocker.patch("server.initialize_services", side_effect=initialize)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            posting = asyncio.create_task(c.post("/config", json={}))
+            while not building.is_set():
+                await asyncio.sleep(0.01)
+            health = await asyncio.wait_for(c.get("/health"), timeout=1)
+            busy = await c.post("/rag", json={"question": "q"})
+            release.set()
+            return health, busy, await posting
+
+    try:
+        health, busy, posted = asyncio.run(scenario())
+    finally:
+        release.set()
+
+    assert health.status_code == 200
+    assert busy.status_code == 503
+    assert posted.status_code == 200
+
+
+def test_failed_rebuild_keeps_the_previous_services(mocker, monkeypatch):
+    mocker.patch.object(server.app_config, "write")
+    mocker.patch("server._build_services", side_effect=RuntimeError("no ollama"))
+    previous = mocker.Mock()
+    monkeypatch.setattr(server, "rag_service", previous)
+
+    response = client.post("/config", json={})
+
+    assert response.status_code == 500
+    assert server.rag_service is previous
+    assert [call[0] for call in previous.method_calls] == ["pause", "start"]
@@ -0,0 +1,167 @@
+"""
+Load test for /rag: throughput has to rise with the number of concurrent
+clients, since questions are answered on a worker pool instead of the event
+loop. Set QUERY_LOAD_REQUESTS for a longer run, e.g.
+
+    QUERY_LOAD_REQUESTS=200 pytest tests/apis/test_query_load.py -s
+"""
+
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import server
+from src.utils.worker_pool import QueueFullError, WorkerPool
+
+LATENCY = 0.05  # Seconds one (blocking) question takes to answer
+
+
+class SlowRAGService:
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = 0
+
+    def query(self, question: str, mode=None):
+        self.calls += 1
+        self.release.wait()
+        time.sleep(LATENCY)
+        return SimpleNamespace(response=f"answer to {question}")
+
+
+@pytest.fixture
+def slow_server(monkeypatch):
+    rag_service = SlowRAGService()
+    pool = WorkerPool(max_workers=8, max_queue=4)
+    monkeypatch.setattr(server, "rag_service", rag_service)
+    monkeypatch.setattr(server, "query_pool", pool)
+    yield rag_service
+    rag_service.release.set()
+    pool.shutdown()
+
+
+async def run_clients(n_clients: int, n_requests: int) -> float:
+    """Sends `n_requests` questions from `n_clients` clients, returns requests/sec"""
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        questions = iter(range(n_requests))
+
+        async def worker():
+            for i in questions:
+                response = await client.post("/rag", json={"question": f"q{i}"})
+                assert response.json() == {"response": f"answer to q{i}"}
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(n_clients)))
+        return n_requests / (time.perf_counter() - start)
+
+
+def test_throughput_rises_with_concurrent_clients(slow_server):
+    n_requests = int(os.environ.get("QUERY_LOAD_REQUESTS", "16"))
+
+    throughput = {n: asyncio.run(run_clients(n, n_requests)) for n in (1, 4, 8)}
+
+    print(
+        "\n"
+        + ", ".join(f"{n} clients: {rps:.1f} req/s" for n, rps in throughput.items())
+    )
+    assert throughput[4] > 2 * throughput[1]
+    assert throughput[8] > throughput[4]
+
+
+def test_health_responds_and_excess_requests_are_rejected_while_busy(slow_server):
+    slow_server.release.clear()  # Hold every question in its worker
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            busy = [
+                asyncio.create_task(c.post("/rag", json={"question": f"q{i}"}))
+                for i in range(12)  # Fills the 8 workers and 4 queue slots
+            ]
+            while server.query_pool.pending < 12:
+                await asyncio.sleep(0.01)
+
+            health = await asyncio.wait_for(c.get("/health"), timeout=1)
+            rejected = await c.post("/rag", json={"question": "one more"})
+
+            slow_server.release.set()
+            answered = await asyncio.gather(*busy)
+            return health, rejected, answered
+
+    health, rejected, answered = asyncio.run(scenario())
+
+    assert health.status_code == 200
+    assert rejected.status_code == 503
+    assert all(response.status_code == 200 for response in answered)
+
+
+def test_identical_questions_in_flight_are_answered_once(slow_server):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await asyncio.gather(
+                c.post("/rag", json={"question": "What is new?"}),
+                c.post("/rag", json={"question": "what is new"}),
+                c.post("/rag", json={"question": "Something else"}),
+            )
+
+    same, rephrased, other = asyncio.run(scenario())
+
+    assert same.json() == rephrased.json() == {"response": "answer to What is new?"}
+    assert other.json() == {"response": "answer to Something else"}
+    assert slow_server.calls == 2
+
+
+def test_cancelled_requests_keep_their_slot_until_the_call_ends():
+    pool = WorkerPool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        waiting = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting.cancel()  # The client went away, the call keeps running
+        await asyncio.sleep(0.01)
+        pending = pool.pending
+        with pytest.raises(QueueFullError):
+            await asyncio.wait_for(pool.run(time.sleep, 0), timeout=1)
+        release.set()
+        while pool.pending:
+            await asyncio.sleep(0.01)
+        return pending
+
+    try:
+        assert asyncio.run(scenario()) == 1
+        assert pool.pending == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_shutdown_waits_for_questions_being_answered(slow_server, monkeypatch):
+    slow_server.release.clear()
+    events = []
+    slow_server.stop = lambda: events.append("stop")
+    monkeypatch.setattr(server, "model_warmer", None)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            answering = asyncio.create_task(c.post("/rag", json={"question": "q"}))
+            while not slow_server.calls:
+                await asyncio.sleep(0.01)
+            stopping = asyncio.create_task(asyncio.to_thread(server.shutdown_services))
+            await asyncio.sleep(0.05)
+            events.append("answering")
+            slow_server.release.set()
+            response = await answering
+            await stopping
+            return response
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert events == ["answering", "stop"]
@@ -0,0 +1,109 @@
+"""
+Benchmarks server startup: what importing `server` costs (the time before the
+socket can be bound), and what each module imported while the services are
+built in the background costs, in a fresh process.
+
+Import costs come from `python -X importtime` and are cumulative per top-level
+import, i.e. a module's own time plus the dependencies it was first to import.
+Init costs time the construction of a RAGService with each vector store. Run
+with -s to see the report:
+
+    pytest tests/apis/test_startup_benchmark.py -s
+"""
+
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import server
+
+BACKEND_DIR = Path(__file__).parents[2]
+HEAVY_MODULES = ("dspy", "chromadb", "openai", "litellm")
+
+STARTUP = """
+import json, sys, time
+from pathlib import Path
+
+import server
+heavy = [m for m in {heavy!r} if m in sys.modules]
+
+import file_rag, assistant, src.stores.chroma_store
+from file_rag import RAGService
+
+timings = {{}}
+for store in ("numpy", "chroma"):
+    start = time.perf_counter()
+    service = RAGService(
+        watch_dir=None, data_dir=Path(sys.argv[1]) / store, vector_store=store
+    )
+    timings[store] = time.perf_counter() - start
+    service.stop()
+print(json.dumps({{"heavy": heavy, "init": timings}}))
+"""
+
+IMPORT_TIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)")
+
+
+def top_level_imports(stderr: str) -> dict[str, float]:
+    """Cumulative seconds of every top-level import in `-X importtime` output."""
+    return {
+        match[2]: int(match[1]) / 1e6
+        for match in map(IMPORT_TIME.match, stderr.splitlines())
+        if match
+    }
+
+
+def test_server_imports_without_heavy_dependencies_and_benchmark(tmp_path: Path):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            STARTUP.format(heavy=HEAVY_MODULES),
+            str(tmp_path),
+        ],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = top_level_imports(result.stderr)
+
+    assert report["heavy"] == []
+    for module in ("server", "file_rag", "assistant", "src.stores.chroma_store"):
+        assert module in imports
+
+    print("\nImports (cumulative, in import order):")
+    for module in ("server", "file_rag", "assistant", "src.stores.chroma_store"):
+        print(f"  {module:>24}: {imports[module]:.3f}s")
+    print("RAGService init:")
+    for store, seconds in report["init"].items():
+        print(f"  {store:>24}: {seconds:.3f}s")
+
+
+def test_health_answers_while_services_start(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(server, "initialize_services", lambda: release.wait(10))
+    monkeypatch.setattr(server, "shutdown_services", lambda: None)
+    monkeypatch.setattr(server, "rag_service", None)
+
+    with TestClient(server.app) as client:
+        assert client.get("/health").status_code == 200
+        assert client.get("/api/status").json()["starting"] is True
+        assert client.post("/rag", json={"question": "q"}).status_code == 503
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while client.get("/api/status").json()["starting"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # Started, with no watch dir configured
+        assert client.post("/rag", json={"question": "q"}).status_code == 409
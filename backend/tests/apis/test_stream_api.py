@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from src.common_types.base import Document
+from src.utils.worker_pool import WorkerPool
+
+client = TestClient(server.app)
+
+
+class StreamingRAGService:
+    def __init__(self, sources):
+        self.sources = sources
+
+    def retrieve(self, question):
+        return self.sources
+
+    async def astream(self, question, sources, mode=None):
+        for token in ["The ", "answer"]:
+            yield token
+        yield SimpleNamespace(response="The answer")
+
+
+class FailingAssistant:
+    async def astream(self, question, mode=None):
+        yield "Par"
+        raise RuntimeError("LM went away")
+
+
+def read_events(response) -> list[tuple[str, object]]:
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+@pytest.fixture(autouse=True)
+def pool(monkeypatch):
+    pool = WorkerPool(max_workers=2, max_queue=2)
+    monkeypatch.setattr(server, "query_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_rag_stream_sends_sources_then_tokens(monkeypatch):
+    source = Document(content="notes", metadata={"filename": "a.md"})
+    monkeypatch.setattr(server, "rag_service", StreamingRAGService([source]))
+
+    response = client.post("/rag/stream", json={"question": "q"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert read_events(response) == [
+        ("sources", [{"content": "notes", "metadata": {"filename": "a.md"}}]),
+        ("token", {"token": "The "}),
+        ("token", {"token": "answer"}),
+        ("done", {"response": "The answer"}),
+    ]
+
+
+def test_rag_stream_without_sources_skips_the_llm(monkeypatch):
+    monkeypatch.setattr(server, "rag_service", StreamingRAGService([]))
+
+    response = client.post("/rag/stream", json={"question": "q"})
+
+    assert read_events(response) == [
+        ("sources", []),
+        ("done", {"response": "No relevant sources"}),
+    ]
+
+
+def test_ask_stream_reports_errors_as_events(monkeypatch):
+    monkeypatch.setattr(server, "ai_assitant", FailingAssistant())
+
+    response = client.post("/ask/stream", json={"question": "q"})
+
+    assert response.status_code == 200
+    assert read_events(response) == [
+        ("token", {"token": "Par"}),
+        ("error", {"detail": "LM went away"}),
+    ]
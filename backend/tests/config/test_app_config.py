@@ -1,9 +1,15 @@
+import inspect
 from pathlib import Path
 
 from platformdirs import PlatformDirs
 from pytest import MonkeyPatch
 
-from config.app_config import AppConfig, load_app_config
+from config.app_config import (
+    DEFAULT_EXCLUDE_PATTERNS,
+    DEFAULT_INCLUDE_PATTERNS,
+    AppConfig,
+    load_app_config,
+)
 
 
 def test_singleton_behaviour():
@@ -31,6 +37,27 @@ def test_create_instance_from_json(mocker):
     assert app_config.data_dir == "2"
     assert app_config.watch_dir is None
     assert app_config.gemini_api_key is None
+    assert app_config.include_patterns == DEFAULT_INCLUDE_PATTERNS
+    assert app_config.exclude_patterns == DEFAULT_EXCLUDE_PATTERNS
+
+
+def test_from_json_takes_missing_keys_from_init_defaults(mocker):
+    json_str = """
+        {
+            "config_dir": "1",
+            "data_dir": "2",
+            "rag_top_k": 8,
+            "no_longer_used": true
+        }
+    """
+    mocker.patch("pathlib.Path.read_text", return_value=json_str)
+    app_config = AppConfig.from_json(Path("/somefilepath"))
+    defaults = inspect.signature(AppConfig.__init__).parameters
+
+    assert app_config.rag_top_k == 8
+    assert app_config.vector_store == defaults["vector_store"].default
+    assert app_config.ollama_keep_alive == defaults["ollama_keep_alive"].default
+    assert not hasattr(app_config, "no_longer_used")
 
 
 def test_update_fields():
@@ -0,0 +1,85 @@
+import asyncio
+from pathlib import Path
+
+from src.embedders.base import Embedder
+from src.embedders.cached_embedding import CachedEmbedder, text_hash
+
+# --- Test Setup ---
+
+
+class CountingEmbedder(Embedder):
+    model_name = "counting"
+
+    def __init__(self, dim: int = 4):
+        self.dim = dim
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] * self.dim for text in texts]
+
+
+# --- Test Cases ---
+
+
+def test_cache_serves_repeated_texts_across_runs(tmp_path: Path):
+    inner = CountingEmbedder()
+    cache = CachedEmbedder(inner, tmp_path / "cache.sqlite")
+
+    first = cache.embed(["a", "bb", "a"])
+    assert inner.embedded == ["a", "bb"]
+    assert (cache.hits, cache.misses) == (0, 3)
+    cache.close()
+
+    reopened = CachedEmbedder(inner, tmp_path / "cache.sqlite")
+    assert reopened.embed(["bb", "a", "ccc"]) == [first[1], first[0], [3.0] * 4]
+    assert inner.embedded == ["a", "bb", "ccc"]
+    assert (reopened.hits, reopened.misses) == (2, 1)
+
+
+def test_cache_is_keyed_by_model(tmp_path: Path):
+    inner = CountingEmbedder()
+    CachedEmbedder(inner, tmp_path / "cache.sqlite", model_name="m1").embed(["a"])
+    CachedEmbedder(inner, tmp_path / "cache.sqlite", model_name="m2").embed(["a"])
+
+    assert inner.embedded == ["a", "a"]
+
+
+def test_least_recently_used_vectors_are_evicted(tmp_path: Path):
+    inner = CountingEmbedder(dim=4)  # 16 bytes per vector
+    cache = CachedEmbedder(inner, tmp_path / "cache.sqlite", max_bytes=48)
+
+    cache.embed(["a"])
+    cache.embed(["b"])
+    cache.embed(["c"])
+    cache.embed(["a"])  # "b" is now the least recently used
+    cache.embed(["d"])
+
+    assert cache.evictions >= 1
+    inner.embedded.clear()
+    cache.embed(["a", "d"])
+    assert inner.embedded == []
+    cache.embed(["b"])
+    assert inner.embedded == ["b"]
+
+
+def test_storing_a_cached_text_again_keeps_the_size(tmp_path: Path):
+    cache = CachedEmbedder(CountingEmbedder(dim=4), tmp_path / "cache.sqlite")
+    cache.embed(["a"])
+
+    # As when two concurrent misses for the same text both store it
+    cache._store({text_hash("a"): "a"}, [[1.0] * 4])
+
+    assert cache._size == 16
+
+
+def test_aembed_shares_the_cache(tmp_path: Path):
+    inner = CountingEmbedder()
+    cache = CachedEmbedder(inner, tmp_path / "cache.sqlite")
+
+    cache.embed(["a"])
+    vectors = asyncio.run(cache.aembed(["a", "bb"]))
+
+    assert vectors == [[1.0] * 4, [2.0] * 4]
+    assert inner.embedded == ["a", "bb"]
+    assert cache.hits == 1
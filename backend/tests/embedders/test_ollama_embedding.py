@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.embedders import ollama_embedding
+from src.embedders.ollama_embedding import OllamaEmbedding
+
+# --- Test Setup ---
+
+
+class FakeResponse:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+
+class FakeClient:
+    """Stands in for ollama.Client, recording batches and overlapping requests."""
+
+    def __init__(self, delay=lambda in_flight: 0.02, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed(self, model, input, keep_alive=None):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("connection refused")
+            self.batches.append(list(input))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            in_flight = self.in_flight
+        time.sleep(self.delay(in_flight))
+        with self._lock:
+            self.in_flight -= 1
+        return FakeResponse([[float(text)] for text in input])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def embed(self, model, input, keep_alive=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return FakeResponse([[float(text)] for text in input])
+
+    async def close(self):
+        self.closed = True
+
+
+def make_embedder(client, **kwargs):
+    embedder = OllamaEmbedding(**kwargs)
+    embedder._client = client
+    return embedder
+
+
+# --- Test Cases ---
+
+
+def test_batches_run_concurrently_and_keep_order():
+    client = FakeClient()
+    embedder = make_embedder(client, batch_size=3, max_in_flight=3)
+    texts = [str(i) for i in range(20)]
+
+    vectors = embedder.embed(texts)
+
+    assert vectors == [[float(i)] for i in range(20)]
+    assert all(len(batch) <= 3 for batch in client.batches)
+    assert 1 < client.max_in_flight <= 3
+
+
+def test_failed_batches_are_retried():
+    client = FakeClient(failures=2)
+    embedder = make_embedder(client, retry_delay=0.01)
+
+    assert embedder.embed(["1", "2"]) == [[1.0], [2.0]]
+
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(failures=10)
+    embedder = make_embedder(client, max_retries=1, retry_delay=0.01)
+
+    with pytest.raises(ConnectionError):
+        embedder.embed(["1"])
+
+
+def test_backs_off_when_latency_rises():
+    # Latency grows with concurrency: the server processes one request at a time
+    client = FakeClient(delay=lambda in_flight: 0.01 * in_flight**2)
+    embedder = make_embedder(client, batch_size=1, max_in_flight=8)
+
+    embedder.embed([str(i) for i in range(40)])
+
+    assert embedder.in_flight_limit < 8
+
+
+def test_aembed_runs_batches_concurrently_on_the_event_loop(monkeypatch):
+    client = FakeAsyncClient()
+    monkeypatch.setattr(ollama_embedding, "AsyncClient", lambda **kwargs: client)
+    embedder = OllamaEmbedding(batch_size=2, max_in_flight=3)
+
+    vectors = asyncio.run(embedder.aembed([str(i) for i in range(10)]))
+
+    assert vectors == [[float(i)] for i in range(10)]
+    assert 1 < client.max_in_flight <= 3
+
+
+def test_close_closes_both_clients(monkeypatch):
+    async_client = FakeAsyncClient()
+    monkeypatch.setattr(ollama_embedding, "AsyncClient", lambda **_: async_client)
+    client = FakeClient()
+    embedder = make_embedder(client)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(embedder.aembed(["1"]))
+
+    embedder.close()
+    loop.close()
+
+    assert client.closed and async_client.closed
+
+
+def test_sync_and_async_requests_share_the_in_flight_limit(monkeypatch):
+    client = FakeClient(delay=lambda in_flight: 0.01)
+
+    class SharedAsyncClient:
+        """Counts its requests in flight together with `client`'s."""
+
+        async def embed(self, model, input, keep_alive=None):
+            with client._lock:
+                client.in_flight += 1
+                client.max_in_flight = max(client.max_in_flight, client.in_flight)
+            await asyncio.sleep(0.01)
+            with client._lock:
+                client.in_flight -= 1
+            return FakeResponse([[float(text)] for text in input])
+
+    monkeypatch.setattr(
+        ollama_embedding, "AsyncClient", lambda **_: SharedAsyncClient()
+    )
+    embedder = make_embedder(client, batch_size=1, max_in_flight=2)
+    texts = [str(i) for i in range(20)]
+
+    async def both():
+        return await asyncio.gather(
+            asyncio.to_thread(embedder.embed, texts), embedder.aembed(texts)
+        )
+
+    sync_vectors, async_vectors = asyncio.run(both())
+
+    assert sync_vectors == async_vectors == [[float(i)] for i in range(20)]
+    assert client.max_in_flight == 2
+
+
+def test_async_requests_wait_for_a_slot_without_a_thread(monkeypatch):
+    release = threading.Event()
+    client = FakeClient(delay=lambda in_flight: release.wait(5))
+    monkeypatch.setattr(ollama_embedding, "AsyncClient", lambda **_: FakeAsyncClient())
+    embedder = make_embedder(client, max_in_flight=1)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+        holding = threading.Thread(target=embedder.embed, args=(["0"],))
+        holding.start()
+        while not client.in_flight:
+            await asyncio.sleep(0.01)
+        waiting = [asyncio.create_task(embedder.aembed([str(i)])) for i in range(3)]
+        await asyncio.sleep(0.05)
+        # The waiting batches don't hold the executor's only thread
+        other = await asyncio.wait_for(asyncio.to_thread(lambda: "done"), timeout=1)
+        release.set()
+        holding.join()
+        return other, await asyncio.gather(*waiting)
+
+    try:
+        other, vectors = asyncio.run(scenario())
+    finally:
+        release.set()
+
+    assert other == "done"
+    assert vectors == [[[0.0]], [[1.0]], [[2.0]]]
+    assert embedder._in_flight == 0
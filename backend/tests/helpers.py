@@ -0,0 +1,46 @@
+"""Fakes and helpers shared by the store, pipeline and cache tests."""
+
+import threading
+from pathlib import Path
+
+from src.common_types.base import Document, Documents
+from src.embedders.base import Embedder
+
+
+class KeywordEmbedder(Embedder):
+    """
+    Embeds a text by counting a few keywords (case-sensitively), so nearest
+    neighbours are obvious. Remembers what it embedded, and can be made to
+    fail (`fail`) or to wait for an event (`block`) like a stalled Ollama.
+    """
+
+    def __init__(self, keywords=("apple", "banana", "cherry", "date")):
+        self.keywords = list(keywords)
+        self.embedded = []
+        self.calls = 0
+        self.fail = False
+        self.block: threading.Event | None = None
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.block is not None:
+            self.block.wait()
+        if self.fail:
+            raise ConnectionError("Ollama is not running")
+        self.embedded.extend(texts)
+        return [[float(text.count(word)) for word in self.keywords] for text in texts]
+
+
+def chunks(filepath: str, *contents: str) -> Documents:
+    """One chunk of the file at `filepath` per text."""
+    return [
+        Document(
+            content=content,
+            metadata={"filepath": filepath, "filename": Path(filepath).name},
+        )
+        for content in contents
+    ]
+
+
+def contents(docs: Documents) -> list[str]:
+    return [doc.content for doc in docs]
@@ -0,0 +1,121 @@
+import pytest
+from dspy.utils.dummies import DummyLM
+from fastapi.testclient import TestClient
+
+import server
+from assistant import AIAssitant
+from src.modules.rag import RAG
+from src.modules.tiered import InvalidModeError
+from src.utils.worker_pool import WorkerPool
+
+client = TestClient(server.app)
+
+# --- Test Setup ---
+
+
+def thorough_lm(*responses: str):
+    return DummyLM([{"reasoning": "Thinking", "response": r} for r in responses])
+
+
+def fast_lm(*answers: tuple[str, float]):
+    return DummyLM([{"response": r, "confidence": c} for r, c in answers])
+
+
+# --- Test Cases ---
+
+
+def test_fast_mode_never_calls_the_thorough_model():
+    slow = thorough_lm()
+    rag = RAG(slow, fast_lm=fast_lm(("", 0.1)), mode="fast")
+
+    result = rag(["Apples are red"], "What colour are apples?")
+
+    assert result.response == ""
+    assert result.mode == "fast"
+    assert slow.history == []
+
+
+def test_fast_mode_does_not_ask_for_a_confidence():
+    fast = DummyLM([{"response": "Red"}, {"answer": "Paris"}])
+    rag = RAG(thorough_lm(), fast_lm=fast, mode="fast")
+    assistant = AIAssitant(fast)
+
+    result = rag(["Apples are red"], "What colour are apples?")
+    answer = assistant.ask("Capital of France?")
+
+    assert result.response == "Red"
+    assert answer == "Paris"
+    for call in fast.history:
+        assert "confidence" not in str(call["messages"])
+
+
+@pytest.mark.parametrize(
+    "fast_answer",
+    [("", 0.9), ("Red", 0.2), ("No relevant sources", 0.9)],
+    ids=["empty", "unsure", "gave-up"],
+)
+def test_auto_mode_escalates_weak_fast_answers(fast_answer):
+    rag = RAG(thorough_lm("Red"), fast_lm=fast_lm(fast_answer), mode="auto")
+
+    result = rag(["Apples are red"], "What colour are apples?")
+
+    assert result.response == "Red"
+    assert result.mode == "thorough"
+    assert rag.stats.snapshot()["auto"]["escalated"] == 1
+
+
+def test_auto_mode_keeps_confident_fast_answers():
+    slow = thorough_lm()
+    rag = RAG(slow, fast_lm=fast_lm(("Red", 0.9)))
+
+    result = rag(["Apples are red"], "What colour are apples?", mode="auto")
+
+    assert result.response == "Red"
+    assert result.mode == "fast"
+    assert slow.history == []
+
+
+def test_latency_is_recorded_per_mode():
+    rag = RAG(thorough_lm("Red", "Red"), fast_lm=fast_lm(("Red", 0.9)))
+
+    rag(["Apples are red"], "q1")
+    rag(["Apples are red"], "q2", mode="fast")
+    rag(["Apples are red"], "q3", mode="thorough")
+    stats = rag.stats.snapshot()
+
+    assert stats["thorough"]["count"] == 2
+    assert stats["fast"]["count"] == 1
+    assert stats["auto"] == {
+        "count": 0,
+        "mean_ms": None,
+        "p50_ms": None,
+        "p95_ms": None,
+        "escalated": 0,
+    }
+    assert stats["fast"]["p95_ms"] >= 0
+    with pytest.raises(InvalidModeError):
+        rag(["Apples are red"], "q4", mode="quick")
+
+
+def test_ask_picks_the_mode_per_request(monkeypatch):
+    fast = DummyLM([{"answer": "Paris", "confidence": 0.9}])
+    thorough = DummyLM([{"reasoning": "Capital", "answer": "Paris, France"}])
+    assistant = AIAssitant(fast, thorough_lm=thorough)
+    monkeypatch.setattr(server, "ai_assitant", assistant)
+    monkeypatch.setattr(server, "rag_service", None)
+    pool = WorkerPool(max_workers=1, max_queue=2)
+    monkeypatch.setattr(server, "query_pool", pool)
+
+    fast_answer = client.post("/ask", json={"question": "Capital of France?"})
+    thorough_answer = client.post(
+        "/ask", json={"question": "Capital of France?", "mode": "thorough"}
+    )
+    invalid = client.post("/ask", json={"question": "Capital?", "mode": "slow"})
+    stats = client.get("/api/stats").json()
+    pool.shutdown()
+
+    assert fast_answer.json() == {"response": "Paris"}
+    assert thorough_answer.json() == {"response": "Paris, France"}
+    assert invalid.status_code == 400
+    assert stats["rag"] is None
+    assert stats["ask"]["fast"]["count"] == stats["ask"]["thorough"]["count"] == 1
@@ -0,0 +1,138 @@
+from dspy.utils.dummies import DummyLM
+
+from file_rag import DocumentRAG
+from src.common_types.base import Document
+from src.modules.rag import RAG
+from src.pipelines.context_assembly import ContextAssembler
+from src.retrievers.simple_retriever import SimpleRetriver
+from src.stores.hybrid_store import HybridStore
+from src.stores.numpy_store import NumpyStore
+from tests.helpers import KeywordEmbedder, contents
+
+# --- Test Setup ---
+
+
+def doc(content: str):
+    return Document(content=content, metadata={"filepath": "/notes.md"})
+
+
+def store_with(*contents: str):
+    store = NumpyStore(KeywordEmbedder())
+    store.add([doc(content) for content in contents])
+    return store
+
+
+# --- Test Cases ---
+
+
+def test_near_duplicates_are_dropped_and_diverse_chunks_promoted():
+    candidates = ["apple pie", "apple tart", "apple cake", "banana bread"]
+    store = store_with(*candidates)
+    assembler = ContextAssembler(store, max_chunks=2, mmr_lambda=0.5)
+
+    assembled = assembler.assemble([doc(c) for c in candidates])
+
+    # "apple tart" and "apple cake" embed exactly like "apple pie"
+    assert contents(assembled.documents) == ["apple pie", "banana bread"]
+    assert assembled.candidates == 4
+
+
+def test_chunks_are_packed_under_the_token_budget():
+    candidates = ["apple " * 40, "banana " * 100, "cherry " * 20, "apple banana"]
+    store = store_with(*candidates)
+    assembler = ContextAssembler(store, max_chunks=4, token_budget=120)
+
+    assembled = assembler.assemble([doc(c) for c in candidates])
+
+    # The 175-token banana chunk doesn't fit after the 60-token apple chunk
+    assert contents(assembled.documents) == [
+        candidates[0],
+        candidates[2],
+        candidates[3],
+    ]
+    assert assembled.tokens == 60 + 35 + 3 <= 120
+
+
+def test_oversized_best_chunk_is_truncated_to_the_budget():
+    store = store_with("apple " * 100)
+    assembler = ContextAssembler(store, token_budget=10)
+
+    assembled = assembler.assemble([doc("apple " * 100)])
+
+    assert assembled.documents[0].content == ("apple " * 100)[:40]
+    assert assembled.tokens == 10
+
+
+def test_query_overfetches_and_reports_prompt_size():
+    store = store_with("apple pie", "apple tart", "banana bread", "cherry jam")
+    lm = DummyLM([{"reasoning": "Fruit", "response": "Pie"}])
+    rag = DocumentRAG(
+        parser=None,
+        retriver=SimpleRetriver(store=store, k=1),
+        generator=RAG(lm),
+        assembler=ContextAssembler(store, max_chunks=2, fetch_factor=2),
+    )
+
+    sources = rag.retrieve("apple")
+    result = rag.query("apple")
+
+    assert contents(sources) == ["apple pie", "banana bread"]
+    assert result.response == "Pie"
+    assert result.usage["chunks"] == 2
+    assert result.usage["context_tokens"] == 3 + 3
+
+
+def test_unrelated_question_is_answered_without_the_llm():
+    store = store_with("apple pie", "banana bread")
+
+    class NoLM:
+        def __call__(self, contexts, question, mode=None):
+            raise AssertionError("the LLM must not be called")
+
+    rag = DocumentRAG(
+        parser=None,
+        retriver=SimpleRetriver(store=store, k=2),
+        generator=NoLM(),
+        min_similarity=0.5,
+    )
+
+    (source,) = rag.retrieve("apple apple cherry")
+    result = rag.query("cherry")
+
+    # "banana bread" has similarity 0
+    assert source.content == "apple pie"
+    assert source.metadata["similarity"] > 0.89
+    assert result.response == "No relevant sources"
+    assert result.usage["prompt_tokens"] == 0
+
+
+def test_cutoff_applies_to_lexical_hits_in_hybrid_mode():
+    store = HybridStore(NumpyStore(KeywordEmbedder()), fetch_k=2)
+    # The embedder sees "cherry" in "cherryish", BM25 doesn't
+    store.add(
+        [
+            doc("cherryish banana banana banana"),
+            doc("cherryish banana banana banana banana"),
+            doc("what is the weather like"),
+        ]
+    )
+
+    class NoLM:
+        def __call__(self, contexts, question, mode=None):
+            raise AssertionError("the LLM must not be called")
+
+    rag = DocumentRAG(
+        parser=None,
+        retriver=SimpleRetriver(store=store, k=2),
+        generator=NoLM(),
+        min_similarity=0.5,
+    )
+
+    # Found by the lexical side alone, for sharing "what is the"
+    (hits,) = store.query(["what is the cherry"], k=2)
+    result = rag.query("what is the cherry")
+
+    assert "what is the weather like" in contents(hits)
+    assert max(d.metadata["similarity"] for d in hits) < 0.5
+    assert rag.retrieve("what is the cherry") == []
+    assert result.response == "No relevant sources"
@@ -0,0 +1,161 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.common_types.base import Document
+from src.pipelines.ingestion import IngestionPipeline
+from src.stores.base import Store, document_id
+
+# --- Test Setup ---
+
+
+class SlowEmbedder:
+    """Embeds after a delay and records how many calls overlap."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(len(text))] for text in texts]
+
+
+class RecordingStore(Store):
+    """Records writes and the threads they came from."""
+
+    def __init__(self, stored_ids=()):
+        self.added = []
+        self.deleted = []
+        self.writer_threads = set()
+        self.stored_ids = set(stored_ids)
+
+    def existing_ids(self, ids):
+        return self.stored_ids.intersection(ids)
+
+    def query(self, *args, **kwargs):
+        return None
+
+    def get(self, *args, **kwargs):
+        return None
+
+    def reset(self):
+        return True
+
+    def add(self, docs, store_content=True, embeddings=None):
+        self.writer_threads.add(threading.current_thread().name)
+        self.added.extend(zip(docs, embeddings, strict=True))
+
+    def delete(self, where):
+        self.writer_threads.add(threading.current_thread().name)
+        self.deleted.append(where)
+
+
+def load(path: Path):
+    if path.name == "broken.md":
+        raise ValueError("cannot parse")
+    return [
+        Document(content=f"{path.name} chunk {i}", metadata={"filepath": str(path)})
+        for i in range(3)
+    ]
+
+
+# --- Test Cases ---
+
+
+def test_pipeline_ingests_files_concurrently_with_single_writer():
+    embedder = SlowEmbedder()
+    store = RecordingStore()
+    pipeline = IngestionPipeline(
+        loader=load, embedder=embedder, store=store, embed_workers=3, batch_size=2
+    )
+    paths = [Path(f"/notes/{i}.md") for i in range(20)]
+
+    stats = pipeline.run(paths, replace=[paths[0]])
+
+    assert stats.files == 20
+    assert stats.chunks == 60
+    assert stats.failed == 0
+    assert stats.files_per_sec > 0 and stats.chunks_per_sec > 0
+    assert len(store.added) == 60
+    assert all(emb == [float(len(doc.content))] for doc, emb in store.added)
+    assert store.deleted == [{"filepath": str(paths[0].absolute())}]
+    assert store.writer_threads == {"ingest-writer"}
+    assert 1 < embedder.max_in_flight <= 3
+
+
+def test_pipeline_reports_failures_per_file():
+    store = RecordingStore()
+    pipeline = IngestionPipeline(loader=load, embedder=SlowEmbedder(0), store=store)
+    results = {}
+
+    stats = pipeline.run(
+        [Path("/notes/ok.md"), Path("/notes/broken.md")],
+        on_result=lambda path, error: results.update({path.name: error}),
+    )
+
+    assert stats.files == 1
+    assert stats.failed == 1
+    assert results["ok.md"] is None
+    assert isinstance(results["broken.md"], ValueError)
+
+
+def test_pipeline_only_embeds_chunks_missing_from_store():
+    embedder = SlowEmbedder(0)
+    path = Path("/notes/a.md")
+    known = load(path)[:2]
+    store = RecordingStore(stored_ids=[document_id(doc) for doc in known])
+    embedded = []
+    embedder_embed = embedder.embed
+    embedder.embed = lambda texts: embedded.extend(texts) or embedder_embed(texts)
+    pipeline = IngestionPipeline(loader=load, embedder=embedder, store=store)
+
+    stats = pipeline.run([path])
+
+    assert stats.chunks == 3
+    assert embedded == ["a.md chunk 2"]
+
+
+def test_pipeline_skips_files_not_started_once_stopped():
+    stop = threading.Event()
+    store = RecordingStore()
+    results = []
+
+    def on_result(path, error):
+        results.append(path)
+        stop.set()
+
+    pipeline = IngestionPipeline(
+        loader=load, embedder=SlowEmbedder(), store=store, parse_workers=1
+    )
+    stats = pipeline.run(
+        [Path(f"/notes/{i}.md") for i in range(20)], on_result=on_result, stop=stop
+    )
+
+    assert stats.failed == 0
+    assert 1 <= stats.files < 20
+    assert len(results) == stats.files
+
+
+def test_pipeline_raises_unexpected_store_errors_without_hanging():
+    store = RecordingStore()
+
+    def add(docs, store_content=True, embeddings=None):
+        raise TypeError("store bug")
+
+    store.add = add
+    pipeline = IngestionPipeline(
+        loader=load, embedder=SlowEmbedder(0), store=store, parse_workers=1
+    )
+
+    with pytest.raises(TypeError):
+        pipeline.run([Path(f"/notes/{i}.md") for i in range(20)])
@@ -0,0 +1,79 @@
+import itertools
+from pathlib import Path
+
+from src.common_types.base import Document
+from src.splitters.markdown_splitter import MarkdownSplitter
+
+NOTE = """Intro line.
+
+# Projects
+
+Overview of projects.
+
+## Launcher
+
+Launcher details.
+
+```python
+# not a heading
+print("hi")
+```
+
+# Ideas
+
+Some ideas.
+"""
+
+
+def test_headings_start_chunks_and_set_section():
+    chunks = list(MarkdownSplitter().split_lines(NOTE.splitlines(True), {"f": 1}))
+
+    assert [c.metadata["section"] for c in chunks] == [
+        "",
+        "Projects",
+        "Projects > Launcher",
+        "Ideas",
+    ]
+    assert chunks[2].content.startswith("## Launcher")
+    assert "# not a heading" in chunks[2].content
+    assert all(c.metadata["f"] == 1 for c in chunks)
+
+
+def test_long_sections_are_cut_at_paragraph_breaks():
+    paragraphs = [f"Paragraph {i} " + "word " * 10 for i in range(10)]
+    text = "# Title\n\n" + "\n\n".join(paragraphs) + "\n"
+    splitter = MarkdownSplitter(chunk_size=200)
+
+    chunks = splitter([Document(content=text, metadata={})])
+
+    assert len(chunks) > 1
+    assert all(len(c.content) <= 200 for c in chunks)
+    assert all(c.metadata["section"] == "Title" for c in chunks)
+    # No paragraph is torn apart
+    for paragraph in paragraphs:
+        assert any(paragraph.strip() in c.content for c in chunks)
+
+
+def test_overlong_lines_are_cut():
+    chunks = list(MarkdownSplitter(chunk_size=10).split_lines(["x" * 35 + "\n"], {}))
+
+    assert [len(c.content) for c in chunks] == [10, 10, 10, 5]
+
+
+def test_splitting_is_lazy():
+    """Chunks come out before the input ends, so a file is never held whole."""
+    lines = itertools.cycle(["# Heading\n", "text\n"])
+
+    chunks = list(itertools.islice(MarkdownSplitter().split_lines(lines, {}), 3))
+
+    assert [c.content for c in chunks] == ["# Heading\ntext"] * 3
+
+
+def test_split_file(tmp_path: Path):
+    path = tmp_path / "note.md"
+    path.write_text(NOTE)
+
+    chunks = list(MarkdownSplitter().split_file(path, {"filepath": str(path)}))
+
+    assert len(chunks) == 4
+    assert chunks[0].metadata["filepath"] == str(path)
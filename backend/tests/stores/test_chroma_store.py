@@ -0,0 +1,88 @@
+import asyncio
+from uuid import uuid4
+
+from src.embedders.base import Embedder
+from src.stores.base import document_id
+from src.stores.chroma_store import ChromaStore
+from tests.helpers import chunks
+
+# --- Test Setup ---
+
+
+class CountingEmbedder(Embedder):
+    """Returns a fixed size vector per text and remembers what it embedded."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def make_store():
+    embedder = CountingEmbedder()
+    return ChromaStore(embedder, f"test_{uuid4().hex}"), embedder
+
+
+# --- Test Cases ---
+
+
+def test_chunk_ids_are_content_addressed():
+    store, embedder = make_store()
+
+    store.add(chunks("/notes/a.md", "one", "two", "one"))
+    store.add(chunks("/notes/a.md", "two"))
+    store.add(chunks("/notes/b.md", "two"))
+
+    # Duplicates within a file are stored once; equal text in another file is not
+    assert embedder.embedded == ["one", "two", "two"]
+    assert len(store.get_ids({"filepath": "/notes/a.md"})) == 2
+    assert len(store.get_ids({"filepath": "/notes/b.md"})) == 1
+
+
+def test_replace_embeds_new_chunks_and_deletes_vanished_ones():
+    store, embedder = make_store()
+    store.add(chunks("/notes/a.md", "intro", "body", "outro"))
+    store.add(chunks("/notes/b.md", "other"))
+    embedder.embedded.clear()
+
+    store.replace(
+        chunks("/notes/a.md", "intro", "new body", "outro"),
+        where={"filepath": "/notes/a.md"},
+    )
+
+    assert embedder.embedded == ["new body"]
+    contents = {doc.content for doc in store.get(where={"filepath": "/notes/a.md"})}
+    assert contents == {"intro", "new body", "outro"}
+    assert len(store.get_ids({"filepath": "/notes/b.md"})) == 1
+
+
+def test_async_add_and_query():
+    store, _ = make_store()
+
+    async def scenario():
+        await store.aadd(chunks("/notes/a.md", "a", "bbbb"))
+        return await asyncio.gather(store.aquery(["a"]), store.aquery(["bbbb"]))
+
+    by_a, by_b = asyncio.run(scenario())
+
+    assert by_a[0][0].content == "a"
+    assert by_b[0][0].content == "bbbb"
+
+
+def test_query_results_carry_distance_and_similarity():
+    store, _ = make_store()
+    store.add(chunks("/notes/a.md", "abc", "abcdefghijkl"))
+
+    (results,) = store.query(["abc"], k=2)
+
+    assert [doc.content for doc in results] == ["abc", "abcdefghijkl"]
+    nearest, farther = (doc.metadata for doc in results)
+    assert nearest["distance"] == 0.0
+    assert nearest["similarity"] > 0.999
+    assert farther["distance"] > 0 and farther["similarity"] < nearest["similarity"]
+    # Query metadata doesn't change a chunk's identity
+    assert store.existing_ids([document_id(doc) for doc in results]) == set(
+        store.get_ids({"filepath": "/notes/a.md"})
+    )
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+from src.stores.bm25_store import BM25Store, tokenize
+from src.stores.hybrid_store import HybridStore
+from src.stores.numpy_store import NumpyStore
+from tests.helpers import KeywordEmbedder, chunks, contents
+
+# --- Test Setup ---
+
+
+DOCS = [
+    *chunks("/fruit.md", "apple apple and more apple"),
+    *chunks("/errors.md", "apple crashed on this date with E-1042"),
+    *chunks("/app_config.json", "banana settings"),
+]
+
+
+# --- Test Cases ---
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("See app_config.json, error E-1042!") == [
+        "see",
+        "app_config.json",
+        "app_config",
+        "json",
+        "error",
+        "e-1042",
+        "e",
+        "1042",
+    ]
+
+
+def test_bm25_ranks_rare_identifiers_and_file_names():
+    index = BM25Store()
+    index.add(DOCS)
+
+    (by_code,) = index.query(["E-1042"], k=1)
+    (by_name,) = index.query(["app_config.json"], k=1)
+
+    assert contents(by_code) == ["apple crashed on this date with E-1042"]
+    assert contents(by_name) == ["banana settings"]
+
+
+def test_fusion_lifts_exact_match_over_vector_neighbour():
+    store = HybridStore(NumpyStore(KeywordEmbedder()))
+    # Lexically close to "apple" but not for the (case-sensitive) embedder
+    store.add([*DOCS, *chunks("/shout.md", "APPLE APPLE APPLE APPLE")])
+
+    (vector,) = store.query(["apple E-1042"], k=1, mode="vector")
+    (hybrid,) = store.query(["apple E-1042"], k=1)
+
+    assert contents(vector) == ["apple apple and more apple"]
+    assert contents(hybrid) == ["apple crashed on this date with E-1042"]
+
+
+def test_writes_reach_both_indexes():
+    vector = NumpyStore(KeywordEmbedder())
+    vector.add(DOCS[:1])
+    # Chunks already in the vector store are indexed on open
+    store = HybridStore(vector)
+    assert len(store.lexical) == 1
+
+    store.add(DOCS[1:])
+    store.replace(chunks("/fruit.md", "cherry tart"), where={"filename": "fruit.md"})
+    store.delete(where={"filename": "errors.md"})
+
+    assert len(store.lexical) == len(vector) == 2
+    assert contents(store.query(["cherry"], k=1, mode="lexical")[0]) == ["cherry tart"]
+    assert store.query(["E-1042"], k=1, mode="lexical") == [[]]
+
+
+def test_failing_embedder_falls_back_to_lexical():
+    embedder = KeywordEmbedder()
+    store = HybridStore(NumpyStore(embedder), retry_after=60)
+    store.add(DOCS)
+    embedder.fail = True
+
+    (results,) = store.query(["E-1042"], k=1)
+    calls = embedder.calls
+    (again,) = store.query(["banana"], k=1)
+
+    assert contents(results) == ["apple crashed on this date with E-1042"]
+    assert contents(again) == ["banana settings"]
+    # The vector side is not retried until `retry_after` has passed
+    assert embedder.calls == calls
+    assert store.fallbacks == 2
+
+
+def test_slow_embedder_falls_back_to_lexical():
+    embedder = KeywordEmbedder()
+    store = HybridStore(NumpyStore(embedder), embed_timeout=0.05)
+    store.add(DOCS)
+    embedder.block = threading.Event()
+
+    try:
+        (results,) = store.query(["app_config.json"], k=1)
+        (async_results,) = asyncio.run(store.aquery(["E-1042"], k=1))
+    finally:
+        embedder.block.set()
+        store.close()
+
+    assert contents(results) == ["banana settings"]
+    assert contents(async_results) == ["apple crashed on this date with E-1042"]
+    assert not store.vector_available
@@ -0,0 +1,105 @@
+from pathlib import Path
+
+from src.embedders.base import Embedder
+from src.handlers.file_handler import FileHandler
+from src.parsers.simple_parser import SimpleMarkdownParser
+from src.retrievers.simple_retriever import SimpleRetriver
+from src.stores.indexed_store import IndexedStore
+from src.stores.numpy_store import NumpyStore
+from tests.helpers import chunks, contents
+
+# --- Test Setup ---
+
+
+class LengthEmbedder(Embedder):
+    def embed(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class RecordingStore(NumpyStore):
+    """Records how chunks are deleted."""
+
+    def __init__(self):
+        super().__init__(LengthEmbedder())
+        self.deletes = []
+
+    def delete(self, ids=None, where=None):
+        self.deletes.append({"ids": ids, "where": where})
+        super().delete(ids=ids, where=where)
+
+
+# --- Test Cases ---
+
+
+def test_file_deletes_and_replaces_go_by_id():
+    inner = RecordingStore()
+    store = IndexedStore(inner)
+    store.add(chunks("/a.md", "one", "two") + chunks("/b.md", "three"))
+
+    store.replace_file("/a.md", chunks("/a.md", "one", "four"))
+    store.delete_file("/b.md")
+
+    assert sorted(contents(store.get())) == ["four", "one"]
+    assert all(d["where"] is None for d in inner.deletes)
+    assert store.index.files() == {"/a.md": set(inner.get_ids())}
+
+
+def test_file_handler_deletes_chunks_of_same_named_files(tmp_path: Path):
+    # Used to delete by file name, which matched neither key consistently
+    store = IndexedStore(NumpyStore(LengthEmbedder()))
+    retriver = SimpleRetriver(store=store)
+    handler = FileHandler(retriver, SimpleMarkdownParser(), splitter=lambda d: d)
+    for folder in ("x", "y"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "notes.md").write_text(f"notes in {folder}")
+        handler.handle_new_file(tmp_path / folder / "notes.md")
+
+    handler.handle_delete_file(tmp_path / "x" / "notes.md")
+
+    assert sorted(contents(store.get())) == ["notes in y"]
+
+
+def test_index_is_built_from_existing_store(tmp_path: Path):
+    inner = NumpyStore(LengthEmbedder())
+    inner.add(chunks("/a.md", "one", "two"))
+
+    store = IndexedStore(inner, tmp_path / "index.sqlite")
+    store.delete_file("/a.md")
+    store.add(chunks("/b.md", "three"))
+    store.close()
+
+    reopened = IndexedStore(NumpyStore(LengthEmbedder()), tmp_path / "index.sqlite")
+    assert len(inner) == 1
+    assert reopened.index.files() == {"/b.md": set(inner.get_ids())}
+
+
+def test_reconcile_removes_orphans(tmp_path: Path):
+    kept, gone = tmp_path / "kept.md", tmp_path / "gone.md"
+    kept.write_text("kept")
+    inner = NumpyStore(LengthEmbedder())
+    store = IndexedStore(inner)
+    store.add(chunks(str(kept), "kept") + chunks(str(gone), "gone"))
+    # Left behind by an earlier run, never indexed
+    inner.add(chunks(str(kept), "stale"))
+
+    report = store.reconcile()
+
+    assert sorted(contents(store.get())) == ["kept"]
+    assert report.orphan_chunks == 2
+    assert report.removed_files == 1
+    assert set(store.index.files()) == {str(kept)}
+
+
+def test_reconcile_with_loader_catches_orphans_older_than_the_index(tmp_path: Path):
+    note = tmp_path / "note.md"
+    note.write_text("new")
+    inner = NumpyStore(LengthEmbedder())
+    inner.add(chunks(str(note), "old", "new"))
+    # The index adopts both chunks, since it can't tell which is stale
+    store = IndexedStore(inner)
+
+    report = store.reconcile(loader=lambda path: chunks(path, Path(path).read_text()))
+
+    assert sorted(contents(store.get())) == ["new"]
+    assert report.orphan_chunks == 1
+    assert report.stale_entries == 1
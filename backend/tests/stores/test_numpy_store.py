@@ -0,0 +1,71 @@
+import asyncio
+from pathlib import Path
+
+from src.stores.numpy_store import NumpyStore
+from tests.helpers import KeywordEmbedder, chunks
+
+# --- Test Cases ---
+
+
+def test_query_returns_exact_top_k_in_order():
+    store = NumpyStore(KeywordEmbedder(), initial_capacity=2)
+    store.add(chunks("/a.md", "apple", "banana", "apple apple banana", "cherry"))
+
+    (results,) = store.query(["apple"], k=2)
+
+    assert [doc.content for doc in results] == ["apple", "apple apple banana"]
+    assert len(store) == 4
+
+
+def test_where_filters_queries_and_deletes():
+    store = NumpyStore(KeywordEmbedder())
+    store.add(chunks("/a.md", "apple", "banana"))
+    store.add(chunks("/b.md", "apple pie", "date"))
+
+    (results,) = store.query(["apple"], k=5, where={"filepath": "/b.md"})
+    assert [doc.content for doc in results] == ["apple pie", "date"]
+
+    store.delete(where={"filepath": "/a.md"})
+    assert {doc.content for doc in store.get()} == {"apple pie", "date"}
+    (results,) = store.query(["apple"], k=5)
+    assert results[0].content == "apple pie"
+
+
+def test_replace_only_embeds_new_chunks_and_reuses_rows():
+    embedder = KeywordEmbedder()
+    store = NumpyStore(embedder)
+    store.add(chunks("/a.md", "apple", "banana", "cherry"))
+    embedder.embedded.clear()
+
+    store.replace(chunks("/a.md", "apple", "date"), where={"filepath": "/a.md"})
+
+    assert embedder.embedded == ["date"]
+    assert {doc.content for doc in store.get()} == {"apple", "date"}
+    assert store._size == 3  # "date" took over a deleted row
+
+
+def test_persisted_store_reopens(tmp_path: Path):
+    store = NumpyStore(
+        KeywordEmbedder(), persists=True, path=tmp_path, initial_capacity=1
+    )
+    store.add(chunks("/a.md", "apple", "banana", "cherry"))
+    store.delete(where={"filepath": "/a.md", "$and": [{"filepath": {"$ne": "x"}}]})
+    store.add(chunks("/b.md", "banana split", "date"))
+
+    reopened = NumpyStore(KeywordEmbedder(), persists=True, path=tmp_path)
+
+    assert len(reopened) == 2
+    (results,) = reopened.query(["banana"], k=1)
+    assert results[0].content == "banana split"
+    assert results[0].metadata["filepath"] == "/b.md"
+
+
+def test_async_add_and_query():
+    store = NumpyStore(KeywordEmbedder())
+
+    async def scenario():
+        await store.aadd(chunks("/a.md", "cherry", "date"))
+        return await store.aquery(["date"], k=1)
+
+    (results,) = asyncio.run(scenario())
+    assert results[0].content == "date"
@@ -0,0 +1,123 @@
+"""
+Benchmarks NumpyStore against ChromaStore on adding chunks, querying, and a
+cold start (a fresh process importing the store, opening it, and answering one
+query).
+
+Runs as part of the test suite on a small corpus (checking both stores find the
+same neighbours). For a meaningful comparison, set STORE_BENCH_CHUNKS, e.g.
+
+    STORE_BENCH_CHUNKS=50000 pytest tests/stores/test_store_benchmark.py -s
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.common_types.base import Document
+from src.embedders.base import Embedder
+from src.stores.chroma_store import ChromaStore
+from src.stores.numpy_store import NumpyStore
+
+DIM = 768
+BATCH = 1000
+N_QUERIES = 50
+BACKEND_DIR = Path(__file__).parents[2]
+
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+import numpy as np
+from src.stores.{module} import {cls}
+store = {cls}(None, {args})
+store._query(np.load(sys.argv[1])[:1], k=5)
+print(time.perf_counter() - start)
+"""
+
+
+class NoEmbedder(Embedder):
+    def embed(self, texts):
+        raise AssertionError("the benchmark passes precomputed embeddings")
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def cold_start(module: str, cls: str, args: str, queries: Path) -> float:
+    script = COLD_START.format(module=module, cls=cls, args=args)
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(queries)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def test_numpy_store_matches_chroma_and_benchmark(tmp_path: Path):
+    n_chunks = int(os.environ.get("STORE_BENCH_CHUNKS", "2000"))
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_chunks, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    docs = [
+        Document(content=f"chunk {i}", metadata={"filepath": f"/notes/{i % 100}.md"})
+        for i in range(n_chunks)
+    ]
+    queries = vectors[rng.choice(n_chunks, N_QUERIES, replace=False)]
+    queries_path = tmp_path / "queries.npy"
+    np.save(queries_path, queries)
+
+    stores = {
+        "numpy": NumpyStore(NoEmbedder(), persists=True, path=tmp_path / "numpy"),
+        "chroma": ChromaStore(
+            NoEmbedder(), "bench", persists=True, path=str(tmp_path / "chroma")
+        ),
+    }
+    timings = {}
+    top = {}
+    for name, store in stores.items():
+        start = time.perf_counter()
+        for i in range(0, n_chunks, BATCH):
+            store.add(docs[i : i + BATCH], embeddings=vectors[i : i + BATCH].tolist())
+        add_time = time.perf_counter() - start
+        results, query_time = timed(
+            lambda store=store: [store._query([q.tolist()], k=5)[0] for q in queries]
+        )
+        top[name] = [[doc.content for doc in result] for result in results]
+        timings[name] = [add_time, query_time / N_QUERIES]
+
+    timings["numpy"].append(
+        cold_start(
+            "numpy_store",
+            "NumpyStore",
+            f"persists=True, path={str(tmp_path / 'numpy')!r}",
+            queries_path,
+        )
+    )
+    timings["chroma"].append(
+        cold_start(
+            "chroma_store",
+            "ChromaStore",
+            f"'bench', persists=True, path={str(tmp_path / 'chroma')!r}",
+            queries_path,
+        )
+    )
+
+    # Every query vector is stored, so both must rank it first
+    assert [result[0] for result in top["numpy"]] == [
+        result[0] for result in top["chroma"]
+    ]
+
+    print(f"\n{n_chunks} chunks of dim {DIM}:")
+    for name, (add_time, query_time, cold_time) in timings.items():
+        print(
+            f"  {name:>6}: add {add_time:.2f}s, "
+            f"query {query_time * 1000:.2f}ms, cold start {cold_time:.2f}s"
+        )
@@ -0,0 +1,54 @@
+import time
+
+from src.utils.answer_cache import AnswerCache
+from tests.helpers import KeywordEmbedder
+
+# --- Test Cases ---
+
+
+def test_normalized_questions_hit_within_their_scope():
+    cache = AnswerCache()
+    cache.put("What is the Launcher?", "model-a", "an app")
+
+    assert cache.get("  what is the launcher ", "model-a") == "an app"
+    assert cache.get("What is the Launcher?", "model-b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_similar_questions_hit_above_threshold():
+    cache = AnswerCache(
+        embedder=KeywordEmbedder(["launcher", "notes", "config"]),
+        similarity_threshold=0.9,
+    )
+    cache.put("Tell me about the launcher", "m", "an app")
+
+    assert cache.get("How does the launcher work?", "m") == "an app"
+    assert cache.get("Where are my notes?", "m") is None
+
+
+def test_entries_expire_and_least_recently_used_are_evicted():
+    cache = AnswerCache(max_entries=2, ttl=0.05)
+    cache.put("a", "m", 1)
+    cache.put("b", "m", 2)
+    cache.get("a", "m")
+    cache.put("c", "m", 3)  # Evicts "b", the least recently used
+
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") == 1
+    time.sleep(0.06)
+    assert cache.get("a", "m") is None
+
+
+def test_invalidate_drops_scope_and_late_answers():
+    cache = AnswerCache()
+    cache.put("q", "rag", "old")
+    cache.put("q", "ask", "kept")
+    generation = cache.generation("rag")
+
+    cache.invalidate("rag")
+    # An answer computed before the invalidation is not cached
+    cache.put("q2", "rag", "stale", generation)
+
+    assert cache.get("q", "rag") is None
+    assert cache.get("q2", "rag") is None
+    assert cache.get("q", "ask") == "kept"
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from ollama import ResponseError
+
+import server
+from src.utils.model_warmer import ModelWarmer
+
+client = TestClient(server.app)
+
+# --- Test Setup ---
+
+
+class FakeOllama:
+    """Records the loads; models named "missing..." fail to load."""
+
+    def __init__(self):
+        self.loaded = []
+        self.calls = []
+        self.closed = False
+
+    def _load(self, model, keep_alive):
+        self.calls.append((model, keep_alive))
+        if model.startswith("missing"):
+            raise ResponseError(f"model {model!r} not found", 404)
+        self.loaded.append(model)
+
+    def embed(self, model, input, keep_alive=None):
+        self._load(model, keep_alive)
+
+    def generate(self, model, keep_alive=None):
+        self._load(model, keep_alive)
+
+    def close(self):
+        self.closed = True
+
+    def ps(self):
+        models = [SimpleNamespace(model=f"{m}:latest") for m in self.loaded]
+        return SimpleNamespace(models=models)
+
+
+# --- Test Cases ---
+
+
+def test_warm_loads_every_model_with_the_keep_alive():
+    ollama = FakeOllama()
+    warmer = ModelWarmer(["embedder"], ["chat"], keep_alive="30m", client=ollama)
+    assert not warmer.ready
+
+    warmer.warm()
+
+    assert warmer.ready
+    assert ollama.calls == [("embedder", "30m"), ("chat", "30m")]
+    assert warmer.status()["chat"]["kind"] == "chat"
+    assert warmer.status()["chat"]["load_seconds"] >= 0
+
+
+def test_failed_load_is_reported():
+    warmer = ModelWarmer(["embedder"], ["missing-chat"], client=FakeOllama())
+
+    warmer.warm()
+
+    assert not warmer.ready
+    assert warmer.status()["missing-chat"] == {
+        "kind": "chat",
+        "loaded": False,
+        "load_seconds": None,
+        "error": "model 'missing-chat' not found (status code: 404)",
+    }
+
+
+def test_refresh_reloads_only_unloaded_models():
+    ollama = FakeOllama()
+    warmer = ModelWarmer(["embedder"], ["chat"], client=ollama)
+    warmer.warm()
+    # Idle past its keep-alive
+    ollama.loaded.remove("chat")
+    ollama.calls.clear()
+
+    warmer.refresh()
+
+    assert ollama.calls == [("chat", None)]
+    assert warmer.ready
+
+
+@pytest.mark.parametrize(
+    ("keep_alive", "interval"),
+    [("30m", 900.0), ("1h30m", 2700.0), (None, 150.0), (-1, None), ("0", None)],
+)
+def test_refresh_defaults_to_half_the_keep_alive(keep_alive, interval):
+    warmer = ModelWarmer(["embedder"], [], keep_alive=keep_alive, client=FakeOllama())
+
+    assert warmer.refresh_interval == interval
+
+
+def test_stop_closes_the_client():
+    ollama = FakeOllama()
+    idle = ModelWarmer(["embedder"], [], client=FakeOllama())
+    started = ModelWarmer(["embedder"], [], client=ollama)
+
+    idle.stop()
+    started.start()
+    started.stop()
+    started._thread.join(1)
+
+    assert idle._client.closed
+    assert ollama.closed
+
+
+def test_status_reports_readiness(monkeypatch):
+    warmer = ModelWarmer(["embedder"], ["chat"], client=FakeOllama())
+    monkeypatch.setattr(server, "model_warmer", warmer)
+
+    before = client.get("/api/status").json()
+    warmer.warm()
+    after = client.get("/api/status").json()
+
+    assert before["ready"] is False
+    assert after["ready"] is True
+    assert after["models"]["embedder"]["loaded"]
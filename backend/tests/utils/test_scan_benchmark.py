@@ -0,0 +1,75 @@
+"""
+Benchmarks the os.scandir based FileTracker scan against the previous
+`rglob` + `is_file()` + `stat()` scan on a large synthetic tree.
+
+Runs as part of the test suite on a small tree (checking both scans agree). For
+a meaningful comparison, set SCAN_BENCH_FILES, e.g.
+
+    SCAN_BENCH_FILES=100000 pytest tests/utils/test_scan_benchmark.py -s
+"""
+
+import os
+import time
+from pathlib import Path
+
+from src.utils.track_files import FileState, FileTracker
+
+FILES_PER_DIR = 50
+DIRS_PER_LEVEL = 10
+
+
+def rglob_scan(watch_dir: Path) -> dict[str, FileState]:
+    """The scan FileTracker used before it switched to os.scandir."""
+    return {
+        str(path): FileState.from_path(path)
+        for path in watch_dir.rglob("*")
+        if path.is_file()
+    }
+
+
+def build_tree(root: Path, n_files: int):
+    """Creates `n_files` empty files spread over a nested directory tree."""
+    created = 0
+    directories = [root]
+    while created < n_files:
+        directory = directories.pop(0)
+        for i in range(min(FILES_PER_DIR, n_files - created)):
+            (directory / f"note_{i}.md").touch()
+            created += 1
+        for i in range(DIRS_PER_LEVEL):
+            subdir = directory / f"dir_{i}"
+            subdir.mkdir()
+            directories.append(subdir)
+
+    # Age every directory so the tracker trusts its cached listings
+    past = time.time() - 60
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (past, past))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def test_scandir_scan_matches_and_benchmark(tmp_path: Path):
+    n_files = int(os.environ.get("SCAN_BENCH_FILES", "2000"))
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    build_tree(watch_dir, n_files)
+
+    tracker = FileTracker(watch_dir=watch_dir, state_filepath=tmp_path / "state.json")
+
+    baseline, rglob_time = timed(rglob_scan, tracker.watch_dir)
+    cold, cold_time = timed(tracker._scan_directory)
+    warm, warm_time = timed(tracker._scan_directory, cold)
+
+    assert len(baseline) == n_files
+    assert cold.files == baseline
+    assert warm.files == baseline
+
+    print(
+        f"\n{n_files} files: rglob {rglob_time:.3f}s, "
+        f"scandir cold {cold_time:.3f}s, scandir warm {warm_time:.3f}s"
+    )
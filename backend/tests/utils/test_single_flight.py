@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.utils.single_flight import AsyncSingleFlight, SingleFlight
+from src.utils.track_files import FileTracker
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: flight.do("key", compute), range(5)))
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.shared == 4
+    # Nothing is cached once the call finished
+    assert flight.do("key", lambda: "again") == "again"
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    def call(_):
+        with pytest.raises(ValueError):
+            flight.do("key", fail)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(call, range(3)))
+
+
+def test_async_calls_share_one_execution():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def scenario():
+        same = await asyncio.gather(*(flight.do("q", compute) for _ in range(4)))
+        other = await flight.do("other", compute)
+        return same, other
+
+    same, other = asyncio.run(scenario())
+
+    assert same == [1, 1, 1, 1]
+    assert other == 2
+
+
+def test_concurrent_tracker_syncs_scan_once(tmp_path: Path):
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    (watch_dir / "note.md").write_text("note")
+    tracker = FileTracker(watch_dir=watch_dir, state_filepath=tmp_path / "state")
+
+    scans = []
+    scan = tracker._scan_directory
+
+    def slow_scan(*args, **kwargs):
+        scans.append(threading.current_thread().name)
+        time.sleep(0.1)
+        return scan(*args, **kwargs)
+
+    tracker._scan_directory = slow_scan
+    threads = [threading.Thread(target=tracker.sync) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(scans) == 1
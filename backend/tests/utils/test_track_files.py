@@ -1,4 +1,7 @@
 import json
+import os
+import sqlite3
+import threading
 import time
 from pathlib import Path
 from typing import NamedTuple
@@ -6,7 +9,7 @@ from typing import NamedTuple
 import pytest
 
 # The import path is updated to reflect the new location in src/utils
-from src.utils.track_files import FileTracker, FileTrackerOutput
+from src.utils.track_files import FileTracker, FileTrackerOutput, PathFilter
 
 # --- Test Setup: Pytest Fixture ---
 
@@ -56,8 +59,8 @@ def test_initial_run_empty_directory(tracker_harness: TrackerTestHarness):
     # ASSERT: No changes should be detected, and the state file should be created.
     assert changes == FileTrackerOutput(set(), set(), set())
     assert tracker_harness.state_file.exists()
-    with tracker_harness.state_file.open("r") as f:
-        assert json.load(f) == []
+    with sqlite3.connect(tracker_harness.state_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM files").fetchone() == (0,)
 
 
 def test_new_files_are_detected(tracker_harness: TrackerTestHarness):
@@ -175,3 +178,234 @@ def test_check_with_write_state_false(tracker_harness: TrackerTestHarness):
 
     # ASSERT 2: The file is *still* detected as new because the baseline was never updated.
     assert changes2.new_files == {new_file.resolve()}
+
+
+def test_changes_below_unchanged_directories_are_detected(
+    tracker_harness: TrackerTestHarness,
+):
+    """Test that cached directory listings don't hide edits or nested additions."""
+    # ARRANGE: A nested tree whose directories are old enough to be cached.
+    nested = tracker_harness.watch_dir / "a" / "b"
+    nested.mkdir(parents=True)
+    file_to_modify = tracker_harness.watch_dir / "a" / "note.md"
+    file_to_modify.write_text("original")
+    for directory in (nested, nested.parent, tracker_harness.watch_dir):
+        os.utime(directory, (time.time() - 60, time.time() - 60))
+    tracker_harness.tracker.check()
+
+    # ACT: Edit a file in a cached dir and add one two levels down.
+    time.sleep(0.1)
+    file_to_modify.write_text("changed")
+    file_new = nested / "new.md"
+    file_new.touch()
+    changes = tracker_harness.tracker.check()
+
+    # ASSERT: Both are reported even though "a" and the root kept their mtimes.
+    assert changes.modified_files == {file_to_modify.resolve()}
+    assert changes.new_files == {file_new.resolve()}
+    assert not changes.deleted_files
+
+
+def test_oversized_files_are_picked_up_once_they_shrink(tmp_path: Path):
+    """Test that a cached directory listing doesn't hide a file that shrank."""
+    # ARRANGE: A file over the size limit, in a directory old enough to be cached.
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    big = watch_dir / "big.md"
+    big.write_text("x" * 100)
+    os.utime(watch_dir, (time.time() - 60, time.time() - 60))
+    tracker = FileTracker(
+        watch_dir, tmp_path / "state.db", path_filter=PathFilter(max_file_size=10)
+    )
+    assert not any(tracker.check())
+
+    # ACT: Shrink it below the limit; the directory keeps its mtime.
+    big.write_text("small")
+    changes = tracker.check()
+
+    # ASSERT: The file is now tracked.
+    assert changes.new_files == {big.resolve()}
+
+
+def test_touched_but_unchanged_files_are_not_modified(
+    tracker_harness: TrackerTestHarness,
+):
+    """Test that a new mtime with identical content is not reported as modified."""
+    # ARRANGE: Establish a baseline with a file.
+    file1 = tracker_harness.watch_dir / "file1.txt"
+    file1.write_text("same content")
+    tracker_harness.tracker.check()
+
+    # ACT: Re-save the same content, as editors and `git checkout` do.
+    time.sleep(0.1)
+    file1.write_text("same content")
+    changes = tracker_harness.tracker.check()
+
+    # ASSERT: Nothing is reported, and the next real edit still is.
+    assert not any(changes)
+    time.sleep(0.1)
+    file1.write_text("new content")
+    assert tracker_harness.tracker.check().modified_files == {file1.resolve()}
+
+
+def test_json_state_file_is_migrated(tmp_path: Path):
+    """Test that a state file from the JSON based tracker is migrated to SQLite."""
+    # ARRANGE: A watch dir with one known, unchanged file and a JSON state file.
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    known = watch_dir / "known.txt"
+    known.write_text("known")
+    state_file = tmp_path / ".tracked"
+    state_file.write_text(
+        json.dumps([{"path": str(known.resolve()), "mtime": known.stat().st_mtime}])
+    )
+
+    # ACT: Check with a tracker that reads the old file.
+    (watch_dir / "new.txt").touch()
+    tracker = FileTracker(watch_dir=watch_dir, state_filepath=state_file)
+    changes = tracker.check()
+
+    # ASSERT: Only the new file is reported and the state is now SQLite.
+    assert changes.new_files == {(watch_dir / "new.txt").resolve()}
+    assert not changes.modified_files
+    assert state_file.with_name(".tracked.json.bak").exists()
+    with sqlite3.connect(state_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM files").fetchone() == (2,)
+
+
+def test_include_exclude_and_size_filters(tmp_path: Path):
+    """Test that filtered paths are never tracked and excluded dirs are not entered."""
+    # ARRANGE: A tree with indexable notes, VCS data, dependencies and a big file.
+    watch_dir = tmp_path / "watch"
+    (watch_dir / ".git" / "objects").mkdir(parents=True)
+    (watch_dir / "node_modules" / "pkg").mkdir(parents=True)
+    (watch_dir / "notes").mkdir(parents=True)
+    (watch_dir / ".git" / "objects" / "ab.md").touch()
+    (watch_dir / "node_modules" / "pkg" / "README.md").touch()
+    (watch_dir / "notes" / "keep.md").touch()
+    (watch_dir / "notes" / "image.png").touch()
+    (watch_dir / "notes" / "big.txt").write_text("x" * 100)
+
+    path_filter = PathFilter(
+        include=["*.md", "*.txt"], exclude=[".*", "node_modules"], max_file_size=10
+    )
+    tracker = FileTracker(
+        watch_dir=watch_dir,
+        state_filepath=tmp_path / "state.db",
+        path_filter=path_filter,
+    )
+
+    # ACT: Run a full check and a targeted check of excluded paths.
+    changes = tracker.check()
+    targeted = tracker.check_paths(
+        [watch_dir / ".git" / "objects" / "ab.md", watch_dir / "node_modules"]
+    )
+
+    # ASSERT: Only the small markdown note is tracked.
+    assert changes.new_files == {(watch_dir / "notes" / "keep.md").resolve()}
+    assert not any(targeted)
+
+
+class FlakyObserver:
+    """Fails for the files in `failing`, records the ones it handled."""
+
+    def __init__(self, failing: set[Path]):
+        self.failing = failing
+        self.handled: list[Path] = []
+        self.attempts = 0
+
+    def handle_new_file(self, filepath):
+        self.attempts += 1
+        if filepath in self.failing:
+            raise ConnectionError("embedding service unavailable")
+        self.handled.append(filepath)
+
+    handle_modified_file = handle_new_file
+    handle_deleted_file = handle_new_file
+
+
+def test_sync_commits_only_files_that_succeeded(tmp_path: Path):
+    """Test that a failed file is retried after a restart and the others are not."""
+    # ARRANGE: Two files, one of which the observer can't handle.
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    good = (watch_dir / "good.md").resolve()
+    bad = (watch_dir / "bad.md").resolve()
+    good.write_text("good")
+    bad.write_text("bad")
+    state_file = tmp_path / "state.db"
+
+    # ACT 1: Sync with the failing observer.
+    tracker = FileTracker(watch_dir, state_file, retry_delay=0)
+    observer = FlakyObserver(failing={bad})
+    tracker.attach(observer)
+    tracker.sync()
+
+    # ASSERT 1: Only the good file is committed, the bad one is queued for retry.
+    assert observer.handled == [good]
+    assert tracker.retry_due() == [bad]
+
+    # ACT 2: "Restart" with a working observer.
+    restarted = FileTracker(watch_dir, state_file, retry_delay=0)
+    observer = FlakyObserver(failing=set())
+    restarted.attach(observer)
+    restarted.sync()
+
+    # ASSERT 2: Only the unfinished file is handed over again, then nothing is left.
+    assert observer.handled == [bad]
+    assert restarted.retry_due() == []
+    restarted.sync()
+    assert observer.handled == [bad]
+
+
+def test_failed_files_back_off_and_give_up(tmp_path: Path):
+    """Test that retries wait for their delay and stop after max_attempts."""
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    bad = (watch_dir / "bad.md").resolve()
+    bad.write_text("bad")
+    tracker = FileTracker(
+        watch_dir, tmp_path / "state.db", max_attempts=2, retry_delay=60
+    )
+    observer = FlakyObserver(failing={bad})
+    tracker.attach(observer)
+
+    # First failure: queued with a delay, so the next sync skips it.
+    tracker.sync()
+    assert tracker.retry_due() == []
+    tracker.sync()
+    assert observer.attempts == 1
+    assert tracker.check(write_state=False).new_files == {bad}
+
+    # Second failure reaches max_attempts: the file is committed and dropped.
+    tracker._state.save_failure(
+        tracker._state.failures()[str(bad)]._replace(next_retry=0)
+    )
+    tracker.sync()
+    assert observer.attempts == 2
+    assert tracker.retry_due() == []
+    assert not any(tracker.check(write_state=False))
+
+
+def test_stopped_sync_leaves_the_remaining_files_for_the_next_one(tmp_path: Path):
+    """Test that a stop between files neither commits nor fails the rest."""
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    for name in ("a.md", "b.md", "c.md"):
+        (watch_dir / name).write_text(name)
+    tracker = FileTracker(watch_dir, tmp_path / "state.db")
+    observer = FlakyObserver(failing=set())
+    tracker.attach(observer)
+    stop = threading.Event()
+    handle = observer.handle_new_file
+    observer.handle_new_file = lambda filepath: (handle(filepath), stop.set())
+
+    tracker.sync(stop=stop)
+
+    assert len(observer.handled) == 1
+    assert tracker.retry_due() == []
+    assert tracker._state.failures() == {}
+    tracker.sync()
+    assert sorted(observer.handled) == sorted(
+        (watch_dir / name).resolve() for name in ("a.md", "b.md", "c.md")
+    )
@@ -0,0 +1,122 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src.utils.track_files import FileTracker
+from src.utils.watch_files import FileWatcher
+
+# --- Test Setup ---
+
+
+class RecordingObserver:
+    """Collects the events the tracker hands to its observers."""
+
+    def __init__(self):
+        self.new = set()
+        self.modified = set()
+        self.deleted = set()
+
+    def handle_new_file(self, filepath):
+        self.new.add(filepath)
+
+    def handle_modified_file(self, filepath):
+        self.modified.add(filepath)
+
+    def handle_deleted_file(self, filepath):
+        self.deleted.add(filepath)
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture(
+    params=[
+        pytest.param(
+            True,
+            id="inotify",
+            marks=pytest.mark.skipif(
+                not sys.platform.startswith("linux"), reason="inotify is Linux only"
+            ),
+        ),
+        pytest.param(False, id="polling"),
+    ]
+)
+def watched(request, tmp_path: Path):
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    (watch_dir / "existing.md").write_text("existing")
+
+    tracker = FileTracker(watch_dir=watch_dir, state_filepath=tmp_path / "state.json")
+    observer = RecordingObserver()
+    tracker.attach(observer)
+
+    watcher = FileWatcher(
+        tracker, debounce=0.1, poll_interval=0.2, use_inotify=request.param
+    )
+    watcher.start()
+    yield watcher, observer, tracker.watch_dir
+    watcher.stop()
+
+
+# --- Test Cases ---
+
+
+def test_initial_sync_picks_up_existing_files(watched):
+    """Files present before the watcher started are synced once on start."""
+    _, observer, watch_dir = watched
+    assert wait_for(lambda: watch_dir / "existing.md" in observer.new)
+
+
+def test_changes_are_synced_in_background(watched):
+    """Creations, modifications and deletions reach observers without a sync() call."""
+    watcher, observer, watch_dir = watched
+    assert wait_for(lambda: watch_dir / "existing.md" in observer.new)
+
+    subdir = watch_dir / "subdir"
+    subdir.mkdir()
+    new_file = subdir / "new.md"
+    new_file.write_text("new")
+    assert wait_for(lambda: new_file in observer.new)
+
+    time.sleep(0.05)
+    (watch_dir / "existing.md").write_text("changed")
+    assert wait_for(lambda: watch_dir / "existing.md" in observer.modified)
+
+    new_file.unlink()
+    assert wait_for(lambda: new_file in observer.deleted)
+    assert watcher.mode == ("inotify" if watcher.use_inotify else "polling")
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux only"
+)
+def test_constant_writes_do_not_hold_off_syncs(tmp_path: Path):
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    tracker = FileTracker(watch_dir=watch_dir, state_filepath=tmp_path / "state.json")
+    observer = RecordingObserver()
+    tracker.attach(observer)
+    watcher = FileWatcher(tracker, debounce=0.2, poll_interval=60, max_delay=0.5)
+    watcher.start()
+    assert wait_for(lambda: watcher.mode == "inotify")
+
+    note = watch_dir / "note.md"
+    note.write_text("note")
+    log = watch_dir / "app.log"
+    try:
+        # Written more often than the debounce window, for twice the max delay
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline and note not in observer.new:
+            log.write_text(str(time.monotonic()))
+            time.sleep(0.05)
+        assert note in observer.new
+    finally:
+        watcher.stop()